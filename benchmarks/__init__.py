@@ -0,0 +1,5 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Benchmarks for re_gen. Run individual modules with python -m benchmarks.<name>
+"""
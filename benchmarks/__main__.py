@@ -0,0 +1,66 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+    python -m benchmarks run [-o results.json] [-r repeats] [workload ...]
+    python -m benchmarks compare old.json new.json [-t threshold]
+
+compare exits with status 1 if any measurement regressed.
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import sys
+
+from . import harness
+from .workloads import workloads
+
+def format_key(key):
+    return "%s[%s] %s" % key
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command")
+
+    run = commands.add_parser("run", help="run benchmarks")
+    run.add_argument("workloads", nargs="*", help="workloads to run (default: all): %s"
+                     % ", ".join(sorted(workloads)))
+    run.add_argument("-o", "--output", help="write json results to this file")
+    run.add_argument("-r", "--repeats", type=int, default=5)
+
+    compare = commands.add_parser("compare", help="compare two result files")
+    compare.add_argument("old")
+    compare.add_argument("new")
+    compare.add_argument("-t", "--threshold", type=float, default=0.1,
+                         help="relative slowdown to flag as regression (default 0.1)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        names = args.workloads or sorted(workloads)
+        unknown = [name for name in names if name not in workloads]
+        if unknown:
+            parser.error("unknown workloads: %s" % ", ".join(unknown))
+        result = harness.run([workloads[name] for name in names], repeats=args.repeats)
+        for row in result["results"]:
+            print("%-20s %6d %-9s %10.6fs %10d B peak" % (row["workload"], row["size"],
+                  row["stage"], row["time"]["median"], row["peak_bytes"]))
+        if args.output:
+            with open(args.output, "w") as output:
+                json.dump(result, output, indent=1, sort_keys=True)
+        return 0
+    elif args.command == "compare":
+        with open(args.old) as old, open(args.new) as new:
+            rows, regressions = harness.compare(json.load(old), json.load(new),
+                                                threshold=args.threshold)
+        for key, metric, old_value, new_value, ratio in regressions:
+            print("REGRESSION %s %s: %s -> %s (x%.2f)" % (format_key(key), metric,
+                  old_value, new_value, ratio))
+        print("%d measurements compared, %d regressions" % (len(rows), len(regressions)))
+        return 1 if regressions else 0
+    else:
+        parser.print_help()
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
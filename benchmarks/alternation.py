@@ -0,0 +1,62 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Compare a naive a|b|c|... alternation against the trie-factored Either, for
+keyword lists of several sizes.
+
+    python -m benchmarks.alternation [count ...]
+"""
+
+from __future__ import print_function
+import random
+import re
+import sys
+import time
+
+from re_gen.grouping import Either
+
+def keywords(count, seed=0):
+    "hostname-like keywords, sharing prefixes and suffixes as real ones do"
+    rng = random.Random(seed)
+    prefixes = ["www", "api", "cdn", "mail", "static", "img", "edge"]
+    words = set()
+    while len(words) < count:
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for i in range(rng.randint(3, 9)))
+        words.add("%s.%s%d.example" % (rng.choice(prefixes), name, rng.randint(0, 99)))
+    return sorted(words)
+
+def corpus(words, lines=2000, seed=1):
+    rng = random.Random(seed)
+    result = []
+    for index in range(lines):
+        host = rng.choice(words) if index % 10 == 0 else "www.unknown%d.example" % index
+        result.append("GET /index.html HTTP/1.1 host=%s status=200" % host)
+    return "\n".join(result)
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def main(argv):
+    counts = [int(arg) for arg in argv] or [100, 1000, 5000]
+    for count in counts:
+        words = keywords(count)
+        text = corpus(words)
+        naive_source, naive_build = timed(lambda: "|".join(re.escape(word) for word in words))
+        trie_source, trie_build = timed(lambda: Either(*words).toplevel().render())
+        re.purge()
+        naive, naive_compile = timed(lambda: re.compile(naive_source))
+        trie, trie_compile = timed(lambda: re.compile(trie_source))
+        naive_found, naive_search = timed(lambda: len(naive.findall(text)))
+        trie_found, trie_search = timed(lambda: len(trie.findall(text)))
+        assert naive_found == trie_found
+        megabytes = len(text) / 1e6
+        print("%6d keywords: %8s %8s %8s %8s" % (count, "build", "compile", "MB/s", "regex len"))
+        print("        naive: %8.4f %8.4f %8.2f %8d" % (naive_build, naive_compile,
+              megabytes / naive_search, len(naive_source)))
+        print("         trie: %8.4f %8.4f %8.2f %8d" % (trie_build, trie_compile,
+              megabytes / trie_search, len(trie_source)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Compare a Python loop over pattern.match() against batch.match_many, with
+and without duplicate folding, on a low-cardinality column (few distinct
+status lines) and a high-cardinality one (mostly distinct values).
+
+    python -m benchmarks.batch [rows]
+"""
+
+from __future__ import print_function
+import random
+import sys
+import time
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit, anychar
+from re_gen import batch
+
+def status_pattern():
+    return Group(Literal("HTTP/1."), Either("0", "1"), Literal(" "),
+                 Either("4", "5"), Repeating(digit, count=2), Literal(" "),
+                 Repeating(anychar, min=2))
+
+def low_cardinality(rows, seed=0):
+    rng = random.Random(seed)
+    values = ["HTTP/1.1 %d %s" % (code, reason) for code, reason in
+              [(200, "OK"), (301, "Moved"), (404, "Not Found"), (500, "Error"),
+               (503, "Unavailable"), (302, "Found")]]
+    return [rng.choice(values) for row in range(rows)]
+
+def high_cardinality(rows, seed=0):
+    rng = random.Random(seed)
+    return ["HTTP/1.%d %d %08x" % (rng.randint(0, 1), rng.choice([200, 404, 500]),
+                                   rng.getrandbits(32)) for row in range(rows)]
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def main(argv):
+    rows = int(argv[0]) if argv else 500000
+    pattern = status_pattern()
+    match = pattern.compiled.match
+    print("pattern %s, %d rows" % (pattern.rendered, rows))
+    for name, column in [("low cardinality", low_cardinality(rows)),
+                         ("high cardinality", high_cardinality(rows))]:
+        naive, naive_time = timed(lambda: [match(text) is not None for text in column])
+        auto, auto_time = timed(lambda: batch.match_many(pattern, column))
+        folded, folded_time = timed(lambda: batch.match_many(pattern, column, fold=True))
+        plain, plain_time = timed(lambda: batch.match_many(pattern, column, fold=False))
+        assert list(map(bool, auto)) == naive == list(map(bool, folded)) == list(map(bool, plain))
+        print("%-17s loop %.3fs  match_many %.3fs  fold=True %.3fs  fold=False %.3fs"
+              "  (%d matches)" % (name, naive_time, auto_time, folded_time, plain_time,
+                                  sum(naive)))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,36 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Generate a corpus of matching and near-miss strings for each workload, and
+time fullmatch over it. Prints generation throughput and match time per
+sample; the corpus is seeded, so runs are comparable.
+
+    python -m benchmarks.generated [count]
+"""
+
+from __future__ import print_function
+import sys
+import time
+
+from .workloads import workloads
+
+def main(argv):
+    count = int(argv[0]) if argv else 100000
+    for name in sorted(workloads):
+        workload = workloads[name]
+        for size in workload.sizes:
+            start = time.perf_counter()
+            samples = workload.corpus(size, count)
+            generated = time.perf_counter() - start
+
+            fullmatch = workload.build(size).compiled.fullmatch
+            start = time.perf_counter()
+            for text, matches in samples:
+                if (fullmatch(text) is not None) != matches:
+                    raise AssertionError("%s[%d]: wrong sample %r" % (name, size, text))
+            matched = time.perf_counter() - start
+            print("%-18s %6d  %9.0f samples/min  fullmatch %7.3fus/sample"
+                  % (name, size, count / generated * 60, matched / count * 1e6))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,126 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Measure time and allocations for each stage of the pattern pipeline:
+build -> simplify -> render -> compile -> search/match.
+"""
+
+import gc
+import platform
+import re
+import sys
+import time
+import tracemalloc
+
+from re_gen import base
+
+stages = ["build", "simplify", "render", "compile", "search", "match"]
+
+def reset_caches():
+    "forget interned nodes and compiled regexes, so every run starts cold"
+    base._interned.clear()
+    base.compile_cache.clear()
+    re.purge()
+
+def run_pipeline(workload, size, record):
+    """
+    run every stage once, calling record(stage, function) to execute each
+    stage; returns nothing
+    """
+    text = workload.text(size)
+    state = {}
+    record("build", lambda: state.__setitem__("tree", workload.build(size)))
+    record("simplify", lambda: state.__setitem__("simple", state["tree"].toplevel()))
+    record("render", lambda: state.__setitem__("rendered", state["simple"].render()))
+    record("compile", lambda: state.__setitem__("compiled", re.compile(state["rendered"])))
+    record("search", lambda: state["compiled"].search(text))
+    record("match", lambda: state["compiled"].match(text))
+
+def measure_time(workload, size, repeats):
+    timings = dict((stage, []) for stage in stages)
+    def record(stage, function):
+        start = time.perf_counter()
+        function()
+        timings[stage].append(time.perf_counter() - start)
+    for repeat in range(repeats):
+        reset_caches()
+        gc.collect()
+        run_pipeline(workload, size, record)
+    return timings
+
+def measure_allocations(workload, size):
+    allocations = {}
+    def record(stage, function):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function()
+        current, peak = tracemalloc.get_traced_memory()
+        allocations[stage] = {"net_bytes": current - before, "peak_bytes": peak - before}
+    reset_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run_pipeline(workload, size, record)
+    finally:
+        tracemalloc.stop()
+    return allocations
+
+def summarize(samples):
+    samples = sorted(samples)
+    return {
+        "min": samples[0],
+        "median": samples[len(samples) // 2],
+        "mean": sum(samples) / len(samples),
+    }
+
+def run(workloads, repeats=5):
+    "benchmark workloads, returning a json-serializable result dict"
+    results = []
+    for workload in workloads:
+        for size in workload.sizes:
+            timings = measure_time(workload, size, repeats)
+            allocations = measure_allocations(workload, size)
+            for stage in stages:
+                result = {"workload": workload.name, "size": size, "stage": stage,
+                          "repeats": repeats, "time": summarize(timings[stage])}
+                result.update(allocations[stage])
+                results.append(result)
+    return {
+        "meta": {
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+
+def _index(run):
+    return dict(((result["workload"], result["size"], result["stage"]), result)
+                for result in run["results"])
+
+def compare(old, new, threshold=0.1, min_seconds=1e-5):
+    """
+    Compare two runs. Returns a list of (key, metric, old, new, ratio) for
+    every measurement in both runs, and a list of the ones where new is worse
+    than old by more than threshold (0.1 = 10%). Timings below min_seconds in
+    both runs are too noisy to flag.
+    """
+    old_results = _index(old)
+    new_results = _index(new)
+    rows = []
+    regressions = []
+    for key in sorted(set(old_results) & set(new_results), key=repr):
+        before = old_results[key]
+        after = new_results[key]
+        metrics = [("median_seconds", before["time"]["median"], after["time"]["median"]),
+                   ("peak_bytes", before["peak_bytes"], after["peak_bytes"])]
+        for metric, old_value, new_value in metrics:
+            ratio = float(new_value) / old_value if old_value else None
+            row = (key, metric, old_value, new_value, ratio)
+            rows.append(row)
+            if metric == "median_seconds" and max(old_value, new_value) < min_seconds:
+                continue
+            if ratio is not None and ratio > 1 + threshold:
+                regressions.append(row)
+    return rows, regressions
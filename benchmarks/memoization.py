@@ -0,0 +1,76 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Count simplified()/atomized()/render() calls needed to render deep trees, with
+and without per-node memoization.
+
+    python -m benchmarks.memoization [depth ...]
+"""
+
+from __future__ import print_function
+import sys
+import time
+from collections import Counter
+
+from re_gen import base
+from re_gen.base import Literal
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+
+counted_methods = ["simplified", "atomized", "render", "toplevel"]
+counted_classes = [Literal, Group, Repeating, Set]
+
+def build(depth):
+    """
+    nested groups, each using the level below twice - as is common when a
+    sub-pattern (a word, a number) is reused in a larger pattern
+    """
+    pattern = Literal("x")
+    for level in range(depth):
+        pattern = Group(pattern, Literal("-%d" % level), Set("xyz"),
+                        Repeating(pattern, min=0, max=3), capturing=False)
+    return pattern
+
+def counting(counts, name, method):
+    def wrapper(self, *args, **keywords):
+        counts[name] += 1
+        return method(self, *args, **keywords)
+    return wrapper
+
+def count_calls(depth, memoize):
+    counts = Counter()
+    originals = []
+    for cls in counted_classes:
+        for name in counted_methods:
+            if name not in cls.__dict__:
+                continue
+            method = cls.__dict__[name]
+            originals.append((cls, name, method))
+            setattr(cls, name, counting(counts, name, method))
+
+    base.memoize = memoize
+    try:
+        pattern = build(depth)
+        start = time.time()
+        pattern.toplevel().render()
+        elapsed = time.time() - start
+    finally:
+        base.memoize = True
+        for cls, name, method in originals:
+            setattr(cls, name, method)
+    return counts, elapsed
+
+def main(argv):
+    depths = [int(arg) for arg in argv] or [4, 8, 12]
+    for depth in depths:
+        for memoize in (False, True):
+            # use a fresh interning table so cached results don't leak
+            base._interned.clear()
+            base.compile_cache.clear()
+            counts, elapsed = count_calls(depth, memoize)
+            calls = ", ".join("%s=%d" % (name, counts[name]) for name in counted_methods)
+            print("depth=%-3d memoize=%-5s %s  (%.4fs)" % (depth, memoize, calls, elapsed))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,44 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Compare source length and search time of each workload's pattern before and
+after optimize.Optimizer, and print the optimizer's per-pass statistics.
+
+    python -m benchmarks.optimize [repeats]
+"""
+
+from __future__ import print_function
+import sys
+import time
+
+from re_gen.optimize import Optimizer
+from .workloads import workloads
+
+def best_time(function, repeats):
+    best = None
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv):
+    repeats = int(argv[0]) if argv else 20
+    optimizer = Optimizer()
+    for name in sorted(workloads):
+        workload = workloads[name]
+        for size in workload.sizes:
+            pattern = workload.build(size)
+            text = workload.text(size)
+            optimized = optimizer.optimize(pattern)
+            before, after = pattern.compiled, optimized.compiled
+            print("%-18s %6d  length %7d -> %-7d search %.6fs -> %.6fs" % (
+                name, size, len(pattern.rendered), len(optimized.rendered),
+                best_time(lambda: before.search(text), repeats),
+                best_time(lambda: after.search(text), repeats)))
+    print(optimizer.report())
+    print("%d rounds, %d patterns unfinished" % (optimizer.rounds, optimizer.unfinished))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
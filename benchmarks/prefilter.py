@@ -0,0 +1,72 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Compare plain regex search against required-literal prefiltering on a
+synthetic log corpus where few lines match.
+
+    python -m benchmarks.prefilter [lines] [match ratio]
+"""
+
+from __future__ import print_function
+import random
+import sys
+import time
+
+from re_gen.base import Literal
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+from re_gen.definitions import digit
+
+levels = ["INFO", "DEBUG", "WARN", "TRACE"]
+words = ["request", "served", "cache", "hit", "miss", "user", "session", "timeout"]
+
+def log_corpus(lines, ratio, seed=0):
+    rng = random.Random(seed)
+    result = []
+    for index in range(lines):
+        message = " ".join(rng.choice(words) for i in range(rng.randint(4, 12)))
+        if rng.random() < ratio:
+            line = "2012-01-01 12:00:%02d ERROR %d %s code=E%d" % (
+                index % 60, rng.randint(100, 99999), message, rng.randint(10, 99))
+        else:
+            line = "2012-01-01 12:00:%02d %s %s" % (index % 60, rng.choice(levels), message)
+        result.append(line)
+    return result
+
+def error_pattern():
+    "timestamp first, so re can't use the literal as a prefix to skip ahead"
+    return Group(Repeating(digit, count=2), Literal(":"), Repeating(digit, count=2),
+                 Literal(" ERROR "), Repeating(digit, min=3, max=5), Literal(" "),
+                 Repeating(Set(Range("a", "z"), " "), min=1, max=120),
+                 Literal(" code=E"), Repeating(digit, count=2))
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+def main(argv):
+    lines = int(argv[0]) if argv else 200000
+    ratio = float(argv[1]) if len(argv) > 1 else 0.01
+    corpus = log_corpus(lines, ratio)
+    text = "\n".join(corpus)
+    pattern = error_pattern()
+    compiled = pattern.compiled
+    prefilter = pattern.prefiltered()
+    print("pattern %s, required literals %s" % (pattern.rendered, sorted(prefilter.literals)))
+
+    plain, plain_time = timed(lambda: sum(1 for line in corpus if compiled.search(line)))
+    filtered, filtered_time = timed(lambda: sum(1 for line in corpus if prefilter.search(line)))
+    assert plain == filtered
+    print("per line:  re %.3fs  prefiltered %.3fs  (%d of %d lines match)"
+          % (plain_time, filtered_time, plain, lines))
+
+    plain, plain_time = timed(lambda: sum(1 for match in compiled.finditer(text)))
+    filtered, filtered_time = timed(lambda: sum(1 for match in prefilter.finditer(text)))
+    assert plain == filtered
+    print("finditer:  re %.3fs  prefiltered %.3fs  (%d matches in %.1f MB)"
+          % (plain_time, filtered_time, plain, len(text) / 1e6))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
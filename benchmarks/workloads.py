@@ -0,0 +1,95 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Parametrized pattern workloads. Each workload builds a pattern tree from a
+size parameter, and provides text to search/match it against.
+"""
+
+import string
+
+from re_gen.base import Literal
+from re_gen.generate import corpus
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+
+workloads = {}
+
+class Workload(object):
+    def __init__(self, name, build, text, sizes):
+        self.name = name
+        self.build = build
+        self.text = text
+        self.sizes = sizes
+
+    def corpus(self, size, count, seed=0, negative_ratio=0.5):
+        "count random (text, matches) pairs for the pattern built for size"
+        return corpus(self.build(size), count, seed=seed, negative_ratio=negative_ratio)
+
+def workload(*sizes):
+    "register function as a workload; it returns (build, text) for a size"
+    def decorator(function):
+        workloads[function.__name__] = Workload(function.__name__,
+                lambda size: function(size)[0](), lambda size: function(size)[1], sizes)
+        return function
+    return decorator
+
+filler = "the quick brown fox jumps over the lazy dog 0123456789 " * 40
+
+@workload(10, 50, 100)
+def deep_nesting(depth):
+    def build():
+        pattern = Literal("core")
+        for level in range(depth):
+            pattern = Group(Literal("<%d" % (level % 10)), pattern,
+                            Literal(">"), capturing=level % 2 == 0)
+        return pattern
+    text = "".join("<%d" % (level % 10) for level in reversed(range(depth)))
+    text += "core" + ">" * depth
+    return build, filler + text
+
+@workload(10, 100, 1000)
+def wide_group(width):
+    def build():
+        children = []
+        for index in range(width):
+            children.append(Literal(string.ascii_lowercase[index % 26]))
+            children.append(Set("0123456789"))
+        return Group(*children)
+    text = "".join(string.ascii_lowercase[index % 26] + "7" for index in range(width))
+    return build, filler + text
+
+@workload(100, 1000, 10000)
+def long_literal(length):
+    literal = "".join(string.ascii_letters[index % 52] for index in range(length))
+    def build():
+        return Group(Literal(literal), Literal("!"))
+    return build, filler + literal + "!"
+
+@workload(10, 100, 1000)
+def big_set(size):
+    chars = [chr(0x100 + index * 2) for index in range(size)]
+    def build():
+        return Repeating(Set(Range("a", "z"), *chars), min=3)
+    return build, filler + "".join(chars[:10])
+
+@workload(2, 4, 8)
+def nested_repeating(depth):
+    def build():
+        pattern = Set("ab")
+        for level in range(depth):
+            pattern = Repeating(Group(pattern, Literal("c%d" % level), capturing=False),
+                                min=1, max=3)
+        return pattern
+    text = "a"
+    for level in range(depth):
+        text = text + "c%d" % level
+    return build, filler + text
+
+@workload(100, 1000, 5000)
+def keywords(count):
+    words = ["%s%d.example" % (string.ascii_lowercase[index % 26] * (index % 7 + 1), index)
+             for index in range(count)]
+    def build():
+        return Either(*words)
+    return build, filler + words[count // 2]
@@ -1,12 +1,114 @@
 # Copyright (c) 2012
 # Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Lightweight interfaces and adaptation, modeled on zope.interface.
+
+Calling an interface adapts an object to it: Pattern(obj) returns obj if it
+provides Pattern, or the result of the adapter registered for the object's
+type. Lookups are cached per (type, interface) and fall back to walking the
+type's MRO, so the common case is a single dictionary lookup.
+
+zope.interface is optional: it is only imported if an adapter is registered
+for a zope interface, in which case objects providing that zope interface are
+adapted as well.
+"""
+
+import sys
+
+class Attribute(object):
+    "Documents an attribute of an interface"
+    def __init__(self, doc):
+        self.__doc__ = doc
+
+
+_marker = object()
+
+class InterfaceClass(type):
+    """
+    Metaclass of interfaces. Interfaces are classes, so that extending an
+    interface is subclassing it; they are never instantiated.
+    """
+    def __call__(iface, obj, default=_marker):
+        cls = type(obj)
+        try:
+            adapter = _adapter_cache[cls, iface]
+        except KeyError:
+            adapter = _adapter_cache[cls, iface] = _find_adapter(cls, iface)
+
+        if adapter is _provides:
+            return obj
+        elif adapter is not None:
+            result = adapter(obj)
+            if result is not None:
+                return result
+        else:
+            result = _zope_lookup(iface, obj)
+            if result is not None:
+                return result
+
+        if default is _marker:
+            raise TypeError("Could not adapt", obj, iface)
+        return default
+
+    def providedBy(iface, obj):
+        return iface in providedBy(obj)
+
+    def implementedBy(iface, cls):
+        return iface in implementedBy(cls)
+
+    def __repr__(iface):
+        return "<InterfaceClass %s.%s>" % (iface.__module__, iface.__name__)
+
+Interface = InterfaceClass("Interface", (object,), {})
+
+
+def implementer(*interfaces):
+    """
+    Class (or adapter factory) decorator declaring that instances (or results)
+    provide the given interfaces.
+    """
+    def decorator(implementor):
+        implementor._implemented_interfaces = interfaces
+        if isinstance(implementor, type):
+            _clear_caches()
+        return implementor
+    return decorator
 
-from zope.interface.adapter import AdapterRegistry
-from zope.interface.interface import adapter_hooks, InterfaceClass
-from zope.interface import Interface, implementedBy, providedBy
-from zope.interface.common.sequence import IWriteSequence, IExtendedReadSequence
+_implemented_cache = {}
+
+def implementedBy(cls):
+    """
+    Return the interfaces, including extended ones, declared by cls, its
+    bases, or (for builtin types) fakeimplementeds.
+    """
+    try:
+        return _implemented_cache[cls]
+    except KeyError:
+        pass
+    result = []
+    for klass in getattr(cls, "__mro__", (cls,)):
+        declared = list(klass.__dict__.get("_implemented_interfaces", ()))
+        if klass in fakeimplementeds:
+            declared.append(fakeimplementeds[klass])
+        for iface in declared:
+            for extended in iface.__mro__:
+                if isinstance(extended, InterfaceClass) and extended not in result:
+                    result.append(extended)
+    result = tuple(result)
+    if isinstance(cls, type):
+        _implemented_cache[cls] = result
+    return result
+
+def providedBy(obj):
+    return implementedBy(type(obj))
+
+def _declared_by(implementor):
+    "interfaces declared on an adapter factory or class, without extensions"
+    if isinstance(implementor, type):
+        return tuple(iface for iface in implementedBy(implementor)
+                     if iface is not Interface)
+    return tuple(getattr(implementor, "_implemented_interfaces", ()))
 
-registry = AdapterRegistry()
 
 class INumber(Interface):
     pass
@@ -17,6 +119,15 @@ class IInteger(INumber):
 class IReal(INumber):
     pass
 
+class IReadSequence(Interface):
+    pass
+
+class IExtendedReadSequence(IReadSequence):
+    pass
+
+class IWriteSequence(Interface):
+    pass
+
 class IString(IExtendedReadSequence):
     pass
 
@@ -29,6 +140,9 @@ class ITuple(IObjectSequence):
 class IList(IObjectSequence, IWriteSequence):
     pass
 
+class ISet(Interface):
+    pass
+
 
 fakeimplementeds = {
     int: IInteger,
@@ -40,19 +154,74 @@ fakeimplementeds = {
 }
 
 
+# (source type or interface, provided interface) -> adapter factory
+registry = {}
+# (type of adapted object, target interface) -> adapter, _provides, or None
+_adapter_cache = {}
+# set when an adapter is registered for a zope interface
+_zope_sources = set()
+
+def _provides(obj):
+    "marker adapter: the object already provides the target interface"
+    return obj
+
+def _clear_caches():
+    _adapter_cache.clear()
+    _implemented_cache.clear()
+
+def _source_specs(cls):
+    "types and interfaces adapters may be registered for, most specific first"
+    for klass in cls.__mro__:
+        yield klass
+        for iface in implementedBy(klass):
+            yield iface
+
+def _find_adapter(cls, target):
+    if target in implementedBy(cls):
+        return _provides
+    for spec in _source_specs(cls):
+        for (source, provided), implementor in registry.items():
+            if source is spec and implementor and issubclass(provided, target):
+                return implementor
+    return None
+
+
+def _is_zope_interface(orig):
+    zope_interface = sys.modules.get("zope.interface.interface")
+    return (zope_interface is not None and
+            isinstance(orig, zope_interface.InterfaceClass))
+
+def _zope_lookup(target, obj):
+    """
+    Adapt objects which only declare zope interfaces. zope.interface is only
+    consulted once an adapter was registered for one of its interfaces.
+    """
+    if not _zope_sources:
+        return None
+    from zope.interface import providedBy as zope_providedBy
+    for spec in zope_providedBy(obj).__sro__:
+        if spec not in _zope_sources:
+            continue
+        for (source, provided), implementor in registry.items():
+            if source is spec and issubclass(provided, target) and implementor:
+                return implementor(obj)
+    return None
+
+
 def register(implementor, orig, *interfaceClasses):
     if orig in fakeimplementeds:
-        origInterface = fakeimplementeds[orig]
-    elif not isinstance(orig, InterfaceClass):
-        origInterface = implementedBy(orig)
-    else:
-        origInterface = orig
+        orig = fakeimplementeds[orig]
+    elif not isinstance(orig, type):
+        if not _is_zope_interface(orig):
+            raise TypeError("can only adapt from types and interfaces: %r" % (orig,))
+        _zope_sources.add(orig)
 
     if not interfaceClasses:
-        interfaceClasses = tuple(implementedBy(implementor))
+        interfaceClasses = _declared_by(implementor)
 
     for interfaceClass in interfaceClasses:
-        registry.register([origInterface], interfaceClass, '', implementor)
+        registry[orig, interfaceClass] = implementor
+    _clear_caches()
 
 def adapter_for(orig, *interfaceClasses):
     def decorator(implementor):
@@ -62,20 +231,9 @@ def adapter_for(orig, *interfaceClasses):
 
 def deregister(implementor, orig, *interfaceClasses):
     if not interfaceClasses:
-        interfaceClasses = tuple(implementedBy(implementor))
+        interfaceClasses = _declared_by(implementor)
     register(None, orig, *interfaceClasses)
 
 
 def lookup(targetinterface, obj):
-    try:
-        sourceinterface = fakeimplementeds[type(obj)]
-    except KeyError:
-        sourceinterface = providedBy(obj)
-
-    implementor = registry.lookup1(sourceinterface, targetinterface, '')
-
-    if implementor == None:
-        return None
-
-    return implementor(obj)
-adapter_hooks.append(lookup)
\ No newline at end of file
+    return targetinterface(obj, None)
@@ -0,0 +1,141 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Match patterns against asyncio streams, eg logs read from a socket.
+
+    async for match in pattern.aiter_matches(reader):
+        handle(match)
+
+Bytes are decoded incrementally, so a character split between two reads is
+decoded whole - unless the pattern is a bytes pattern, which matches the
+bytes as read - and text is matched with a scanning.ChunkScanner, so matches
+spanning reads are found, with the same carry-over limits. Offsets count
+characters (or bytes) from the start of the stream.
+
+Text which arrives while a batch is being matched is collected into the
+next batch. Batches larger than inline_size are matched in a thread pool, so
+the event loop keeps running; smaller ones are matched inline, which is
+cheaper than a thread switch. Once batch_size characters are waiting,
+reading stops until matching catches up, so a slow consumer pushes back on
+the stream rather than buffering without limit. Pass a ScanStats to see how
+often that happened.
+"""
+
+import asyncio
+import codecs
+import time
+
+from .scanning import ChunkScanner, max_match_length
+
+default_read_size = 1 << 16
+default_batch_size = 1 << 20
+default_inline_size = 1 << 14
+
+class ScanStats(object):
+    """
+    Counters updated while aiter_matches runs. stalls counts the times
+    reading waited for matching, and stalled_seconds the total wait: the
+    backpressure applied to the stream.
+    """
+    def __init__(self):
+        self.bytes_read = 0
+        self.chars_scanned = 0
+        self.reads = 0
+        self.batches = 0
+        self.offloaded = 0
+        self.matches = 0
+        self.stalls = 0
+        self.stalled_seconds = 0.0
+        self.max_pending = 0
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return ("<ScanStats read=%(bytes_read)d scanned=%(chars_scanned)d "
+                "batches=%(batches)d offloaded=%(offloaded)d matches=%(matches)d "
+                "stalls=%(stalls)d>" % self.__dict__)
+
+
+async def aiter_matches(pattern, reader, encoding="utf-8", errors="strict",
+                        read_size=default_read_size, batch_size=default_batch_size,
+                        inline_size=default_inline_size, executor=None, stats=None):
+    """
+    Asynchronously yield StreamMatch objects for matches of pattern in
+    reader, an object with a coroutine read(n) such as asyncio.StreamReader,
+    returning bytes (decoded with encoding, for str patterns) or str.
+    executor is passed to
+    loop.run_in_executor; None uses the loop's default thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    scanner = ChunkScanner(pattern.compiled, max_match_length(pattern))
+    binary = pattern.is_bytes()
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    if stats is None:
+        stats = ScanStats()
+    pending = []
+    pending_size = 0
+    running = None # future of a batch being matched in the thread pool
+    eof = False
+
+    while not eof:
+        data = await reader.read(read_size)
+        stats.reads += 1
+        if not data:
+            eof = True
+            text = data if binary else decoder.decode(b"", True)
+        elif binary:
+            stats.bytes_read += len(data)
+            text = data
+        elif isinstance(data, bytes):
+            stats.bytes_read += len(data)
+            text = decoder.decode(data)
+        else:
+            text = data
+        if text:
+            pending.append(text)
+            pending_size += len(text)
+            stats.max_pending = max(stats.max_pending, pending_size)
+
+        if running is not None:
+            if not running.done():
+                if not eof and pending_size < batch_size:
+                    continue
+                start = time.perf_counter()
+                await asyncio.wait([running])
+                if not eof:
+                    stats.stalls += 1
+                    stats.stalled_seconds += time.perf_counter() - start
+            for match in _results(running, stats):
+                yield match
+            running = None
+
+        if not pending:
+            continue
+        batch = pending[0][:0].join(pending)
+        pending = []
+        pending_size = 0
+        stats.batches += 1
+        stats.chars_scanned += len(batch)
+        if len(batch) > inline_size:
+            stats.offloaded += 1
+            running = loop.run_in_executor(executor, scanner.feed, batch)
+            continue
+        matches = scanner.feed(batch)
+        stats.matches += len(matches)
+        for match in matches:
+            yield match
+
+    if running is not None:
+        await asyncio.wait([running])
+        for match in _results(running, stats):
+            yield match
+    matches = scanner.finish()
+    stats.matches += len(matches)
+    for match in matches:
+        yield match
+
+def _results(future, stats):
+    matches = future.result()
+    stats.matches += len(matches)
+    return matches
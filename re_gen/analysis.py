@@ -0,0 +1,452 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Find parts of patterns which may make the re module backtrack
+catastrophically on some inputs.
+
+analyze() reports
+ - unbounded repeats whose body can match the same text in more than one
+   way: a variable-length repeat inside the body, eg (a+)+ or (\\w+\\s?)*,
+   unless the body also needs a character the inner repeat can't match, as in
+   (a+b)+; or alternatives starting with the same characters, eg (\\d|\\w)*.
+   These can take exponential time.
+ - runs of adjacent unbounded repeats which can match the same characters,
+   with nothing in between that only one of them could match, eg \\d+\\d+ or
+   .*=.*; k of them can take O(n^k) time.
+Possessive repeats and atomic groups are never backtracked into, so they
+don't count as nested repeats or overlapping alternatives.
+
+possessified() makes repeats of single characters possessive where that
+can't change what the pattern matches.
+
+The analysis works on sets of characters, not on the languages the nodes
+match, so it reports patterns which may be slow rather than ones which
+certainly are. Paths name the attributes leading from the analyzed pattern -
+by default its toplevel() form, which is what gets compiled - to the node.
+"""
+
+import re
+import sys
+
+from .base import Pattern, StrPattern, Literal, inf
+from .grouping import Group, Either, Yesno
+from .repeating import Repeating
+from .sets import Set, Intervals
+
+exponential = "exponential"
+polynomial = "polynomial"
+
+class BacktrackingError(Exception):
+    "raised by check() (and by freeze() in strict mode) for exponential patterns"
+    def __init__(self, findings):
+        self.findings = findings
+        Exception.__init__(self, "pattern may backtrack exponentially: %s"
+                           % "; ".join(str(finding) for finding in findings))
+
+class Finding(object):
+    """
+    A part of a pattern which may backtrack excessively. complexity is
+    exponential or polynomial; for polynomial ones, degree is the exponent.
+    """
+    def __init__(self, path, node, complexity, message, degree=None):
+        self.path = path
+        self.node = node
+        self.complexity = complexity
+        self.message = message
+        self.degree = degree
+
+    @property
+    def location(self):
+        return ".".join(("root",) + self.path)
+
+    @property
+    def estimate(self):
+        if self.complexity == polynomial:
+            return "O(n^%d)" % self.degree
+        return "O(2^n)"
+
+    def __str__(self):
+        return "%s: %s, %s" % (self.location, self.message, self.estimate)
+
+    def __repr__(self):
+        return "<Finding %s at %s: %s>" % (self.estimate, self.location, self.message)
+
+
+_all_chars = Intervals([(0, sys.maxunicode)])
+_class_intervals = {".": Intervals([(10, 10)]).inverted()}
+
+def class_intervals(escape):
+    """
+    Intervals of the code points matched by a character class escape (or
+    "."), in str patterns without flags.
+    """
+    try:
+        return _class_intervals[escape]
+    except KeyError:
+        pass
+    if not re.match(r"\\[dDwWsS]$", escape):
+        return _all_chars
+    # let re tell: code point n is at index n of this string
+    text = "".join(map(chr, range(sys.maxunicode + 1)))
+    result = Intervals((match.start(), match.end() - 1)
+                       for match in re.finditer(escape + "+", text))
+    _class_intervals[escape] = result
+    return result
+
+
+def _children(node):
+    "list of (path step, child pattern) of node"
+    if isinstance(node, Group):
+        return [("children[%d]" % index, Pattern(child))
+                for index, child in enumerate(node.children)]
+    elif isinstance(node, Either):
+        return [("branches[%d]" % index, Pattern(branch))
+                for index, branch in enumerate(node.branches)]
+    elif isinstance(node, Repeating):
+        return [("child", Pattern(node.child))]
+    elif isinstance(node, Yesno):
+        return [("yespattern", node.yespattern), ("nopattern", node.nopattern)]
+    return []
+
+class _Path(object):
+    """
+    Path of steps from the root of a walk to a node, linked to the path of
+    its parent, so that extending it doesn't copy it and walks stay linear
+    in the depth of the tree. Compared by identity; steps() returns it as a
+    tuple.
+    """
+    __slots__ = ("parent", "step")
+
+    def __init__(self, parent=None, step=None):
+        self.parent = parent
+        self.step = step
+
+    def child(self, step):
+        return _Path(self, step)
+
+    def steps(self):
+        steps = []
+        path = self
+        while path.parent is not None:
+            steps.append(path.step)
+            path = path.parent
+        steps.reverse()
+        return tuple(steps)
+
+def _location(path, relative=None):
+    "dotted name of path, or of relative under path, from the root"
+    steps = ("root",) + path.steps()
+    if relative is not None:
+        steps += relative.steps()
+    return ".".join(steps)
+
+def _walk(root):
+    "yield (path, node, parent) for the nodes of the tree, parents first"
+    stack = [(_Path(), root, None)]
+    while stack:
+        path, node, parent = stack.pop()
+        yield path, node, parent
+        for step, child in reversed(_children(node)):
+            stack.append((path.child(step), child, node))
+
+def _indexed(root):
+    """
+    Return (nodes, children): the nodes of the tree, parents first, and
+    for each the list of the indices of its children, in order
+    """
+    nodes = []
+    children = []
+    stack = [(root, None)]
+    while stack:
+        node, parent = stack.pop()
+        if parent is not None:
+            children[parent].append(len(nodes))
+        stack.extend((child, len(nodes)) for step, child in reversed(_children(node)))
+        nodes.append(node)
+        children.append([])
+    return nodes, children
+
+
+class _CharInfo(object):
+    """
+    Per-node character sets: chars, which every character of a match is in,
+    and first, which the first character of a match is in. opaque is true
+    for nodes containing zero-width assertions, back-references or unknown
+    patterns, whose effect on what may follow them isn't known.
+    """
+    def __init__(self, root):
+        self.chars = {}
+        self.first = {}
+        self.opaque = {}
+        # children before parents, so nothing recurses
+        order = [node for path, node, parent in _walk(root)]
+        for node in reversed(order):
+            if node not in self.chars:
+                self._compute(node)
+
+    def _compute(self, node):
+        children = [child for step, child in _children(node)]
+        self.opaque[node] = any(self.opaque[child] for child in children)
+        if isinstance(node, Literal):
+            chars = Intervals.from_chars(node.str)
+            first = Intervals.from_chars(node.str[:1])
+        elif isinstance(node, Set):
+            intervals, classes = node._normalized()
+            for escape in classes:
+                intervals = intervals | class_intervals(escape)
+            chars = first = intervals.inverted() if node.invert else intervals
+        elif isinstance(node, StrPattern):
+            if node.match_length() == (0, 0):
+                chars = first = Intervals()
+                self.opaque[node] = True
+            else:
+                self.opaque[node] = node.length is None
+                chars = first = class_intervals(node.render())
+        elif isinstance(node, Group):
+            chars = first = Intervals()
+            nullable = True
+            for child in children:
+                chars = chars | self.chars[child]
+                if nullable:
+                    first = first | self.first[child]
+                    nullable = child.match_length()[0] == 0
+        elif isinstance(node, (Either, Repeating, Yesno)):
+            chars = first = Intervals()
+            for child in children:
+                chars = chars | self.chars[child]
+                first = first | self.first[child]
+        else:
+            # back-references and patterns we don't know about
+            chars = first = _all_chars
+            self.opaque[node] = True
+        self.chars[node] = chars
+        self.first[node] = first
+
+
+def _sequence(node):
+    """
+    Flatten the groups in node into the sequence of elements it matches,
+    as (path, element) pairs relative to node.
+    """
+    result = []
+    stack = [(_Path(), node)]
+    while stack:
+        path, item = stack.pop()
+        if isinstance(item, Group) and not item.atomic:
+            for step, child in reversed(_children(item)):
+                stack.append((path.child(step), child))
+        else:
+            result.append((path, item))
+    return result
+
+def _variable(node):
+    minimum, maximum = node.match_length()
+    return maximum is inf or maximum > minimum
+
+def _backtracking_free(node):
+    "whether node is never backtracked into"
+    return (isinstance(node, Group) and node.atomic or
+            isinstance(node, Repeating) and node.possessive)
+
+def _repeats(node):
+    """
+    yield (path, repeat) for variable-length repeats in node which may give
+    back characters, including node itself
+    """
+    stack = [(_Path(), node)]
+    while stack:
+        path, item = stack.pop()
+        if _backtracking_free(item):
+            continue
+        # optional items count too: (?:ab?|b)* splits "abb" as ab, b or a, b, b
+        if isinstance(item, Repeating) and not item.is_fixed and _variable(item):
+            yield path, item
+        for step, child in reversed(_children(item)):
+            stack.append((path.child(step), child))
+
+def _contains(node, descendant):
+    return any(item is descendant for path, item, parent in _walk(node))
+
+def _ambiguous_body(body, info, prefix):
+    """
+    Return a message if repeating body can split the same text into
+    iterations in more than one way, else None. prefix is the _Path of body.
+    """
+    elements = _sequence(body)
+    for path, inner in _repeats(body):
+        variable = info.chars[inner]
+        if not variable:
+            continue
+        separated = False
+        for elementpath, element in elements:
+            if (element.match_length()[0] > 0 and not _contains(element, inner) and
+                    not info.chars[element] & variable):
+                separated = True
+                break
+        if not separated:
+            return "nested repeat %s can match the same text as the outer repeat" % (
+                _location(prefix, path))
+
+    for elementpath, element in elements:
+        if not isinstance(element, Either):
+            continue
+        branches = _children(element)
+        for index, (step, branch) in enumerate(branches):
+            for otherstep, other in branches[index + 1:]:
+                if info.first[branch] & info.first[other]:
+                    return "alternatives %s and %s start with the same characters" % (
+                        _location(prefix, elementpath.child(step)),
+                        _location(prefix, elementpath.child(otherstep)))
+    return None
+
+def _weight(element):
+    """
+    number of unbounded repeats element amounts to: a fixed number of
+    repeats of an unbounded body, like (?:\\d+){2}, counts once per repeat
+    """
+    if (isinstance(element, Repeating) and element.max is not inf and
+            Pattern(element.child).match_length()[1] is inf):
+        return element.max
+    return 1
+
+def _overlapping_runs(node, info):
+    """
+    Return list of runs of unbounded elements in the sequence of node which
+    can match the same characters, each a list of (path relative to node,
+    weight).
+    """
+    runs = []
+    run = []
+    runchars = Intervals()
+    for path, element in _sequence(node):
+        minimum, maximum = element.match_length()
+        chars = info.chars[element]
+        if maximum is inf:
+            if run and chars & runchars:
+                run.append((path, _weight(element)))
+                runchars = runchars | chars
+                continue
+            runs.append(run)
+            run, runchars = [(path, _weight(element))], chars
+        elif minimum == 0 or chars & runchars:
+            # optional elements, and ones the run could match too, don't end it
+            continue
+        else:
+            runs.append(run)
+            run, runchars = [], Intervals()
+    runs.append(run)
+    return [run for run in runs if sum(weight for path, weight in run) > 1]
+
+def analyze(pattern, simplify=True):
+    """
+    Return list of Findings for the parts of pattern which may backtrack
+    excessively; see the module docstring. With simplify, the toplevel()
+    form of pattern is analyzed.
+    """
+    root = Pattern(pattern)
+    if simplify:
+        root = root.toplevel()
+    info = _CharInfo(root)
+    findings = []
+    for path, node, parent in _walk(root):
+        if isinstance(node, Repeating) and node.max is inf and not node.possessive:
+            message = _ambiguous_body(Pattern(node.child), info, path.child("child"))
+            if message:
+                findings.append(Finding(path.steps(), node, exponential, message))
+        if isinstance(parent, Group):
+            # part of the parent's sequence
+            continue
+        for run in _overlapping_runs(node, info):
+            locations = ", ".join(_location(path, step) for step, weight in run)
+            findings.append(Finding(path.steps(), node, polynomial,
+                    "adjacent repeats %s can match the same characters" % locations,
+                    degree=sum(weight for step, weight in run)))
+    return findings
+
+def check(pattern, simplify=True):
+    "raise BacktrackingError if pattern may backtrack exponentially"
+    findings = [finding for finding in analyze(pattern, simplify)
+                if finding.complexity == exponential]
+    if findings:
+        raise BacktrackingError(findings)
+
+
+def _lead(node, info):
+    "characters which may start a match of node, as far as what precedes it is concerned"
+    if info.opaque[node]:
+        return _all_chars
+    return info.first[node]
+
+def _follows(node, follow, info):
+    """
+    Return list of (path step, child, follow) for the children of node,
+    where follow holds the characters which may come right after the child,
+    given those which may come after node.
+    """
+    children = _children(node)
+    if isinstance(node, Group):
+        result = []
+        for step, child in reversed(children):
+            result.append((step, child, follow))
+            if child.match_length()[0] == 0:
+                follow = _lead(child, info) | follow
+            else:
+                follow = _lead(child, info)
+        result.reverse()
+        return result
+    elif isinstance(node, Repeating) and (node.max is inf or node.max > 1):
+        step, child = children[0]
+        return [(step, child, _lead(child, info) | follow)]
+    return [(step, child, follow) for step, child in children]
+
+def _rebuild(node, children):
+    "copy of node with children replaced"
+    if all(new is old for new, (step, old) in zip(children, _children(node))):
+        return node
+    elif isinstance(node, Group):
+        return node.copy(children=children)
+    elif isinstance(node, Either):
+        return Either(*children, _factor=node._factor)
+    elif isinstance(node, Repeating):
+        return Repeating(children[0], min=node.min, max=node.max,
+                         greedy=node.greedy, possessive=node.possessive)
+    elif isinstance(node, Yesno):
+        return Yesno(node.previous, *children)
+    return node
+
+def _possessifiable(node, follow, info):
+    if not isinstance(node, Repeating):
+        return False
+    child = Pattern(node.child)
+    return (node.greedy and not node.possessive and not node.is_fixed and
+            isinstance(child, (Literal, Set, StrPattern)) and
+            child.match_length() == (1, 1) and
+            not info.chars[child] & follow)
+
+def possessified(pattern):
+    """
+    Return the toplevel() form of pattern, with greedy repeats of single
+    characters made possessive where the character can't start what follows
+    the repeat - eg [a-z]+= becomes [a-z]++= - so that failing matches don't
+    backtrack through them. What the pattern matches is unchanged. Zero-width
+    assertions and back-references are assumed to allow anything to follow.
+    """
+    root = Pattern(pattern).toplevel()
+    info = _CharInfo(root)
+    nodes, children = _indexed(root)
+    follows = [Intervals()] + [None] * (len(nodes) - 1)
+    for index, node in enumerate(nodes):
+        for child, (step, childnode, follow) in zip(children[index],
+                _follows(node, follows[index], info)):
+            follows[child] = follow
+
+    # children before parents
+    rebuilt = [None] * len(nodes)
+    for index in range(len(nodes) - 1, -1, -1):
+        node = nodes[index]
+        result = _rebuild(node, [rebuilt[child] for child in children[index]])
+        if _possessifiable(node, follows[index], info):
+            result = Repeating(result.child, min=node.min, max=node.max,
+                               possessive=True)
+        rebuilt[index] = result
+    return rebuilt[0]
@@ -7,10 +7,14 @@ Syntactic spice to make regexes more fun to read (and hopefully, more fun to wri
 from __future__ import absolute_import
 import operator
 import itertools
+import functools
 import re
+import threading
+import weakref
+from collections import OrderedDict
 
-from zope.interface import implementer, Interface, Attribute
-from .adapterutil import adapter_for, IObjectSequence, IString
+from .adapterutil import (adapter_for, implementer, Interface, Attribute,
+        IObjectSequence, IString)
 
 class Creator(object):
     def __init__(self, callable, *args, **keywords):
@@ -21,7 +25,7 @@ class Creator(object):
         newargs = args + self.args
         newkeywords = dict(self.keywords)
         newkeywords.update(keywords)
-        return self.callable(*newards, **newkeywords)
+        return self.callable(*newargs, **newkeywords)
 
 class Pattern(Interface):
     ismodifier = Attribute("Whether the pattern is a modifier for the preceeding atom")
@@ -43,8 +47,378 @@ class Pattern(Interface):
         "returns non-forced-atomic version of the pattern: pattern.atoms >= 1"
 
 
-class PatternBase(object):
+class _Infinity(object):
+    """
+    Unbounded repeat count or match length. NOT float('inf'), because that
+    results in a silent error (NaN) when multiplied by 0.
+    """
+    def __repr__(self):
+        return "inf"
+
+    def __reduce__(self):
+        return "inf"
+
+inf = _Infinity()
+
+def add_lengths(*lengths):
+    "add (min, max) match lengths, as when matching the patterns in sequence"
+    minimum = sum(length[0] for length in lengths)
+    if any(length[1] is inf for length in lengths):
+        return (minimum, inf)
+    return (minimum, sum(length[1] for length in lengths))
+
+# interning table for pattern nodes: maps (type, structural key) to the single
+# live node with that structure, so that equal subtrees are the same object and
+# share their cached renderings/compilations
+_interned = weakref.WeakValueDictionary()
+
+def _structural_key(value):
+    """
+    Return a hashable key for a constructor argument. Sequences are keyed by
+    their type and contents, as they get adapted to patterns later on.
+    """
+    if isinstance(value, (list, tuple)):
+        return (type(value),) + tuple(_structural_key(item) for item in value)
+    return value
+
+class _Interning(type):
+    """
+    Metaclass for pattern nodes: constructing a node which is structurally
+    equal to one that is still alive returns the existing node.
+    """
+    def __call__(cls, *args, **keywords):
+        node = type.__call__(cls, *args, **keywords)
+        key = node._key()
+        if key is None:
+            return node
+        return _interned.setdefault((cls, key), node)
+
+# set to False to disable per-node memoization (used by benchmarks to compare)
+memoize = True
+
+def memoized(method):
+    """
+    Cache the result of calling method without arguments on a node. Pattern
+    nodes are immutable, so a cached result is valid for the lifetime of the
+    node and is never invalidated, except by unfreeze(). Calls with arguments
+    are not cached.
+    """
+    attr = "_memo_" + method.__name__
+    @functools.wraps(method)
+    def wrapper(self, *args, **keywords):
+        if args or keywords or not memoize:
+            return method(self, *args, **keywords)
+        try:
+            return self.__dict__[attr]
+        except KeyError:
+            result = self.__dict__[attr] = method(self)
+            return result
+    return wrapper
+
+def _prime(root, name):
+    """
+    Call the memoized method name on every node below root which hasn't
+    cached a result yet, children before parents, using an explicit stack.
+    Computing it for root afterwards only looks one level down, so deep trees
+    don't hit the recursion limit. Nodes' children are listed by
+    _subpatterns().
+    """
+    if not memoize:
+        return
+    attr = "_memo_" + name
+    seen = {}
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            if node is not root:
+                getattr(node, name)()
+            continue
+        stack.append((node, True))
+        for child in node._subpatterns():
+            if (isinstance(child, PatternBase) and id(child) not in seen and
+                    attr not in child.__dict__):
+                # keep child alive, so that its id isn't reused
+                seen[id(child)] = child
+                stack.append((child, False))
+
+def _render_tree(root):
+    """
+    Render root without recursion: nodes are expanded into source fragments
+    and child patterns on an explicit stack, and fragments are appended to a
+    single buffer. Children whose rendering is cached are copied whole.
+    """
+    buffer = []
+    stack = [root]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            buffer.append(item)
+        elif item is not root and "_memo_render" in getattr(item, "__dict__", ()):
+            buffer.append(item.__dict__["_memo_render"])
+        elif hasattr(item, "_render_parts"):
+            stack.extend(reversed(item._render_parts()))
+        else:
+            buffer.append(item.render())
+    return "".join(buffer)
+
+# groups and repeats don't cache fixed strings longer than this; the group
+# containing them joins them itself when it collects required literals
+fixed_string_limit = 256
+
+# StrPattern argument names -> regex finding them in templates
+_placeholder_patterns = {}
+
+def _placeholders(names):
+    try:
+        return _placeholder_patterns[names]
+    except KeyError:
+        # longest first, so a name containing another one wins
+        ordered = sorted(names, key=len, reverse=True)
+        result = re.compile("|".join(re.escape(name) for name in ordered))
+        _placeholder_patterns[names] = result
+        return result
+
+# attributes holding caches, which are not pickled
+_cache_attributes = frozenset(["_rendered", "_compiled", "_hash", "_min_length",
+                               "_result_cache", "_formats"])
+
+# StrPattern.format() results kept per pattern, eg for the {m} and
+# (?P<name>...) patterns used by each Repeating and named Group
+format_cache_size = 256
+
+def _unpickle(cls, state):
+    "recreate pickled node, interning it like a newly constructed one"
+    node = object.__new__(cls)
+    node.__dict__.update(state)
+    key = node._key()
+    if key is None:
+        return node
+    return _interned.setdefault((cls, key), node)
+
+class _Ref(object):
+    "stands for the node at index in a pickled tree's list of nodes"
+    __slots__ = ("index",)
+
+    def __init__(self, index):
+        self.index = index
+
+    def __reduce__(self):
+        return (_Ref, (self.index,))
+
+def _pickled_state(node):
+    return dict((attr, value) for attr, value in node.__dict__.items()
+                if attr not in _cache_attributes and not attr.startswith("_memo_"))
+
+def _state_nodes(value):
+    "nodes in value, looking inside tuples, lists and dicts"
+    if isinstance(value, PatternBase):
+        return [value]
+    elif type(value) in (tuple, list):
+        return [node for item in value for node in _state_nodes(item)]
+    elif type(value) is dict:
+        return [node for item in value.values() for node in _state_nodes(item)]
+    return []
+
+def _encode(value, indices):
+    "value with the nodes in it replaced by _Refs to their indices"
+    if isinstance(value, PatternBase):
+        return _Ref(indices[id(value)])
+    elif type(value) in (tuple, list):
+        return type(value)(_encode(item, indices) for item in value)
+    elif type(value) is dict:
+        return dict((key, _encode(item, indices)) for key, item in value.items())
+    return value
+
+def _decode(value, nodes):
+    if isinstance(value, _Ref):
+        return nodes[value.index]
+    elif type(value) in (tuple, list):
+        return type(value)(_decode(item, nodes) for item in value)
+    elif type(value) is dict:
+        return dict((key, _decode(item, nodes)) for key, item in value.items())
+    return value
+
+def _flatten_tree(root):
+    """
+    Return the nodes below root as a list of (class, state), children before
+    parents and root last, with the nodes in each state replaced by _Refs.
+    Pickling the list doesn't recurse down the tree, however deep it is.
+    """
+    order = []
+    indices = {}
+    stack = [(root, None)]
+    while stack:
+        node, state = stack.pop()
+        if id(node) in indices:
+            continue
+        elif state is not None:
+            indices[id(node)] = len(order)
+            order.append((type(node), state))
+            continue
+        state = _pickled_state(node)
+        stack.append((node, state))
+        for child in reversed(_state_nodes(state)):
+            if id(child) not in indices:
+                stack.append((child, None))
+    return [(cls, _encode(state, indices)) for cls, state in order]
+
+def _unpickle_tree(nodes):
+    "recreate the tree pickled by _flatten_tree; returns its root"
+    result = []
+    for cls, state in nodes:
+        result.append(_unpickle(cls, _decode(state, result)))
+    return result[-1]
+
+# when set, search() and match() call instrument_hook(pattern, function, text,
+# flags, engine) instead of function(text, flags, engine); see instrument
+instrument_hook = None
+
+def _re_engine(pattern, flags):
+    return pattern.compile(flags)
+
+def _dfa_engine(pattern, flags):
+    from .dfa import matcher
+    return matcher(pattern, flags)
+
+# matching engines: name -> factory(pattern, flags) returning an object with
+# search, match, fullmatch and finditer methods like a compiled regex's
+engines = {"re": _re_engine, "dfa": _dfa_engine}
+
+# set to True to make freeze() raise analysis.BacktrackingError for patterns
+# which may backtrack exponentially
+strict = False
+
+class CompileCache(object):
+    """
+    Bounded LRU cache of compiled regexes, keyed by (source, flags), shared
+    by all patterns. re's own cache is small and is cleared entirely when
+    full, which makes it thrash when thousands of patterns are generated.
+    Thread-safe.
+    """
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compile(self, source, flags=0):
+        key = (source, flags)
+        with self._lock:
+            try:
+                compiled = self._entries.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                self._entries[key] = compiled
+                return compiled
+            self.misses += 1
+        # compile outside the lock, it may take a while
+        compiled = re.compile(source, flags)
+        with self._lock:
+            self._entries[key] = compiled
+            self._evict()
+        return compiled
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        "drop all entries and reset the counters"
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def prewarm(self, patterns, flags=0):
+        """
+        Compile patterns (pattern objects or (pattern, flags) pairs), eg at
+        startup, so later uses hit the cache. Returns the number compiled.
+        """
+        count = 0
+        for pattern in patterns:
+            patternflags = flags
+            if isinstance(pattern, tuple) and len(pattern) == 2 and isinstance(pattern[1], int):
+                pattern, patternflags = pattern
+            Pattern(pattern).freeze(patternflags)
+            count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries),
+                    "maxsize": self.maxsize}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __repr__(self):
+        return ("<CompileCache size=%(size)d/%(maxsize)d hits=%(hits)d "
+                "misses=%(misses)d evictions=%(evictions)d>" % self.stats())
+
+compile_cache = CompileCache()
+
+
+class PatternBase(_Interning("_PatternRoot", (object,), {})):
+    """
+    Base class for pattern nodes. Nodes are immutable once constructed; nodes
+    returning a structural key from _key() are interned, so equal nodes are
+    the same object.
+    """
     ismodifier = False
+    # resultcache.ResultCache, when enabled with cache_results()
+    _result_cache = None
+
+    def _key(self):
+        """
+        Return hashable structural key for this node, or None to compare by
+        identity. Subclasses must not change the result after __init__.
+        """
+        return None
+
+    def __eq__(self, other):
+        if other is self:
+            return True
+        elif type(other) is not type(self):
+            return False
+        key = self._key()
+        return key is not None and key == other._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        """
+        Pickle without cached renderings and compiled regexes; they are
+        recomputed lazily after unpickling. The tree is pickled as a flat
+        list of its nodes, so deep trees don't hit the recursion limit.
+        """
+        return (_unpickle_tree, (_flatten_tree(self),))
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            key = self._key()
+            if key is None:
+                self._hash = object.__hash__(self)
+            else:
+                self._hash = hash((type(self), key))
+            return self._hash
+
     @property
     def compiled(self):
         """
@@ -69,11 +443,45 @@ class PatternBase(object):
         return hasattr(self, "_rendered")
         #herp
 
-    def freeze(self):
+    def freeze(self, flags=0):
+        """
+        Render and compile self, and return the regex compiled with flags.
+        Flags aren't stored on the node, as nodes are shared; compiling with
+        flags goes through compile_cache.
+        """
+        if strict:
+            from .analysis import check
+            check(self)
         self._rendered = self.toplevel().render()
-        self._compiled = re.compile(self._rendered)
+        if self.is_bytes():
+            # bytes patterns are rendered with each byte as the latin-1
+            # character of the same value
+            self._rendered = self._rendered.encode("latin-1")
+        self._compiled = compile_cache.compile(self._rendered)
+        self._min_length = self.match_length()[0]
+        if flags:
+            return compile_cache.compile(self._rendered, flags)
+        return self._compiled
+
+    def compile(self, flags=0):
+        "Return the regex for self compiled with re flags"
+        if not flags:
+            return self.compiled
+        return compile_cache.compile(self.rendered, flags)
+
+    def matcher(self, engine="re", flags=0):
+        """
+        Return object with search/match/fullmatch/finditer for self, from
+        the named engine: "re" returns the compiled regex, "dfa" a
+        dfa.DFAMatcher, which matches in linear time without backtracking.
+        """
+        try:
+            factory = engines[engine]
+        except KeyError:
+            raise ValueError("unknown engine %r" % (engine,))
+        return factory(self, flags)
 
-    def unfreeze():
+    def unfreeze(self):
         try:
             del self._rendered
         except AttributeError:
@@ -82,6 +490,8 @@ class PatternBase(object):
             del self._compiled
         except AttributeError:
             pass
+        for attr in [attr for attr in self.__dict__ if attr.startswith("_memo_")]:
+            del self.__dict__[attr]
 
     def simplified(self):
         """
@@ -90,6 +500,70 @@ class PatternBase(object):
         """
         return self
 
+    def _subpatterns(self):
+        "child patterns, for walking the tree without recursion"
+        return []
+
+    @memoized
+    def _mode(self):
+        """
+        Return bytes or str, the type of text self matches, or None if it
+        has no literal text of its own (eg character classes). Raises
+        TypeError if bytes and str parts are mixed.
+        """
+        _prime(self, "_mode")
+        mode = None
+        for child in self._subpatterns():
+            childmode = Pattern(child)._mode()
+            if childmode is None:
+                continue
+            elif mode is not None and childmode is not mode:
+                raise TypeError("can't mix bytes and str patterns: %r" % (self,))
+            mode = childmode
+        return mode
+
+    def is_bytes(self):
+        "whether self is a bytes pattern, rendering and compiling to bytes"
+        return self._mode() is bytes
+
+    @memoized
+    def render(self):
+        """
+        Return regex source for this pattern. Leaf patterns override this;
+        others provide _render_parts(), and are rendered iteratively.
+        """
+        return _render_tree(self)
+
+    def _render_parts(self):
+        """
+        Return list of source strings and child patterns which, rendered in
+        order, make up this pattern.
+        """
+        return [self.render()]
+
+    def _fixed_string(self):
+        "the only string this pattern matches, or None if it isn't a fixed literal"
+        return None
+
+    def match_length(self):
+        """
+        Return (min, max) length of strings this pattern can match; max is
+        inf if unbounded. Patterns which can't tell return (0, inf).
+        """
+        return (0, inf)
+
+    def required_literals(self):
+        """
+        Return frozenset of strings which every match of this pattern
+        contains.
+        """
+        return frozenset()
+
+    @property
+    def bounded(self):
+        "whether the length of matches of this pattern has an upper bound"
+        return self.match_length()[1] is not inf
+
     @property
     def atoms(self):
         """
@@ -97,6 +571,7 @@ class PatternBase(object):
         """
         return 1
 
+    @memoized
     def atomized(self):
         """
         Ensure atomic version of self - wrap in a group if necessary, etc
@@ -117,6 +592,7 @@ class PatternBase(object):
         """
         return self
 
+    @memoized
     def toplevel(self):
         """
         Return version of self suitable for use as the top level of a pattern.
@@ -125,86 +601,316 @@ class PatternBase(object):
         return self.simplified().deatomized()
 
     def warn(self, message):
-        print "herp derp %s" % message
+        print("herp derp %s" % message)
 
     def __str__(self):
         return self.render()
 
-    def search(self, text):
-        return self.compiled.search(text)
-
-    def match(self, text):
-        return self.compiled.match(text)
+    def search(self, text, flags=0, engine="re"):
+        function = self._search if self._result_cache is None else self._result_cache.search
+        if instrument_hook is not None:
+            return instrument_hook(self, function, text, flags, engine)
+        return function(text, flags, engine)
+
+    def match(self, text, flags=0, engine="re"):
+        function = self._match if self._result_cache is None else self._result_cache.match
+        if instrument_hook is not None:
+            return instrument_hook(self, function, text, flags, engine)
+        return function(text, flags, engine)
     __contains__ = match
 
+    def cache_results(self, maxsize=1024, maxmemory=None):
+        """
+        Make search() and match() cache their results per input text, and
+        return the resultcache.ResultCache. As nodes are shared, this
+        applies to all equal patterns. uncache_results() turns it off.
+        """
+        from .resultcache import ResultCache
+        self._result_cache = ResultCache(self, maxsize, maxmemory)
+        return self._result_cache
+
+    def uncache_results(self):
+        self.__dict__.pop("_result_cache", None)
+
+    def _search(self, text, flags=0, engine="re"):
+        if engine != "re":
+            compiled = self.matcher(engine, flags)
+        else:
+            compiled = self.compile(flags) if flags else self.compiled
+        if len(text) < self._min_length:
+            self._check_text(text)
+            return None
+        return compiled.search(text)
+
+    def _match(self, text, flags=0, engine="re"):
+        if engine != "re":
+            compiled = self.matcher(engine, flags)
+        else:
+            compiled = self.compile(flags) if flags else self.compiled
+        if len(text) < self._min_length:
+            self._check_text(text)
+            return None
+        return compiled.match(text)
+
+    def _check_text(self, text):
+        """
+        Raise TypeError, as re would, if text is str and self a bytes
+        pattern or vice versa; for texts rejected without running re.
+        """
+        if isinstance(text, str) == self.is_bytes():
+            raise TypeError("can't match a %s pattern against %s"
+                            % ("bytes" if self.is_bytes() else "str", type(text).__name__))
+
+    def match_many(self, texts, **keywords):
+        "Return boolean array of whether self matches each of texts; see batch"
+        from .batch import match_many
+        return match_many(self, texts, **keywords)
+
+    def search_many(self, texts, **keywords):
+        "Return boolean array of whether self is found in each of texts; see batch"
+        from .batch import search_many
+        return search_many(self, texts, **keywords)
+
+    def analyze(self):
+        """
+        Return list of the parts of this pattern which may backtrack
+        excessively; see analysis.analyze
+        """
+        from .analysis import analyze
+        return analyze(self)
+
+    def possessified(self):
+        """
+        Return toplevel version of self with repeats made possessive where
+        that can't change the result; see analysis.possessified
+        """
+        from .analysis import possessified
+        return possessified(self)
+
+    def optimized(self):
+        """
+        Return toplevel version of self, rewritten by the optimizer passes
+        to a shorter equivalent; see optimize.Optimizer
+        """
+        from .optimize import optimize
+        return optimize(self)
+
+    def prefiltered(self, flags=0):
+        """
+        Return a Prefilter, with search/match/finditer which check for the
+        pattern's required literals before running the regex
+        """
+        from .prefilter import Prefilter
+        return Prefilter(self, flags)
+
+    def scan_stream(self, stream, **keywords):
+        """
+        Yield matches in file-like object stream, reading it in chunks; see
+        scanning.scan_stream
+        """
+        from .scanning import scan_stream
+        return scan_stream(self, stream, **keywords)
+
+    def scan_file(self, path, **keywords):
+        """
+        Yield matches in the file at path, reading it in chunks; see
+        scanning.scan_file
+        """
+        from .scanning import scan_file
+        return scan_file(self, path, **keywords)
+
+    def aiter_matches(self, reader, **keywords):
+        """
+        Return async iterator over matches in asyncio stream reader, read
+        and decoded incrementally; see aioscan.aiter_matches
+        """
+        from .aioscan import aiter_matches
+        return aiter_matches(self, reader, **keywords)
+
+    def search_files(self, paths, workers=None, **keywords):
+        """
+        Scan files in a pool of worker processes, yielding (path, matches);
+        see parallel.search_files
+        """
+        from .parallel import search_files
+        return search_files(self, paths, workers=workers, **keywords)
+
+    def finditer_chunks(self, chunks, workers=None, **keywords):
+        """
+        Find matches in each of chunks in a pool of worker processes,
+        yielding (index, matches); see parallel.finditer_chunks
+        """
+        from .parallel import finditer_chunks
+        return finditer_chunks(self, chunks, workers=workers, **keywords)
+
 @implementer(Pattern)
 class StrPattern(PatternBase):
-    def __init__(self, str, ismodifier=False, args=None):
+    """
+    Pattern given as regex source. length is the (min, max) length of its
+    matches, if known - eg (0, 0) for anchors.
+    """
+    length = None
+
+    def __init__(self, str, ismodifier=False, args=None, length=None):
         self.str = str
         self.args = args
         self.ismodifier = ismodifier
+        if length is not None:
+            self.length = length
+
+    def _key(self):
+        args = tuple(sorted(self.args.items())) if self.args else None
+        return (self.str, self.ismodifier, args, self.length)
 
     def format(self, **args):
+        key = tuple(sorted(args.items()))
+        formats = self.__dict__.get("_formats")
+        if formats is None:
+            formats = self._formats = {}
+        try:
+            return formats[key]
+        except KeyError:
+            pass
         d = {}
         if self.args:
             d.update(self.args)
         d.update(args)
-        return StrPattern(self.str, self.doc, self.ismodifier, d)
+        result = type(self)(self.str, self.ismodifier, d, self.length)
+        if len(formats) >= format_cache_size:
+            formats.clear()
+        formats[key] = result
+        return result
+
+    def match_length(self):
+        if self.length is None:
+            return (0, inf)
+        return self.length
 
     def __repr__(self):
         return ("StrPattern(%r, ismodifier=%r, args=%r)" %
                  (self.str, self.ismodifier, self.args))
 
+    @memoized
     def render(self):
-        ret = self.str
-        if self.args:
-            for key, value in self.args.items():
-                if key == "dots":
-                    key = "..."
-                ret = ret.replace(key, str(value))
-        return ret
+        if not self.args:
+            return self.str
+        values = dict(("..." if key == "dots" else key, str(value))
+                      for key, value in self.args.items())
+        # substitute in a single pass, so that values aren't searched for
+        # placeholders themselves
+        placeholders = _placeholders(tuple(sorted(values)))
+        return placeholders.sub(lambda match: values[match.group()], self.str)
+
+    def split(self, *slots):
+        """
+        Render, then split the result around the placeholders named by
+        slots, eg StrPattern("(?:...)").split("dots") returns ["(?:", ")"].
+        """
+        parts = []
+        rest = self.render()
+        for slot in slots:
+            before, _, rest = rest.partition("..." if slot == "dots" else slot)
+            parts.append(before)
+        parts.append(rest)
+        return parts
 
 @implementer(Pattern)
 class Literal(PatternBase):
+    """
+    Text matched literally: a str, or bytes for a bytes pattern. Bytes are
+    kept in str as the latin-1 characters of the same values, so that the
+    rest of the tree handles both alike.
+    """
     def __init__(self, str):
+        self.bytes = isinstance(str, bytes)
+        if self.bytes:
+            str = str.decode("latin-1")
         self.str = str
 
+    def _key(self):
+        return (self.str, self.bytes)
+
     def __repr__(self):
+        if self.bytes:
+            return "Literal(%r)" % self.str.encode("latin-1")
         return "Literal(%r)" % self.str
 
-    def __eq__(self, other):
-        if other is self:
-            return True
-        elif type(other) == Literal:
-            return self.str == other.str
-        else:
-            return False
+    def _like(self, text):
+        "Literal of text (a str) of the same type as self"
+        return Literal(text.encode("latin-1") if self.bytes else text)
 
+    def _mode(self):
+        if self.bytes:
+            return bytes
+        # empty literals are made up during simplification, and fit anywhere
+        return str if self.str else None
+
+    @memoized
     def simplified(self):
         from .repeating import Repeating
         repeat, count = derepeat(self.str)
-        return Repeating(Literal(repeat), count=count)._drop_if_unnecessary()
+        return Repeating(self._like(repeat), count=count)._drop_if_unnecessary()
 
     @property
     def atoms(self):
         return len(self.str)
 
+    def match_length(self):
+        return (len(self.str), len(self.str))
+
+    def required_literals(self):
+        if not self.str:
+            return frozenset()
+        return frozenset([self.str])
+
+    def _fixed_string(self):
+        return self.str
+
+    @memoized
     def render(self):
         return re.escape(self.str)
 
 
 def derepeat(sequence):
+    """
+    Find the shortest subsequence which, repeated, makes up sequence. Returns
+    (subsequence, count); count is 1 if sequence is not a repetition.
+    Works on strings and on tuples/lists of children, in linear time.
+    """
     length = len(sequence)
-    for sublen in range(1, length-1):
-        if length % sublen != 0:
-            continue
-        subcount = length/sublen
-        firstsub = sequence[:sublen]
-        if firstsub * subcount == sequence:
-            return (firstsub, subcount)
+    if length < 2:
+        return (sequence, 1)
+
+    # prefix function (as in Knuth-Morris-Pratt): border[i] is the length of
+    # the longest proper prefix of sequence[:i+1] which is also its suffix
+    border = [0] * length
+    k = 0
+    for i in range(1, length):
+        item = sequence[i]
+        while k and sequence[k] != item:
+            k = border[k - 1]
+        if sequence[k] == item:
+            k += 1
+        border[i] = k
+
+    # the minimal period of the whole sequence is length - border[-1]; it
+    # repeats evenly if it divides the length
+    period = length - border[-1]
+    if period < length and length % period == 0:
+        return (sequence[:period], length // period)
     return (sequence, 1)
 
 
+def _without_substrings(literals):
+    "drop literals contained in other literals: checking those is redundant"
+    literals = sorted(set(literals), key=len, reverse=True)
+    result = []
+    for literal in literals:
+        if not any(literal in longer for longer in result):
+            result.append(literal)
+    return frozenset(result)
+
+
 @adapter_for(IObjectSequence)
 @implementer(Pattern)
 def groupify_sequence(sequence):
@@ -217,3 +923,8 @@ def groupify_sequence(sequence):
 @implementer(Pattern)
 def patternify_string(string):
     return Literal(string).simplified()
+
+@adapter_for(bytes, Pattern)
+@implementer(Pattern)
+def patternify_bytes(string):
+    return Literal(string).simplified()
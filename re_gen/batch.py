@@ -0,0 +1,96 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Match a pattern against many strings at once, eg a column of a table.
+
+Results are a compact boolean array - array("b") of 0/1, or a numpy bool
+array if numpy is installed. Repeated values are matched once: results are
+kept in a dict keyed by the value, which pays off for low-cardinality
+columns (status codes, user agents) and costs hashing every value
+otherwise. By default (fold=None) the first values are sampled to decide;
+pass fold=True or fold=False to force either. With prefilter=True, strings
+too short (or, for fullmatch_many, too long) to match are rejected by
+length alone; that costs a little per value for fast patterns, but saves
+running slow ones (eg engine="dfa").
+"""
+
+from array import array
+
+from .base import inf
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# fold=None samples this many leading values, and folds duplicates only if
+# at most fold_ratio of them are distinct
+fold_sample = 1024
+fold_ratio = 0.5
+
+def _worth_folding(texts):
+    sample = texts[:fold_sample]
+    return len(set(sample)) <= len(sample) * fold_ratio
+
+def _run(test, texts, minimum, maximum, fold):
+    if fold is not False:
+        if not isinstance(texts, (list, tuple)):
+            texts = list(texts)
+        if fold is None:
+            fold = _worth_folding(texts)
+    if fold:
+        # the dict is built and read back at C speed; only distinct values
+        # go through the Python-level loop
+        distinct = dict.fromkeys(texts)
+        for text in distinct:
+            distinct[text] = (minimum <= len(text) <= maximum and
+                              test(text) is not None)
+        return array("b", map(distinct.__getitem__, texts))
+
+    if maximum == float("inf"):
+        if not minimum:
+            return array("b", [test(text) is not None for text in texts])
+        return array("b", [len(text) >= minimum and test(text) is not None
+                           for text in texts])
+    return array("b", [minimum <= len(text) <= maximum and test(text) is not None
+                       for text in texts])
+
+def _many(pattern, method, texts, flags, fold, prefilter, as_numpy, engine, full):
+    matcher = pattern.matcher(engine, flags)
+    minimum, maximum = pattern.match_length()
+    if not prefilter:
+        minimum, maximum = 0, float("inf")
+    elif not full or maximum is inf:
+        # match and search may match a prefix/substring of longer strings
+        maximum = float("inf")
+    result = _run(getattr(matcher, method), texts, minimum, maximum, fold)
+
+    if as_numpy is None:
+        as_numpy = numpy is not None
+    if as_numpy:
+        if numpy is None:
+            raise ImportError("as_numpy=True needs numpy")
+        return numpy.frombuffer(result, dtype=numpy.bool_)
+    return result
+
+def match_many(pattern, texts, flags=0, fold=None, prefilter=False, as_numpy=None,
+               engine="re"):
+    """
+    Return boolean array: whether pattern matches at the start of each of
+    texts. prefilter=True rejects strings shorter than the shortest match
+    without running the regex.
+    """
+    return _many(pattern, "match", texts, flags, fold, prefilter, as_numpy, engine, False)
+
+def search_many(pattern, texts, flags=0, fold=None, prefilter=False, as_numpy=None,
+                engine="re"):
+    "Return boolean array: whether pattern matches anywhere in each of texts"
+    return _many(pattern, "search", texts, flags, fold, prefilter, as_numpy, engine, False)
+
+def fullmatch_many(pattern, texts, flags=0, fold=None, prefilter=False, as_numpy=None,
+                   engine="re"):
+    """
+    Return boolean array: whether pattern matches the whole of each of
+    texts. prefilter=True also rejects strings longer than the longest match.
+    """
+    return _many(pattern, "fullmatch", texts, flags, fold, prefilter, as_numpy, engine, True)
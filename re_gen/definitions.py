@@ -1,15 +1,16 @@
 # Copyright (c) 2012
 # Licensed under the terms of the MIT license; see LICENSE.txt
 
-from .base import StrPattern, CharacterClass
+from .base import StrPattern
+from .sets import CharacterClass
 
-anychar = StrPattern('.')
+anychar = StrPattern('.', length=(1, 1))
 
-linestart = StrPattern('^')
-lineend = StrPattern('$')
+linestart = StrPattern('^', length=(0, 0))
+lineend = StrPattern('$', length=(0, 0))
 
-wordboundary = StrPattern("\\b")
-nonwordboundary = StrPattern("\\B")
+wordboundary = StrPattern("\\b", length=(0, 0))
+nonwordboundary = StrPattern("\\B", length=(0, 0))
 
 digit = CharacterClass("\\d")
 nondigit = CharacterClass("\\D")
@@ -0,0 +1,563 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Matching in linear time, without backtracking, for patterns which are
+plain regular languages: literals, sets, character classes, ".", groups,
+alternations and repeats.
+
+The pattern tree is compiled to a Thompson NFA, which is turned into a DFA
+lazily: DFA states are created, and cached, as the text being searched
+needs them. search() scans the text backwards once with a DFA for the
+reversed pattern to find the leftmost position at which a match starts, then
+forwards from there with a leftmost-first DFA, whose states are lists of NFA
+states in the order re would try them, cut short after the first one which
+accepts. So matches are re's: (?:a|ab) matches "a" in "ab", greedy and
+non-greedy repeats take as much or as little as they would with re. Groups
+don't affect matching; group() and friends ask re to match the span found,
+on demand.
+
+Anything else falls back to re: back-references, conditionals, anchors and
+other zero-width assertions, atomic groups, possessive repeats, repeats of
+patterns which can match nothing, and all re flags. So do patterns whose NFA would have more than max_nfa_states states,
+and - from the call on which that happens - ones whose DFA grows beyond
+max_dfa_states states.
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+
+from .base import Pattern, StrPattern, Literal, inf
+from .grouping import Group, Either
+from .repeating import Repeating
+from .sets import Set, CharacterClass
+from .analysis import class_intervals, _children
+
+max_nfa_states = 100000
+max_dfa_states = 10000
+matcher_cache_size = 64
+
+class Unsupported(Exception):
+    "the pattern can't be matched by the DFA engine"
+
+class TooManyStates(Unsupported):
+    pass
+
+
+class _Charset(object):
+    "code point set with binary search membership test"
+    def __init__(self, intervals):
+        self.firsts = [first for first, last in intervals]
+        self.lasts = [last for first, last in intervals]
+
+    def __contains__(self, codepoint):
+        index = bisect.bisect_right(self.firsts, codepoint) - 1
+        return index >= 0 and codepoint <= self.lasts[index]
+
+def _charset(node):
+    "_Charset of the characters a single-character node matches"
+    if isinstance(node, Set):
+        intervals, classes = node._normalized()
+        for escape in classes:
+            intervals = intervals | class_intervals(escape)
+        if node.invert:
+            intervals = intervals.inverted()
+        return _Charset(intervals)
+    return _Charset(class_intervals(node.render()))
+
+def _check_supported(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Group) and node.atomic:
+            raise Unsupported("atomic groups aren't supported")
+        elif isinstance(node, Repeating) and node.possessive:
+            raise Unsupported("possessive repeats aren't supported")
+        elif (isinstance(node, Repeating) and not node.is_fixed
+                and Pattern(node.child).match_length()[0] == 0):
+            # re stops repeating after an iteration which matched nothing,
+            # where the NFA may go on to a longer one
+            raise Unsupported("repeats of patterns which can match nothing aren't supported")
+        elif isinstance(node, StrPattern) and not (
+                isinstance(node, CharacterClass) or node.render() == "."):
+            raise Unsupported("%s isn't supported" % node.render())
+        elif not isinstance(node, (Literal, Set, StrPattern, Group, Either, Repeating)):
+            raise Unsupported("%s isn't supported" % type(node).__name__)
+        stack.extend(child for step, child in _children(node))
+
+
+class NFA(object):
+    """
+    Thompson NFA. State n has at most one character transition, on the
+    characters in charsets[n] to targets[n], and epsilon transitions to the
+    states in epsilons[n].
+
+    Fragments are (lo, hi, start, end): the states lo <= n < hi, allocated
+    contiguously, with transitions only among themselves, entered at start
+    and left from end, which has no transitions yet.
+    """
+    def __init__(self):
+        self.charsets = []
+        self.targets = []
+        self.epsilons = []
+
+    def add(self):
+        if len(self.charsets) >= max_nfa_states:
+            raise TooManyStates("NFA would have more than %d states" % max_nfa_states)
+        self.charsets.append(None)
+        self.targets.append(None)
+        self.epsilons.append([])
+        return len(self.charsets) - 1
+
+    def clone(self, fragment):
+        lo, hi, start, end = fragment
+        offset = len(self.charsets) - lo
+        for state in range(lo, hi):
+            new = self.add()
+            self.charsets[new] = self.charsets[state]
+            if self.targets[state] is not None:
+                self.targets[new] = self.targets[state] + offset
+            self.epsilons[new] = [target + offset for target in self.epsilons[state]]
+        return (lo + offset, hi + offset, start + offset, end + offset)
+
+    def chars(self, charsets):
+        "fragment matching a character from each of charsets in sequence"
+        start = state = self.add()
+        for charset in charsets:
+            target = self.add()
+            self.charsets[state] = charset
+            self.targets[state] = target
+            state = target
+        return (start, len(self.charsets), start, state)
+
+    def sequence(self, fragments):
+        if not fragments:
+            state = self.add()
+            return (state, state + 1, state, state)
+        for fragment, following in zip(fragments, fragments[1:]):
+            self.epsilons[fragment[3]].append(following[2])
+        return (fragments[0][0], fragments[-1][1], fragments[0][2], fragments[-1][3])
+
+    def alternation(self, fragments):
+        start = self.add()
+        end = self.add()
+        for fragment in fragments:
+            self.epsilons[start].append(fragment[2])
+            self.epsilons[fragment[3]].append(end)
+        return (fragments[0][0], end + 1, start, end)
+
+    def repeat(self, fragment, minimum, maximum, greedy=True):
+        "epsilons out of optional copies go to the next copy first if greedy"
+        count = max(minimum, 1) if maximum is inf else maximum
+        copies = [fragment] + [self.clone(fragment) for index in range(count - 1)]
+        start = self.add()
+        end = self.add()
+        current = start
+        for index, copy in enumerate(copies):
+            if index < minimum:
+                self.epsilons[current].append(copy[2])
+            elif greedy:
+                self.epsilons[current].extend([copy[2], end])
+            else:
+                self.epsilons[current].extend([end, copy[2]])
+            current = copy[3]
+        if maximum is inf and greedy:
+            self.epsilons[current].extend([copies[-1][2], end])
+        elif maximum is inf:
+            self.epsilons[current].extend([end, copies[-1][2]])
+        else:
+            self.epsilons[current].append(end)
+        return (fragment[0], end + 1, start, end)
+
+def build_nfa(root, reverse=False):
+    """
+    Return (nfa, start, accept) for pattern tree root, or for the reverse
+    of the language it matches. Epsilon transitions are listed in the
+    order re would try them.
+    """
+    nfa = NFA()
+    results = []
+    stack = [(root, False)]
+    while stack:
+        node, expanded = stack.pop()
+        children = [child for step, child in _children(node)]
+        if reverse and isinstance(node, Group):
+            children.reverse()
+        if not expanded and children:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        if children:
+            fragments = results[-len(children):]
+            del results[-len(children):]
+        if isinstance(node, Literal):
+            chars = node.str[::-1] if reverse else node.str
+            fragment = nfa.chars([_Charset([(ord(char), ord(char))]) for char in chars])
+        elif isinstance(node, (Set, StrPattern)):
+            fragment = nfa.chars([_charset(node)])
+        elif isinstance(node, Group):
+            fragment = nfa.sequence(fragments if children else [])
+        elif isinstance(node, Either):
+            fragment = nfa.alternation(fragments)
+        elif isinstance(node, Repeating):
+            fragment = nfa.repeat(fragments[0], node.min, node.max, node.greedy)
+        results.append(fragment)
+    fragment, = results
+    return nfa, fragment[2], fragment[3]
+
+
+class LazyDFA(object):
+    """
+    DFA over the subsets of an NFA's states, built as transitions are
+    taken; only states with a character transition, and accept, are kept.
+    An unanchored DFA adds the NFA's start state back in after every
+    character, so it finds matches starting anywhere.
+
+    A leftmost-first DFA keeps its NFA states as a tuple in priority order
+    instead, and drops those after accept: re would take that match before
+    trying them. Its last accepting state before the dead state () marks the
+    end of re's match. It starts from nonempty instead of start where re
+    wouldn't take an empty match.
+
+    Transitions may be taken from several threads at once; new states are
+    created under a lock.
+    """
+    def __init__(self, nfa, start, accept, unanchored=False, leftmost_first=False):
+        self.nfa = nfa
+        self.accept = accept
+        self.leftmost_first = leftmost_first
+        self.sets = []
+        self.index = {}
+        self.transitions = []
+        self.accepting = []
+        self._lock = threading.Lock()
+        startset = self._closure([start])
+        self.restart = startset if unanchored else frozenset()
+        self.start = self._state(startset)
+        self.dead = None if unanchored else self._state(self._closure([]))
+        self.nonempty = self._state(self._closure([start], empty=False))
+
+    def _closure(self, states, empty=True):
+        """
+        states reachable from states, depth first in priority order; without
+        accept unless empty
+        """
+        epsilons = self.nfa.epsilons
+        charsets = self.nfa.charsets
+        seen = set()
+        result = []
+        stack = list(reversed(states))
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            if state == self.accept:
+                if not empty:
+                    continue
+                result.append(state)
+                if self.leftmost_first:
+                    break
+            elif charsets[state] is not None:
+                result.append(state)
+            stack.extend(reversed(epsilons[state]))
+        if self.leftmost_first:
+            return tuple(result)
+        return frozenset(result)
+
+    def _state(self, states):
+        try:
+            return self.index[states]
+        except KeyError:
+            pass
+        if len(self.sets) >= max_dfa_states:
+            raise TooManyStates("DFA would have more than %d states" % max_dfa_states)
+        # complete before it's in index, for readers without the lock
+        self.sets.append(states)
+        self.transitions.append({})
+        self.accepting.append(self.accept in states)
+        self.index[states] = len(self.sets) - 1
+        return len(self.sets) - 1
+
+    def step(self, state, char):
+        "state reached from state on char, creating it if needed"
+        with self._lock:
+            try:
+                return self.transitions[state][char]
+            except KeyError:
+                pass
+            codepoint = ord(char)
+            charsets = self.nfa.charsets
+            targets = self.nfa.targets
+            moved = [targets[nfastate] for nfastate in self.sets[state]
+                     if charsets[nfastate] is not None and codepoint in charsets[nfastate]]
+            result = self._closure(moved)
+            if self.restart:
+                result = frozenset(result) | self.restart
+            result = self._state(result)
+            self.transitions[state][char] = result
+            return result
+
+
+class DFAMatch(object):
+    "a match found by the DFA engine; behaves like an re match object"
+    def __init__(self, matcher, string, start, end, pos, endpos):
+        self.re = matcher
+        self.string = string
+        self.pos = pos
+        self.endpos = endpos
+        self._span = (start, end)
+        self._match = None
+
+    def _regex_match(self):
+        "re match of the same span, for the groups"
+        if self._match is None:
+            self._match = self.re.regex.fullmatch(self.string, *self._span)
+        return self._match
+
+    def group(self, *groups):
+        if not groups or groups == (0,):
+            return self.string[self._span[0]:self._span[1]]
+        return self._regex_match().group(*groups)
+
+    def __getitem__(self, group):
+        return self.group(group)
+
+    def groups(self, default=None):
+        return self._regex_match().groups(default)
+
+    def groupdict(self, default=None):
+        return self._regex_match().groupdict(default)
+
+    def start(self, group=0):
+        if group == 0:
+            return self._span[0]
+        return self._regex_match().start(group)
+
+    def end(self, group=0):
+        if group == 0:
+            return self._span[1]
+        return self._regex_match().end(group)
+
+    def span(self, group=0):
+        return (self.start(group), self.end(group))
+
+    def __repr__(self):
+        return "<DFAMatch span=%r, match=%r>" % (self._span, self.group())
+
+
+class DFAMatcher(object):
+    """
+    search/match/fullmatch/finditer for a pattern, using lazily built DFAs
+    where the pattern allows it and re otherwise; fallback_reason says why
+    re is used. Use matcher() to get a cached instance. Thread-safe.
+    """
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.regex = pattern.compile(flags)
+        self.fallback_reason = None
+        self.forward = self.whole = self.backward = None
+        try:
+            if flags:
+                raise Unsupported("re flags aren't supported")
+            if pattern.is_bytes():
+                raise Unsupported("bytes patterns aren't supported")
+            root = pattern.toplevel()
+            _check_supported(root)
+            nfa, start, accept = build_nfa(root)
+            self.forward = LazyDFA(nfa, start, accept, leftmost_first=True)
+            # fullmatch() succeeds if any way of matching reaches the end
+            self.whole = LazyDFA(nfa, start, accept)
+            self.backward = LazyDFA(*build_nfa(root, reverse=True), unanchored=True)
+        except Unsupported as error:
+            self._fall_back(error)
+
+    @property
+    def uses_dfa(self):
+        return self.fallback_reason is None
+
+    def _fall_back(self, error):
+        # the DFAs are kept for calls already using them in other threads
+        self.fallback_reason = str(error)
+
+    def _bounds(self, text, pos, endpos):
+        if endpos is None or endpos > len(text):
+            endpos = len(text)
+        return max(0, pos), endpos
+
+    def _starts(self, text, pos, endpos):
+        """
+        bytearray marking, for each position from pos to endpos, whether a
+        match starts there; scans text backwards once
+        """
+        dfa = self.backward
+        transitions = dfa.transitions
+        accepting = dfa.accepting
+        starts = bytearray(endpos - pos + 1)
+        state = dfa.start
+        starts[endpos - pos] = accepting[state]
+        for index in range(endpos - 1, pos - 1, -1):
+            char = text[index]
+            try:
+                state = transitions[state][char]
+            except KeyError:
+                state = dfa.step(state, char)
+            if accepting[state]:
+                starts[index - pos] = 1
+        return starts
+
+    def _leftmost_start(self, text, pos, endpos):
+        dfa = self.backward
+        transitions = dfa.transitions
+        accepting = dfa.accepting
+        state = dfa.start
+        result = endpos if accepting[state] else -1
+        for index in range(endpos - 1, pos - 1, -1):
+            char = text[index]
+            try:
+                state = transitions[state][char]
+            except KeyError:
+                state = dfa.step(state, char)
+            if accepting[state]:
+                result = index
+        return result
+
+    def _end(self, text, start, endpos, empty=True):
+        "end of re's match starting at start, or -1; non-empty unless empty"
+        dfa = self.forward
+        transitions = dfa.transitions
+        accepting = dfa.accepting
+        dead = dfa.dead
+        state = dfa.start if empty else dfa.nonempty
+        result = start if accepting[state] else -1
+        for index in range(start, endpos):
+            char = text[index]
+            try:
+                state = transitions[state][char]
+            except KeyError:
+                state = dfa.step(state, char)
+            if state == dead:
+                break
+            if accepting[state]:
+                result = index + 1
+        return result
+
+    def _dfa_call(self, method, text, pos, endpos):
+        """
+        run method(text, pos, endpos) with the DFAs, or return (False, None)
+        if the re engine must be used
+        """
+        if self.fallback_reason is None:
+            try:
+                return True, method(text, *self._bounds(text, pos, endpos))
+            except TooManyStates as error:
+                self._fall_back(error)
+        return False, None
+
+    def _regex_args(self, pos, endpos):
+        return (pos,) if endpos is None else (pos, endpos)
+
+    def search(self, text, pos=0, endpos=None):
+        done, result = self._dfa_call(self._search, text, pos, endpos)
+        if done:
+            return result
+        return self.regex.search(text, *self._regex_args(pos, endpos))
+
+    def _search(self, text, pos, endpos):
+        start = self._leftmost_start(text, pos, endpos)
+        if start == -1:
+            return None
+        return DFAMatch(self, text, start, self._end(text, start, endpos), pos, endpos)
+
+    def match(self, text, pos=0, endpos=None):
+        done, result = self._dfa_call(self._match, text, pos, endpos)
+        if done:
+            return result
+        return self.regex.match(text, *self._regex_args(pos, endpos))
+
+    def _match(self, text, pos, endpos):
+        end = self._end(text, pos, endpos)
+        if end == -1:
+            return None
+        return DFAMatch(self, text, pos, end, pos, endpos)
+
+    def fullmatch(self, text, pos=0, endpos=None):
+        done, result = self._dfa_call(self._fullmatch, text, pos, endpos)
+        if done:
+            return result
+        return self.regex.fullmatch(text, *self._regex_args(pos, endpos))
+
+    def _fullmatch(self, text, pos, endpos):
+        dfa = self.whole
+        transitions = dfa.transitions
+        state = dfa.start
+        for index in range(pos, endpos):
+            char = text[index]
+            try:
+                state = transitions[state][char]
+            except KeyError:
+                state = dfa.step(state, char)
+            if state == dfa.dead:
+                return None
+        if not dfa.accepting[state]:
+            return None
+        return DFAMatch(self, text, pos, endpos, pos, endpos)
+
+    def finditer(self, text, pos=0, endpos=None):
+        """
+        Yield non-overlapping matches, left to right. Starts are found in
+        one backward scan; each match is then found forwards, which can
+        read past its end up to where re would stop backtracking. As with
+        re, an empty match is followed by a non-empty one from the same
+        position if there is one.
+        """
+        done, starts = self._dfa_call(self._starts, text, pos, endpos)
+        if not done:
+            for match in self.regex.finditer(text, *self._regex_args(pos, endpos)):
+                yield match
+            return
+        pos, endpos = self._bounds(text, pos, endpos)
+        index = 0
+        while index <= endpos - pos:
+            index = starts.find(1, index)
+            if index == -1:
+                break
+            start = pos + index
+            end = self._end(text, start, endpos)
+            yield DFAMatch(self, text, start, end, pos, endpos)
+            if end == start:
+                end = self._end(text, start, endpos, empty=False)
+                if end != -1:
+                    yield DFAMatch(self, text, start, end, pos, endpos)
+            index = end - pos if end > start else start - pos + 1
+
+    def __repr__(self):
+        if self.fallback_reason is None:
+            return "<DFAMatcher %r, %d+%d states>" % (
+                self.regex.pattern, len(self.forward.sets), len(self.backward.sets))
+        return "<DFAMatcher %r, using re: %s>" % (self.regex.pattern, self.fallback_reason)
+
+
+_matchers = OrderedDict()
+_matchers_lock = threading.Lock()
+
+def matcher(pattern, flags=0):
+    "return cached DFAMatcher for pattern, keeping the last matcher_cache_size used"
+    key = (Pattern(pattern), flags)
+    with _matchers_lock:
+        try:
+            result = _matchers.pop(key)
+        except KeyError:
+            pass
+        else:
+            _matchers[key] = result
+            return result
+    # built outside the lock, it may take a while; the first one cached wins
+    result = DFAMatcher(key[0], flags)
+    with _matchers_lock:
+        result = _matchers.pop(key, result)
+        _matchers[key] = result
+        while len(_matchers) > matcher_cache_size:
+            _matchers.popitem(last=False)
+    return result
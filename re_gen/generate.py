@@ -0,0 +1,282 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Generate random strings which match a pattern, and near misses which don't,
+eg to build benchmark corpora.
+
+    generator = Generator(pattern, seed=1)
+    matching = list(generator.positives(100000))
+    failing = list(generator.negatives(100000))
+
+The pattern tree is compiled once into nested closures, one per node, so
+generating a sample is a few function calls per node. Unbounded repeats
+are capped at repeat_cap extra repetitions. Characters for sets, character
+classes and "." are drawn from alphabet (printable ascii by default), or
+from the set's own ranges where it has no classes.
+
+Positives are checked with fullmatch, and regenerated if they don't match -
+which can happen with anchors, lookarounds' neighbours, atomic groups and
+possessive repeats. Negatives are positives with one random edit (a
+character inserted, deleted, replaced or swapped, or the end cut off) which
+no longer fullmatch. Samples of bytes patterns are bytes.
+"""
+
+import bisect
+import random
+import re
+import string
+
+from .base import Pattern, Literal, StrPattern, inf
+from .grouping import Group, Either, PrevGroup, Yesno
+from .repeating import Repeating
+from .sets import Set, CharacterClass
+
+default_alphabet = string.printable
+# sets with at most this many characters are sampled from a string of them,
+# larger ones by choosing a range weighted by its size
+pool_limit = 4096
+max_attempts = 100
+
+class GenerationError(Exception):
+    pass
+
+class _Retry(Exception):
+    "raised while generating a sample which can't be completed"
+
+
+class Generator(object):
+    """
+    Random positive and negative samples for pattern. flags are the re
+    flags the samples are checked with. Not thread-safe; use one Generator
+    per thread.
+    """
+    def __init__(self, pattern, seed=None, repeat_cap=8, alphabet=default_alphabet,
+                 flags=0, verify=True):
+        self.pattern = Pattern(pattern)
+        self.rng = random.Random(seed)
+        self.repeat_cap = repeat_cap
+        self.alphabet = alphabet
+        self.verify = verify
+        self.fullmatch = self.pattern.compile(flags).fullmatch
+        self.binary = self.pattern.is_bytes()
+        self.retries = 0
+        self._group_count = 0
+        self._generate = self._compile(self.pattern.toplevel())
+
+    ### ------ Compiling the tree ------
+
+    def _compile(self, node):
+        node = Pattern(node)
+        if isinstance(node, Literal):
+            return self._literal(node.str)
+        elif isinstance(node, Set):
+            return self._chars(self._set_pool(node))
+        elif isinstance(node, StrPattern):
+            if node.length == (0, 0):
+                # anchors and word boundaries match no characters
+                return lambda out, groups: None
+            elif node.length == (1, 1):
+                return self._chars(self._filtered(node.render()))
+            raise GenerationError("can't generate strings for %r" % (node,))
+        elif isinstance(node, Group):
+            return self._group(node)
+        elif isinstance(node, Either):
+            return self._either(node)
+        elif isinstance(node, Repeating):
+            return self._repeating(node)
+        elif isinstance(node, PrevGroup):
+            return self._backreference(node.name)
+        elif isinstance(node, Yesno):
+            return self._yesno(node)
+        raise GenerationError("can't generate strings for %r" % (node,))
+
+    def _filtered(self, source):
+        "characters of the alphabet which the one-character regex source matches"
+        matcher = re.compile(source).fullmatch
+        return [char for char in self.alphabet if matcher(char)]
+
+    def _set_pool(self, node):
+        """
+        Return list of characters, or list of (first, last) intervals, to
+        draw characters matching the set from.
+        """
+        if node.invert or any(isinstance(element, CharacterClass) for element in node.elements):
+            return self._filtered(node.render())
+        intervals = list(node.intervals())
+        if sum(last - first + 1 for first, last in intervals) <= pool_limit:
+            return [chr(codepoint) for first, last in intervals
+                    for codepoint in range(first, last + 1)]
+        return intervals
+
+    def _chars(self, pool):
+        if not pool:
+            raise GenerationError("no characters in the alphabet match")
+        random = self.rng.random
+        if isinstance(pool[0], str):
+            if len(pool) == 1:
+                return self._literal(pool[0])
+            size = len(pool)
+            return lambda out, groups: out.append(pool[int(random() * size)])
+
+        starts = []
+        offsets = []
+        total = 0
+        for first, last in pool:
+            starts.append(first)
+            offsets.append(total)
+            total += last - first + 1
+        def chars(out, groups):
+            offset = int(random() * total)
+            index = bisect.bisect_right(offsets, offset) - 1
+            out.append(chr(starts[index] + offset - offsets[index]))
+        return chars
+
+    def _literal(self, text):
+        literal = lambda out, groups: out.append(text)
+        # constant parts of a sequence are joined when it's compiled
+        literal.text = text
+        return literal
+
+    def _group(self, node):
+        if node.capturing:
+            # groups are numbered by their opening parenthesis: before children
+            self._group_count += 1
+            number = self._group_count
+        parts = []
+        for child in node.children:
+            part = self._compile(child)
+            if parts and hasattr(part, "text") and hasattr(parts[-1], "text"):
+                part = self._literal(parts.pop().text + part.text)
+            parts.append(part)
+        if not node.capturing:
+            if len(parts) == 1:
+                return parts[0]
+            def sequence(out, groups):
+                for part in parts:
+                    part(out, groups)
+            return sequence
+
+        name = node.name
+        def capture(out, groups):
+            start = len(out)
+            for part in parts:
+                part(out, groups)
+            groups[number] = text = "".join(out[start:])
+            if name:
+                groups[name] = text
+        return capture
+
+    def _either(self, node):
+        branches = [self._compile(branch) for branch in node.branches]
+        random = self.rng.random
+        size = len(branches)
+        return lambda out, groups: branches[int(random() * size)](out, groups)
+
+    def _repeating(self, node):
+        part = self._compile(node.child)
+        minimum = node.min
+        extra = self.repeat_cap if node.max is inf else node.max - minimum
+        random = self.rng.random
+        def repeat(out, groups):
+            for count in range(minimum + int(random() * (extra + 1))):
+                part(out, groups)
+        return repeat
+
+    def _key(self, name):
+        return int(name) if str(name).isdigit() else name
+
+    def _backreference(self, name):
+        key = self._key(name)
+        def backreference(out, groups):
+            try:
+                out.append(groups[key])
+            except KeyError:
+                # a reference to a group which didn't match never matches
+                raise _Retry()
+        return backreference
+
+    def _yesno(self, node):
+        key = self._key(node.previous)
+        yes = self._compile(node.yespattern)
+        no = self._compile(node.nopattern)
+        def yesno(out, groups):
+            if key in groups:
+                yes(out, groups)
+            else:
+                no(out, groups)
+        return yesno
+
+    ### ------ Samples ------
+
+    def positive(self):
+        "Return random string which fullmatches the pattern"
+        generate = self._generate
+        for attempt in range(max_attempts):
+            out = []
+            try:
+                generate(out, {})
+            except _Retry:
+                self.retries += 1
+                continue
+            text = "".join(out)
+            if self.binary:
+                text = text.encode("latin-1")
+            if not self.verify or self.fullmatch(text) is not None:
+                return text
+            self.retries += 1
+        raise GenerationError("no matching string generated in %d attempts" % max_attempts)
+
+    def _mutated(self, text):
+        rng = self.rng
+        char = self.alphabet[int(rng.random() * len(self.alphabet))]
+        if not text:
+            return char
+        position = int(rng.random() * len(text))
+        edit = int(rng.random() * 5)
+        if edit == 0:
+            return text[:position] + char + text[position:]
+        elif edit == 1:
+            return text[:position] + text[position + 1:]
+        elif edit == 2:
+            return text[:position] + char + text[position + 1:]
+        elif edit == 3 and len(text) > 1:
+            position = min(position, len(text) - 2)
+            return (text[:position] + text[position + 1] + text[position] +
+                    text[position + 2:])
+        return text[:position]
+
+    def negative(self):
+        "Return random string, one edit away from a match, which doesn't fullmatch"
+        for attempt in range(max_attempts):
+            text = self.positive()
+            if self.binary:
+                text = self._mutated(text.decode("latin-1")).encode("latin-1")
+            else:
+                text = self._mutated(text)
+            if self.fullmatch(text) is None:
+                return text
+            self.retries += 1
+        raise GenerationError("no near miss generated in %d attempts" % max_attempts)
+
+    def positives(self, count):
+        positive = self.positive
+        for index in range(count):
+            yield positive()
+
+    def negatives(self, count):
+        negative = self.negative
+        for index in range(count):
+            yield negative()
+
+    def samples(self, count, negative_ratio=0.5):
+        "Yield count (text, matches) pairs, negative_ratio of them non-matching"
+        random = self.rng.random
+        for index in range(count):
+            if random() < negative_ratio:
+                yield self.negative(), False
+            else:
+                yield self.positive(), True
+
+def corpus(pattern, count, seed=0, negative_ratio=0.5, **keywords):
+    "Return list of count (text, matches) pairs for pattern; see Generator"
+    return list(Generator(pattern, seed=seed, **keywords).samples(count, negative_ratio))
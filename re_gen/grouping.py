@@ -1,14 +1,18 @@
 # Copyright (c) 2012
 # Licensed under the terms of the MIT license; see LICENSE.txt
 
-from .base import StrPattern, Pattern, PatternBase, derepeat
+from .base import (StrPattern, Pattern, PatternBase, Literal, derepeat,
+        _structural_key, memoized, inf, add_lengths, _without_substrings, _prime,
+        fixed_string_limit)
 from .repeating import Repeating
-
-from zope.interface import implementer
+from .sets import Set
+from .adapterutil import implementer
 
 capturing_pattern = StrPattern("(...)")
 noncapturing_pattern = StrPattern("(?:...)")
 named_pattern = StrPattern("(?P<name>...)")
+# atomic groups need python 3.11
+atomic_pattern = StrPattern("(?>...)")
 
 class IGroup(Pattern):
     def _merge_nonatomic_child():
@@ -16,15 +20,32 @@ class IGroup(Pattern):
 
 @implementer(IGroup)
 class Group(PatternBase):
+    """
+    Sequence of children, matched in order. By default the group is
+    capturing; capturing=False makes it non-capturing, name=... a named
+    group, and atomic=True an atomic group, which once matched is never
+    backtracked into. Atomic groups are non-capturing.
+
+    Not to be confused with _atomic, which says whether the group is wrapped
+    in parentheses at all.
+    """
     def __init__(self, *children, **args):
         self._init(**args)
         self.children = children
 
-    def _init(self, capturing=True, name=None, _atomic=True):
+    def _init(self, capturing=True, name=None, atomic=False, _atomic=True):
+        self.atomic = atomic
+        if atomic:
+            if name:
+                raise Exception("Groups cannot be both named and atomic")
+            capturing = False
+            _atomic = True
         self.capturing = capturing
         self.name = name
         if name and not capturing:
             raise Exception("Groups cannot be both named and non-capturing")
+        elif atomic:
+            self.pattern = atomic_pattern
         elif name:
             # TODO: assert isidentifier(name)
             self.pattern = named_pattern.format(name=name)
@@ -38,14 +59,20 @@ class Group(PatternBase):
             self.capturing = False
         self._atomic = _atomic
 
+    def _key(self):
+        return (_structural_key(self.children), self.capturing, self.name,
+                self.atomic, self._atomic)
+
     def copy(self, children=None, **keywords):
         if children == None:
             children = self.children
 
-        args = dict(_atomic=self._atomic, capturing=self.capturing, name=self.name)
+        args = dict(_atomic=self._atomic, capturing=self.capturing, name=self.name,
+                    atomic=self.atomic)
         args.update(keywords)
         return Group(*children, **args)
 
+    @memoized
     def atomized(self):
         if not self._atomic:
             return self.copy(_atomic=True)
@@ -53,7 +80,10 @@ class Group(PatternBase):
             return self
 
     def deatomized(self, _warn=True):
-        if self._atomic:
+        if self.atomic:
+            # can't drop the parentheses without dropping atomicity
+            result = self
+        elif self._atomic:
             if self.capturing and _warn:
                 self.warn("de-atomizing a capturing group - capturing-ness will be lost!")
             result = self.copy(_atomic=False)
@@ -61,6 +91,7 @@ class Group(PatternBase):
             result = self
         return result._drop_if_unnecessary()
 
+    @memoized
     def toplevel(self):
         if self.name and self.capturing:
             self.warn("using a named group as top-level - sub-groups will have numerical indices starting from 2!!")
@@ -83,6 +114,43 @@ class Group(PatternBase):
         else:
             return sum(child.atoms for child in self.children)
 
+    @memoized
+    def match_length(self):
+        _prime(self, "match_length")
+        return add_lengths(*[Pattern(child).match_length() for child in self.children])
+
+    @memoized
+    def required_literals(self):
+        """
+        Literals required by the children; runs of adjacent fixed strings
+        are joined, as a longer literal rejects more inputs.
+        """
+        _prime(self, "_fixed_string")
+        _prime(self, "required_literals")
+        literals = []
+        run = ""
+        for child in self.children:
+            child = Pattern(child)
+            text = child._fixed_string()
+            if text is not None:
+                run += text
+                continue
+            if run:
+                literals.append(run)
+                run = ""
+            literals.extend(child.required_literals())
+        if run:
+            literals.append(run)
+        return _without_substrings(literals)
+
+    @memoized
+    def _fixed_string(self):
+        _prime(self, "_fixed_string")
+        parts = [Pattern(child)._fixed_string() for child in self.children]
+        if None in parts or sum(map(len, parts)) > fixed_string_limit:
+            return None
+        return "".join(parts)
+
     ### ------ Simplification ------
 
     def _merge_nonatomic_child(self):
@@ -98,8 +166,14 @@ class Group(PatternBase):
         if children == None:
             children = self.children
 
+        if self.atomic:
+            if not any(_backtracks(Pattern(child)) for child in children):
+                # redundant: nothing in it could be backtracked into anyway
+                return Group(*children, capturing=False)._drop_if_unnecessary()
+            return Group(*children, atomic=True)
+
         if (not self.capturing and len(children) == 1 and
-            (not self._atomic or self.children[0].atoms <= 1)):
+            (not self._atomic or Pattern(children[0]).atoms <= 1)):
             return children[0]
         else:
             return Group(*children, _atomic=self._atomic, capturing=self.capturing,
@@ -112,12 +186,25 @@ class Group(PatternBase):
         """
         if children == None:
             children = self.children
-        return derepeat(children)
+        if self.atomic:
+            # (?>xx) may backtrack into the first x; (?>x){2} may not
+            return (children, 1)
+        # children are interned, so compare them by identity; == compares
+        # structure, recursing down deep children which differ near the leaves
+        repeat, count = derepeat([id(child) for child in children])
+        return (children[:len(repeat)], count)
 
     def _derepeat_post(self, pattern, count):
         """
         finish derepeating by wrapping in Repeating object if necessary
         """
+        if count == 1:
+            if isinstance(pattern, Group) and pattern.capturing:
+                # deatomizing would drop capturing
+                return pattern
+            # drop the parentheses, so that eg a repeat around them can
+            # merge with a repeat inside
+            return pattern.deatomized()
         return Repeating(pattern, count=count)._drop_if_unnecessary()
 
     def derepeated(self):
@@ -143,7 +230,10 @@ class Group(PatternBase):
             children = self.children
         return [Pattern(child) for child in children]
 
+    @memoized
     def simplified(self, recursive=True, mergechildren=True):
+        if recursive:
+            _prime(self, "simplified")
         children, count = self._derepeat_pre()
         children = self._prerender(children)
         if recursive:
@@ -158,20 +248,18 @@ class Group(PatternBase):
 
     ### ------ Rendering ------
 
-    def render(self):
-        result = []
-        for child in self.children:
-            result.append(Pattern(child).render())
-        resultstr = "".join(result)
-
+    def _render_parts(self):
+        children = [Pattern(child) for child in self.children]
         if not self._atomic:
-            return resultstr
-        else:
-            return self.pattern.format(dots=resultstr).render()
+            return children
+        before, after = self.pattern.split("dots")
+        return [before] + children + [after]
 
     def __repr__(self):
         extra = []
-        if not self.capturing:
+        if self.atomic:
+            extra.append("atomic=True")
+        elif not self.capturing:
             extra.append("capturing=False")
         if self.name:
             extra.append("name=%r" % self.name)
@@ -179,20 +267,225 @@ class Group(PatternBase):
             extra.append("_atomic=False")
         return "Group(%s)" % ", ".join([repr(child) for child in self.children] + extra)
 
+    def _subpatterns(self):
+        return [Pattern(child) for child in self.children]
+
 
 @implementer(Pattern)
 class PrevGroup(PatternBase):
     earliernamed = StrPattern("(?P=name)")
-    earlierid = StrPattern("\\number")
+    # wrapped, so that a following digit isn't read as part of the number
+    earlierid = StrPattern("(?:\\number)")
     def __init__(self, name):
+        self.name = name
         if str(name).isdigit() and int(name):
             self.pattern = self.earlierid.format(number=str(name))
         else:
             self.pattern = self.earliernamed.format(name=name)
 
+    def _key(self):
+        return self.name
+
+    @memoized
     def render(self):
         return self.pattern.render()
 
+@implementer(Pattern)
+class Either(PatternBase):
+    """
+    Alternation - matches any one of its branches.
+
+    When simplified, runs of adjacent literal branches (strings and
+    Literals) are factored into a trie: Either("foobar", "foobaz", "food")
+    becomes foo(?:ba[rz]|d), as a non-atomic group so the common prefix can
+    merge with surrounding literals. A factored run matches the longest of
+    its keywords at a position, and is tried where its branches were, so
+    the other branches keep their order.
+    """
+    def __init__(self, *branches, **args):
+        if not branches:
+            raise Exception("Either needs at least one branch")
+        self.branches = branches
+        self._factor = args.get("_factor", True)
+
+    def _key(self):
+        return (_structural_key(self.branches), self._factor)
+
+    @memoized
+    def required_literals(self):
+        _prime(self, "required_literals")
+        return _common_literals(self.branches)
+
+    def _subpatterns(self):
+        return [Pattern(branch) for branch in self.branches]
+
+    @memoized
+    def match_length(self):
+        _prime(self, "match_length")
+        lengths = [Pattern(branch).match_length() for branch in self.branches]
+        maxima = [length[1] for length in lengths]
+        return (min(length[0] for length in lengths),
+                inf if inf in maxima else max(maxima))
+
+    ### ------ Simplification ------
+
+    @memoized
+    def simplified(self):
+        _prime(self, "simplified")
+        if not self._factor:
+            branches = [Pattern(branch).simplified() for branch in self.branches]
+        else:
+            branches = [Literal(branch) if isinstance(branch, (str, bytes)) else branch
+                        for branch in self.branches]
+            words = [branch for branch in branches if isinstance(branch, Literal)]
+            modes = set(word._mode() for word in words) - set([None])
+            if len(modes) > 1:
+                raise TypeError("can't mix bytes and str patterns: %r" % (self,))
+            binary = bytes in modes
+            # only adjacent literals are factored: moving a literal past
+            # another branch would change which of them is tried first
+            runs = []
+            for branch in branches:
+                if isinstance(branch, Literal) and runs and isinstance(runs[-1], list):
+                    runs[-1].append(branch)
+                elif isinstance(branch, Literal):
+                    runs.append([branch])
+                else:
+                    runs.append(Pattern(branch).simplified())
+            branches = [_factored(run, binary) if isinstance(run, list) else run
+                        for run in runs]
+
+        flattened = []
+        for branch in branches:
+            if isinstance(branch, Either):
+                flattened.extend(branch.branches)
+            else:
+                flattened.append(branch)
+
+        if len(flattened) == 1:
+            return flattened[0]
+        return Either(*flattened, _factor=False)
+
+    ### ------ Rendering ------
+
+    def _render_parts(self):
+        before, after = noncapturing_pattern.split("dots")
+        parts = [before]
+        for branch in self.branches:
+            branch = Pattern(branch)
+            if isinstance(branch, Group) and not branch.capturing and not branch.atomic:
+                # | binds loosest, so the group's own parentheses are redundant
+                parts.extend(Pattern(child) for child in branch.children)
+            else:
+                parts.append(branch)
+            parts.append("|")
+        parts[-1] = after
+        return parts
+
+    def __repr__(self):
+        extra = []
+        if not self._factor:
+            extra.append("_factor=False")
+        return "Either(%s)" % ", ".join([repr(branch) for branch in self.branches] + extra)
+
+AnyOf = Either
+
+def _common_literals(branches):
+    "literals required by every one of branches"
+    result = None
+    for branch in branches:
+        literals = Pattern(branch).required_literals()
+        result = literals if result is None else result & literals
+    return result or frozenset()
+
+
+def _backtracks(pattern):
+    """
+    Whether matching pattern may leave choices to backtrack into - if not,
+    wrapping it in an atomic group changes nothing
+    """
+    if isinstance(pattern, (Literal, Set, PrevGroup)):
+        return False
+    elif isinstance(pattern, StrPattern):
+        return pattern.length is None
+    elif isinstance(pattern, Group):
+        if pattern.atomic:
+            return False
+        return any(_backtracks(Pattern(child)) for child in pattern.children)
+    elif isinstance(pattern, Repeating):
+        if pattern.possessive:
+            return False
+        return not pattern.is_fixed or _backtracks(Pattern(pattern.child))
+    return True
+
+def _factored(words, binary=False):
+    "simplified pattern matching the longest of the Literals words"
+    trie = _make_trie([word.str for word in words])
+    return _sequence_pattern(_trie_sequence(trie, binary), binary).simplified()
+
+def _make_trie(words):
+    "build trie of nested dicts; a None key marks the end of a word"
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = None
+    return trie
+
+def _trie_sequence(node, binary=False):
+    """
+    Return list of items (strings for literal text, or patterns) which in
+    sequence match exactly the suffixes stored in the trie node. binary
+    makes the patterns bytes patterns.
+    """
+    prefix = ""
+    while len(node) == 1 and None not in node:
+        (char, node), = node.items()
+        prefix += char
+
+    alternatives = []
+    tails = []
+    for char in sorted(key for key in node if key is not None):
+        rest = _trie_sequence(node[char], binary)
+        if not rest:
+            tails.append(char)
+        elif isinstance(rest[0], str):
+            alternatives.append([char + rest[0]] + rest[1:])
+        else:
+            alternatives.append([char] + rest)
+    if len(tails) == 1:
+        alternatives.append(tails)
+    elif tails:
+        alternatives.append([Set(*tails, bytes=binary)])
+
+    if not alternatives:
+        suffix = []
+    elif len(alternatives) == 1:
+        suffix = alternatives[0]
+    else:
+        suffix = [Either(*[_sequence_pattern(items, binary) for items in alternatives],
+                         _factor=False)]
+    if None in node and suffix:
+        suffix = [Repeating(_sequence_pattern(suffix, binary), min=0, max=1)]
+
+    if suffix and isinstance(suffix[0], str):
+        return [prefix + suffix[0]] + suffix[1:]
+    elif prefix:
+        return [prefix] + suffix
+    return suffix
+
+def _sequence_pattern(items, binary=False):
+    if binary:
+        items = [item.encode("latin-1") if isinstance(item, str) else item
+                 for item in items]
+    patterns = [Literal(item) if isinstance(item, (str, bytes)) else item for item in items]
+    if not patterns:
+        return Literal("")
+    elif len(patterns) == 1:
+        return patterns[0]
+    return Group(*patterns, capturing=False, _atomic=False)
+
 @implementer(Pattern)
 class Lookahead(PatternBase): # TODO FIXME XXX
     positive = StrPattern("(?=...)")
@@ -213,11 +506,21 @@ class Yesno(PatternBase):
     choicepat = StrPattern("(?(id)yes_pattern|no_pattern)")
 
     def __init__(self, previous, yespattern, nopattern):
-        self.pattern = choicepat.format(id=str(previous))
+        self.previous = previous
+        self.pattern = self.choicepat.format(id=str(previous))
         self.yespattern = Pattern(yespattern)
         self.nopattern = Pattern(nopattern)
 
-    def render(self):
-        formatted = self.pattern.format(yes_pattern=self.yespattern.render(),
-                            no_pattern=self.nopattern.render())
-        return formatted.render()
\ No newline at end of file
+    @memoized
+    def match_length(self):
+        return Either(self.yespattern, self.nopattern).match_length()
+
+    def required_literals(self):
+        return _common_literals([self.yespattern, self.nopattern])
+
+    def _subpatterns(self):
+        return [self.yespattern, self.nopattern]
+
+    def _render_parts(self):
+        before, middle, after = self.pattern.split("yes_pattern", "no_pattern")
+        return [before, self.yespattern, middle, self.nopattern, after]
\ No newline at end of file
@@ -0,0 +1,189 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Opt-in statistics on search() and match() calls, per pattern.
+
+    with instrument.collecting() as collector:
+        handle_requests()
+    print(collector.export_json())
+
+While no collector is installed, search() and match() only check that
+base.instrument_hook is None. Patterns are identified by the name given to
+label(), or else by a hash of their rendered source, which is stable across
+processes.
+
+Latency percentiles are estimated from a fixed-size random sample of the
+calls (reservoir sampling), so memory use doesn't grow with traffic.
+"""
+
+import contextlib
+import hashlib
+import heapq
+import json
+import random
+import threading
+import time
+import weakref
+
+from . import base
+
+reservoir_size = 1024
+slowest_count = 5
+
+_labels = weakref.WeakKeyDictionary()
+
+def label(pattern, name):
+    "report statistics for pattern under name; returns pattern"
+    _labels[pattern] = name
+    return pattern
+
+def pattern_key(pattern):
+    "name statistics of pattern are reported under"
+    try:
+        return _labels[pattern]
+    except KeyError:
+        source = pattern.rendered
+        if not isinstance(source, bytes):
+            source = source.encode("utf-8", "surrogatepass")
+        digest = hashlib.sha1(source)
+        return "re:" + digest.hexdigest()[:16]
+
+
+class PatternStats(object):
+    "statistics on the calls made to one pattern"
+    def __init__(self, key, rendered):
+        self.key = key
+        self.rendered = rendered
+        self.calls = 0
+        self.hits = 0
+        self.total_time = 0.0
+        self.samples = []
+        # heap of the (duration, input length) of the slowest calls
+        self.slowest = []
+        self._random = random.Random(0)
+
+    @property
+    def misses(self):
+        return self.calls - self.hits
+
+    def record(self, duration, length, hit):
+        self.calls += 1
+        if hit:
+            self.hits += 1
+        self.total_time += duration
+
+        if len(self.samples) < reservoir_size:
+            self.samples.append(duration)
+        else:
+            index = self._random.randrange(self.calls)
+            if index < reservoir_size:
+                self.samples[index] = duration
+
+        if len(self.slowest) < slowest_count:
+            heapq.heappush(self.slowest, (duration, length))
+        elif duration > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (duration, length))
+
+    def percentile(self, percent):
+        "estimated call duration below which percent of the calls fall"
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100.0))
+        return ordered[index]
+
+    def as_dict(self):
+        rendered = self.rendered
+        if isinstance(rendered, bytes):
+            # as kept internally: each byte as the latin-1 character of the
+            # same value, so the dict can be exported as JSON
+            rendered = rendered.decode("latin-1")
+        return {
+            "key": self.key,
+            "pattern": rendered,
+            "calls": self.calls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / self.calls if self.calls else None,
+            "total_time": self.total_time,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "slowest_lengths": [length for duration, length in
+                                sorted(self.slowest, reverse=True)],
+        }
+
+    def __repr__(self):
+        return "<PatternStats %s calls=%d hits=%d total=%.6fs>" % (
+            self.key, self.calls, self.hits, self.total_time)
+
+
+class Collector(object):
+    """
+    Records statistics on search() and match() calls while installed as
+    base.instrument_hook. Thread-safe.
+    """
+    def __init__(self):
+        self.stats = {}
+        self._by_pattern = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __call__(self, pattern, function, text, *args):
+        start = time.perf_counter()
+        result = function(text, *args)
+        duration = time.perf_counter() - start
+        with self._lock:
+            try:
+                stats = self._by_pattern[pattern]
+            except KeyError:
+                stats = self._stats_for(pattern)
+            stats.record(duration, len(text), result is not None)
+        return result
+
+    def _stats_for(self, pattern):
+        key = pattern_key(pattern)
+        try:
+            stats = self.stats[key]
+        except KeyError:
+            stats = self.stats[key] = PatternStats(key, pattern.rendered)
+        self._by_pattern[pattern] = stats
+        return stats
+
+    def install(self):
+        base.instrument_hook = self
+
+    def uninstall(self):
+        if base.instrument_hook is self:
+            base.instrument_hook = None
+
+    def reset(self):
+        with self._lock:
+            self.stats.clear()
+            self._by_pattern.clear()
+
+    def snapshot(self):
+        "return dict of statistics per pattern key, slowest total time first"
+        with self._lock:
+            stats = sorted(self.stats.values(), key=lambda stats: -stats.total_time)
+            return dict((stats.key, stats.as_dict()) for stats in stats)
+
+    def export_json(self, fp=None, **keywords):
+        "write snapshot to fp as JSON, or return it as a string"
+        if fp is None:
+            return json.dumps(self.snapshot(), **keywords)
+        json.dump(self.snapshot(), fp, **keywords)
+
+
+@contextlib.contextmanager
+def collecting(collector=None):
+    """
+    Collect statistics while in the with block; yields the Collector. The
+    previously installed hook, if any, is restored afterwards.
+    """
+    if collector is None:
+        collector = Collector()
+    previous = base.instrument_hook
+    base.instrument_hook = collector
+    try:
+        yield collector
+    finally:
+        base.instrument_hook = previous
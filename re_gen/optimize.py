@@ -0,0 +1,373 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Rewrite passes which simplify the toplevel() form of a pattern further, run to
+a fixpoint.
+
+    optimizer = Optimizer()
+    optimizer.disable("hoist_affixes")
+    shorter = optimizer.optimize(pattern)
+    print(optimizer.stats)
+
+Each pass is a function from a node to a replacement node, or None to leave
+it; it's applied to every node, children before parents. After each round
+of passes the tree is simplified again - so that eg literals fused into
+"abab" are derepeated into (?:ab){2} - and rounds are repeated until
+nothing changes, or max_rounds is reached. The passes keep what a pattern
+matches, its groups and the order alternatives are tried in.
+
+    fuse_literals       a, b -> ab
+    merge_repeats       x x* -> x+, x{2}x{1,3} -> x{3,5}
+    flatten_groups      a(?:bc)d -> abcd, (?:a|(?:bc)) -> (?:a|bc)
+    hoist_affixes       (?:ab|ac) -> a(?:b|c), (?:ax|bx) -> (?:a|b)x
+    possessify          [a-z]+= -> [a-z]++=  (off by default; see analysis)
+"""
+
+import time
+
+from .base import Pattern, Literal, inf
+from .grouping import Group, Either, PrevGroup, _backtracks
+from .repeating import Repeating
+from .analysis import _indexed, _rebuild, _walk, possessified
+
+max_rounds = 10
+
+class Pass(object):
+    "a named rewrite, and counters of its use"
+    def __init__(self, name, rewrite, enabled=True, whole_tree=False):
+        self.name = name
+        self.rewrite = rewrite
+        self.enabled = enabled
+        # whole_tree passes are called once with the root, not per node
+        self.whole_tree = whole_tree
+
+    def __repr__(self):
+        return "<Pass %s%s>" % (self.name, "" if self.enabled else " (disabled)")
+
+
+def _captures(node):
+    "whether node contains capturing groups or back-references"
+    for path, child, parent in _walk(node):
+        if isinstance(child, Group) and child.capturing or isinstance(child, PrevGroup):
+            return True
+    return False
+
+def _is_sequence(node):
+    "whether node is a plain sequence: a group adding nothing but order"
+    return (isinstance(node, Group) and not node.capturing and not node.atomic)
+
+def _items(node):
+    "node as a list of items matched in sequence, flattening nested sequences"
+    if not _is_sequence(node):
+        return [node]
+    return _flattened([Pattern(child) for child in node.children])
+
+def _flattened(children):
+    "children of a group, with nested sequences spliced in"
+    items = []
+    for index, child in enumerate(children):
+        following = children[index + 1] if index + 1 < len(children) else None
+        if following is not None and following.ismodifier:
+            # the group's parentheses make the modifier apply to all of it
+            items.append(child)
+        else:
+            items.extend(_items(child))
+    return items
+
+def _sequence(items):
+    if not items:
+        return Literal("")
+    elif len(items) == 1:
+        return items[0]
+    return Group(*items, capturing=False, _atomic=False)
+
+
+### ------ Passes ------
+
+def fuse_literals(node):
+    "join adjacent literals of a group, so derepeat and prefix hoisting see them"
+    if not isinstance(node, Group):
+        return None
+    children = [Pattern(child) for child in node.children]
+    result = []
+    for index, child in enumerate(children):
+        following = children[index + 1] if index + 1 < len(children) else None
+        if (isinstance(child, Literal) and result and isinstance(result[-1], Literal) and
+                not (following is not None and following.ismodifier)):
+            previous = result.pop()
+            fused = previous.str + child.str
+            if previous.bytes or child.bytes:
+                fused = fused.encode("latin-1")
+            result.append(Literal(fused))
+        else:
+            result.append(child)
+    if len(result) == len(children):
+        return None
+    return node.copy(children=result)
+
+def _run_of(node):
+    """
+    (child, min, max, greedy) for a repeat, or (node, 1, 1, None) for
+    anything else, which merges with greedy and non-greedy repeats alike
+    """
+    if isinstance(node, Repeating):
+        if node.possessive:
+            return None
+        return (Pattern(node.child), node.min, node.max, node.greedy)
+    return (node, 1, 1, None)
+
+def _mergeable(run, previous):
+    # nodes are interned: equal ones are the same object
+    if run is None or previous is None or run[0] is not previous[0]:
+        return False
+    elif run[3] is None and previous[3] is None:
+        # x x is left to derepeat
+        return False
+    elif None not in (run[3], previous[3]) and run[3] != previous[3]:
+        return False
+    # repeats of one fixed-length thing try the total counts in the same
+    # order whether split or merged; with captures, the group numbers
+    # would change
+    length = run[0].match_length()
+    return length[0] == length[1] and not _captures(run[0])
+
+def _repeated_text(node):
+    """
+    (child, text) for a repeat of fixed text which a literal next to it can
+    be merged into, else None
+    """
+    if not isinstance(node, Repeating) or node.possessive:
+        return None
+    child = Pattern(node.child)
+    text = child._fixed_string()
+    if not text or _captures(child):
+        return None
+    return child, text
+
+def _split_literals(children):
+    """
+    Split the text a repeat next to a literal repeats off the literal, as
+    the repeat's child: xab, (?:ab)* -> x, ab, (?:ab)*
+    """
+    result = []
+    for index, child in enumerate(children):
+        following = children[index + 1] if index + 1 < len(children) else None
+        if not isinstance(child, Literal) or (following is not None and following.ismodifier):
+            result.append(child)
+            continue
+        text = child.str
+        before = after = None
+        repeat = _repeated_text(children[index - 1]) if index else None
+        if repeat is not None and text.startswith(repeat[1]):
+            before, text = repeat[0], text[len(repeat[1]):]
+        repeat = _repeated_text(following) if following is not None else None
+        if repeat is not None and text.endswith(repeat[1]):
+            after, text = repeat[0], text[:len(text) - len(repeat[1])]
+        if before is not None:
+            result.append(before)
+        if text or (before is None and after is None):
+            result.append(child._like(text))
+        if after is not None:
+            result.append(after)
+    return result
+
+def merge_repeats(node):
+    "merge adjacent repeats of the same fixed-length child in a group"
+    if not isinstance(node, Group):
+        return None
+    children = [Pattern(child) for child in node.children]
+    result = []
+    runs = []
+    for child in _split_literals(children):
+        run = _run_of(child)
+        if runs and _mergeable(run, runs[-1]):
+            previous = runs[-1]
+            greedy = previous[3] if run[3] is None else run[3]
+            maximum = inf if inf in (run[2], previous[2]) else run[2] + previous[2]
+            runs[-1] = (run[0], run[1] + previous[1], maximum, greedy)
+            result[-1] = Repeating(run[0], min=runs[-1][1], max=maximum, greedy=greedy)
+        else:
+            result.append(child)
+            runs.append(run)
+    if len(result) == len(children) and all(new is old for new, old in zip(result, children)):
+        return None
+    return node.copy(children=result)
+
+def flatten_groups(node):
+    """
+    Splice non-capturing groups into the sequence around them, unless a
+    modifier follows; unwrap non-capturing groups which are branches.
+    """
+    if isinstance(node, Either):
+        branches = [Pattern(branch) for branch in node.branches]
+        result = [branch.copy(_atomic=False) if _is_sequence(branch) and branch._atomic
+                  else branch for branch in branches]
+        if all(new is old for new, old in zip(result, branches)):
+            return None
+        return Either(*result, _factor=node._factor)
+    elif not isinstance(node, Group):
+        return None
+    children = [Pattern(child) for child in node.children]
+    result = _flattened(children)
+    if len(result) == len(children) and all(new is old for new, old in zip(result, children)):
+        return None
+    return node.copy(children=result)
+
+def _common_affix(branches, at_end):
+    """
+    Return (affix items, rest of each branch) for the items all of branches
+    start (or end) with. Literals sharing a prefix (or suffix) are split.
+    """
+    affix = []
+    while True:
+        index = -1 if at_end else 0
+        if not all(branches):
+            break
+        heads = [items[index] for items in branches]
+        if all(head is heads[0] for head in heads):
+            hoisted = heads[0]
+            if _captures(hoisted) or (not at_end and _backtracks(hoisted)):
+                break
+            affix.append(hoisted)
+            branches = [items[:-1] if at_end else items[1:] for items in branches]
+            continue
+        if not all(isinstance(head, Literal) for head in heads):
+            break
+        modes = set(head._mode() for head in heads) - set([None])
+        if len(modes) > 1:
+            break
+        texts = [head.str for head in heads]
+        if at_end:
+            texts = [text[::-1] for text in texts]
+        common = 0
+        shortest = min(len(text) for text in texts)
+        while common < shortest and all(text[common] == texts[0][common] for text in texts):
+            common += 1
+        if not common:
+            break
+        def literal(text):
+            if at_end:
+                text = text[::-1]
+            return Literal(text.encode("latin-1")) if bytes in modes else Literal(text)
+        affix.append(literal(texts[0][:common]))
+        rests = [literal(text[common:]) if len(text) > common else None for text in texts]
+        branches = [(items[:-1] + ([rest] if rest is not None else []) if at_end else
+                     ([rest] if rest is not None else []) + items[1:])
+                    for items, rest in zip(branches, rests)]
+        break
+    if at_end:
+        affix.reverse()
+    return affix, branches
+
+def hoist_affixes(node):
+    "move what every branch of an alternation starts or ends with out of it"
+    if not isinstance(node, Either) or len(node.branches) < 2:
+        return None
+    branches = [_items(Pattern(branch)) for branch in node.branches]
+    prefix, branches = _common_affix(branches, False)
+    suffix, branches = _common_affix(branches, True)
+    if not prefix and not suffix:
+        return None
+    either = Either(*[_sequence(items) for items in branches], _factor=False)
+    return Group(*(prefix + [either] + suffix), capturing=False)
+
+def possessify(root):
+    return possessified(root)
+
+def default_passes():
+    return [Pass("fuse_literals", fuse_literals),
+            Pass("merge_repeats", merge_repeats),
+            Pass("flatten_groups", flatten_groups),
+            Pass("hoist_affixes", hoist_affixes),
+            Pass("possessify", possessify, enabled=False, whole_tree=True)]
+
+
+class Optimizer(object):
+    """
+    Runs passes over patterns. stats maps each pass name to a dict of
+    rewrites (nodes replaced), runs and seconds, summed over all patterns
+    optimized; rounds counts the rounds run.
+    """
+    def __init__(self, passes=None, max_rounds=max_rounds):
+        self.passes = default_passes() if passes is None else list(passes)
+        self.max_rounds = max_rounds
+        self.reset()
+
+    def reset(self):
+        "zero the statistics"
+        self.stats = dict((rewrite.name, {"rewrites": 0, "runs": 0, "seconds": 0.0})
+                          for rewrite in self.passes)
+        self.rounds = 0
+        self.unfinished = 0 # patterns still changing after max_rounds
+
+    def _find(self, name):
+        for rewrite in self.passes:
+            if rewrite.name == name:
+                return rewrite
+        raise KeyError("no pass named %r" % (name,))
+
+    def enable(self, name):
+        self._find(name).enabled = True
+
+    def disable(self, name):
+        self._find(name).enabled = False
+
+    def add(self, name, rewrite, enabled=True, whole_tree=False):
+        "append a pass; rewrite(node) returns a replacement node or None"
+        self.passes.append(Pass(name, rewrite, enabled, whole_tree))
+        self.stats[name] = {"rewrites": 0, "runs": 0, "seconds": 0.0}
+
+    def _apply(self, rewrite, root):
+        if rewrite.whole_tree:
+            result = rewrite.rewrite(root)
+            return root if result is None else result, int(result is not None and result is not root)
+        nodes, children = _indexed(root)
+        rebuilt = [None] * len(nodes)
+        count = 0
+        for index in range(len(nodes) - 1, -1, -1):
+            result = _rebuild(nodes[index], [rebuilt[child] for child in children[index]])
+            replacement = rewrite.rewrite(result)
+            if replacement is not None and replacement is not result:
+                result = replacement
+                count += 1
+            rebuilt[index] = result
+        return rebuilt[0], count
+
+    def optimize(self, pattern):
+        "Return optimized toplevel() form of pattern"
+        root = Pattern(pattern).toplevel()
+        for round in range(self.max_rounds):
+            self.rounds += 1
+            start_root = root
+            for rewrite in self.passes:
+                if not rewrite.enabled:
+                    continue
+                stats = self.stats[rewrite.name]
+                start = time.perf_counter()
+                root, count = self._apply(rewrite, root)
+                stats["seconds"] += time.perf_counter() - start
+                stats["runs"] += 1
+                stats["rewrites"] += count
+            # not toplevel(): it drops the capture of a capturing group at
+            # the top, which the first round's toplevel() kept
+            root = root.simplified()
+            if root is start_root:
+                return root
+        self.unfinished += 1
+        return root
+
+    def report(self):
+        "Return the statistics as lines of text"
+        lines = []
+        for rewrite in self.passes:
+            stats = self.stats[rewrite.name]
+            lines.append("%-16s %-8s rewrites=%-6d runs=%-6d %.4fs" % (
+                rewrite.name, "on" if rewrite.enabled else "off",
+                stats["rewrites"], stats["runs"], stats["seconds"]))
+        return "\n".join(lines)
+
+default_optimizer = Optimizer()
+
+def optimize(pattern):
+    "Return pattern optimized by default_optimizer"
+    return default_optimizer.optimize(pattern)
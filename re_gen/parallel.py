@@ -0,0 +1,108 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Search many files or text chunks in a pool of worker processes.
+
+The pattern is pickled once per worker; each worker compiles it on first
+use. Results come back as MatchResult tuples, since re match objects can't
+be pickled. At most workers * prefetch tasks are in flight at a time, so a
+slow consumer (or a huge list of inputs) doesn't pile up results in memory.
+"""
+
+import collections
+import concurrent.futures
+import itertools
+import os
+
+from .scanning import default_chunk_size
+
+class MatchResult(collections.namedtuple("MatchResult",
+                                         "start end text groups groupdict")):
+    "picklable summary of a match: offsets, matched text and groups"
+    __slots__ = ()
+
+    def span(self):
+        return (self.start, self.end)
+
+    @classmethod
+    def from_match(cls, match):
+        return cls(match.start(), match.end(), match.group(), match.groups(),
+                   match.groupdict())
+
+
+_worker_pattern = None
+
+def _init_worker(pattern):
+    global _worker_pattern
+    _worker_pattern = pattern
+
+def _scan_path(path, encoding, chunk_size):
+    return [MatchResult.from_match(match) for match in
+            _worker_pattern.scan_file(path, encoding=encoding, chunk_size=chunk_size)]
+
+def _finditer_batch(first, texts):
+    finditer = _worker_pattern.compiled.finditer
+    return [[MatchResult.from_match(match) for match in finditer(text)]
+            for text in texts]
+
+
+def _map(pattern, function, tasks, workers, ordered, prefetch):
+    """
+    Yield (task, result) for function(*task) over tasks, run in a process
+    pool, keeping at most workers * prefetch tasks submitted at a time.
+    """
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+            initializer=_init_worker, initargs=(pattern,)) as pool:
+        limit = workers * prefetch
+        tasks = iter(tasks)
+        pending = collections.OrderedDict()
+        def submit():
+            for task in itertools.islice(tasks, limit - len(pending)):
+                pending[pool.submit(function, *task)] = task
+
+        submit()
+        while pending:
+            if ordered:
+                future = next(iter(pending))
+                future.result()
+            else:
+                done, _ = concurrent.futures.wait(pending,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                future = next(future for future in pending if future in done)
+            task = pending.pop(future)
+            yield task, future.result()
+            submit()
+
+def search_files(pattern, paths, workers=None, ordered=True, prefetch=2,
+                 encoding="utf-8", chunk_size=default_chunk_size):
+    """
+    Yield (path, [MatchResult, ...]) for each of paths, scanning each file
+    in a worker process with scanning.scan_file. Results are in the order of
+    paths if ordered, else as they complete.
+    """
+    tasks = ((path, encoding, chunk_size) for path in paths)
+    for task, results in _map(pattern, _scan_path, tasks, workers, ordered, prefetch):
+        yield task[0], results
+
+def finditer_chunks(pattern, chunks, workers=None, ordered=True, prefetch=2,
+                    batch_size=64):
+    """
+    Yield (index, [MatchResult, ...]) for each text in chunks. Chunks are
+    searched independently - a match can't span two of them - and are sent
+    to workers batch_size at a time, to amortize inter-process overhead.
+    """
+    def batches():
+        chunk_iter = iter(chunks)
+        first = 0
+        while True:
+            texts = list(itertools.islice(chunk_iter, batch_size))
+            if not texts:
+                return
+            yield (first, texts)
+            first += len(texts)
+
+    for (first, texts), results in _map(pattern, _finditer_batch, batches(),
+                                        workers, ordered, prefetch):
+        for offset, matches in enumerate(results):
+            yield first + offset, matches
@@ -0,0 +1,200 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Match text against many patterns at once.
+
+A PatternSet renders its members as one alternation, each member wrapped in
+a named group, so one regex search finds which member matches first. Group
+names and numeric back-references inside members are rewritten so they
+don't collide; PatternSetMatch translates them back.
+"""
+
+import re
+
+from .base import Pattern
+from .grouping import Group, PrevGroup, Either, Yesno
+from .repeating import Repeating
+
+def _remap(pattern, prefix, offset):
+    """
+    Return copy of simplified pattern with group names prefixed and numeric
+    group references shifted by offset.
+    """
+    pattern = Pattern(pattern)
+    if isinstance(pattern, Group):
+        children = [_remap(child, prefix, offset) for child in pattern.children]
+        name = prefix + pattern.name if pattern.name else None
+        return pattern.copy(children=children, name=name)
+    elif isinstance(pattern, Repeating):
+        return Repeating(_remap(pattern.child, prefix, offset), min=pattern.min,
+                         max=pattern.max, greedy=pattern.greedy,
+                         possessive=pattern.possessive)
+    elif isinstance(pattern, Either):
+        return Either(*[_remap(branch, prefix, offset) for branch in pattern.branches],
+                      _factor=False)
+    elif isinstance(pattern, PrevGroup):
+        return PrevGroup(_remap_reference(pattern.name, prefix, offset))
+    elif isinstance(pattern, Yesno):
+        return Yesno(_remap_reference(pattern.previous, prefix, offset),
+                     _remap(pattern.yespattern, prefix, offset),
+                     _remap(pattern.nopattern, prefix, offset))
+    return pattern
+
+def _remap_reference(reference, prefix, offset):
+    if str(reference).isdigit():
+        return int(reference) + offset
+    return prefix + reference
+
+
+class _Member(object):
+    def __init__(self, index, name, pattern, base):
+        self.index = index
+        self.name = name
+        self.pattern = pattern
+        self.compiled = pattern.compiled
+        self.groupname = "_m%d" % index
+        self.prefix = self.groupname + "_"
+        # the member's group n is group base + n of the combined regex
+        self.base = base
+        self.literals = pattern.required_literals()
+        self.rendered = "(?P<%s>%s)" % (self.groupname,
+                _remap(pattern.toplevel(), self.prefix, base).render())
+
+
+class PatternSetMatch(object):
+    """
+    Match of one member of a PatternSet. Group numbers and names are those
+    of the member pattern on its own.
+    """
+    def __init__(self, member, match, base=0, prefix=""):
+        self.member = member
+        self.match = match
+        self._base = base
+        self._prefix = prefix
+
+    @property
+    def index(self):
+        return self.member.index
+
+    @property
+    def name(self):
+        return self.member.name
+
+    @property
+    def pattern(self):
+        return self.member.pattern
+
+    def _group(self, group):
+        if isinstance(group, int):
+            if group < 0 or group > self.member.compiled.groups:
+                raise IndexError("no such group")
+            return self._base + group
+        if group not in self.member.compiled.groupindex:
+            raise IndexError("no such group")
+        return self._prefix + group
+
+    def group(self, *groups):
+        groups = groups or (0,)
+        result = tuple(self.match.group(self._group(group)) for group in groups)
+        return result[0] if len(result) == 1 else result
+
+    def groups(self, default=None):
+        result = []
+        for number in range(1, self.member.compiled.groups + 1):
+            value = self.match.group(self._base + number)
+            result.append(default if value is None else value)
+        return tuple(result)
+
+    def groupdict(self, default=None):
+        result = {}
+        for name in self.member.compiled.groupindex:
+            value = self.match.group(self._prefix + name)
+            result[name] = default if value is None else value
+        return result
+
+    def start(self, group=0):
+        return self.match.start(self._group(group))
+
+    def end(self, group=0):
+        return self.match.end(self._group(group))
+
+    def span(self, group=0):
+        return self.match.span(self._group(group))
+
+    def __repr__(self):
+        return "<PatternSetMatch member=%r, span=%r, match=%r>" % (
+                self.name, self.span(), self.group())
+
+
+class PatternSet(object):
+    """
+    Set of patterns compiled into a single regex. patterns is a sequence, or
+    a mapping of names to patterns; names default to member indices.
+
+    search()/match() return a PatternSetMatch for the leftmost match of
+    any member - where several members match at the same position, the one
+    listed first wins. search_all() finds every member which matches.
+    """
+    def __init__(self, patterns):
+        if hasattr(patterns, "items"):
+            items = list(patterns.items())
+        else:
+            items = list(enumerate(patterns))
+        self.members = []
+        base = 1
+        for index, (name, pattern) in enumerate(items):
+            member = _Member(index, name, Pattern(pattern), base)
+            self.members.append(member)
+            base += member.compiled.groups + 1
+        self._bygroup = dict((member.groupname, member) for member in self.members)
+        self.rendered = "|".join(member.rendered for member in self.members)
+        self.compiled = re.compile(self.rendered)
+
+        # literal -> members requiring it, for search_all
+        self._literals = {}
+        for member in self.members:
+            for literal in member.literals:
+                self._literals.setdefault(literal, []).append(member)
+
+    def __len__(self):
+        return len(self.members)
+
+    def _wrap(self, match):
+        if match is None:
+            return None
+        member = self._bygroup[match.lastgroup]
+        return PatternSetMatch(member, match, member.base, member.prefix)
+
+    def search(self, text):
+        return self._wrap(self.compiled.search(text))
+
+    def match(self, text):
+        return self._wrap(self.compiled.match(text))
+
+    def finditer(self, text):
+        for match in self.compiled.finditer(text):
+            yield self._wrap(match)
+
+    def candidates(self, text):
+        """
+        Return members which may match text: those whose required literals
+        all occur in it.
+        """
+        missing = set()
+        for literal, members in self._literals.items():
+            if literal not in text:
+                missing.update(member.index for member in members)
+        return [member for member in self.members if member.index not in missing]
+
+    def search_all(self, text):
+        """
+        Return list of PatternSetMatch, one for every member found in text,
+        in member order. Only members whose required literals occur in text
+        are searched.
+        """
+        result = []
+        for member in self.candidates(text):
+            match = member.compiled.search(text)
+            if match is not None:
+                result.append(PatternSetMatch(member, match))
+        return result
@@ -0,0 +1,129 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Reject inputs with plain substring checks before running the regex.
+
+Every match of a pattern contains its required_literals(). A text missing
+any of them can't match, and str.find rejects it much faster than a regex
+search. The literal which rejected most inputs so far is checked first.
+"""
+
+import re
+
+from .base import StrPattern, inf
+
+# how many checks between re-sorting literals by how often they rejected
+reorder_interval = 256
+
+class Prefilter(object):
+    """
+    search/match/finditer for pattern which first check for its required
+    literals. Not thread-safe: concurrent use may skew the reject counts
+    used for ordering, but not results. With re.IGNORECASE in flags, no
+    literals are checked.
+    """
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.compiled = pattern.compile(flags)
+        if flags & re.IGNORECASE:
+            literals = ()
+        else:
+            literals = pattern.required_literals()
+        if pattern.is_bytes():
+            literals = [literal.encode("latin-1") for literal in literals]
+        # longest first: longer literals are likelier to be rare
+        self.literals = sorted(literals, key=len, reverse=True)
+        self.rejects = dict((literal, 0) for literal in self.literals)
+        self.checks = 0 # rejections, counted to reorder literals
+        maximum = pattern.match_length()[1]
+        self.max_length = None if maximum is inf else maximum
+        # searching a window makes its end look like the end of the text
+        self.windowed = self.max_length is not None and not _assertions(pattern)
+
+    def _reorder(self):
+        rejects = self.rejects
+        self.literals.sort(key=lambda literal: (rejects[literal], len(literal)), reverse=True)
+
+    def candidate(self, text):
+        "whether text contains all required literals, and so might match"
+        for literal in self.literals:
+            if literal not in text:
+                self._rejected(literal)
+                return False
+        return True
+
+    def _rejected(self, literal):
+        self.rejects[literal] += 1
+        self.checks += 1
+        if self.checks % reorder_interval == 0:
+            self._reorder()
+
+    def search(self, text):
+        for literal in self.literals:
+            if literal not in text:
+                self._rejected(literal)
+                return None
+        return self.compiled.search(text)
+
+    def match(self, text):
+        for literal in self.literals:
+            if literal not in text:
+                self._rejected(literal)
+                return None
+        return self.compiled.match(text)
+
+    def search_lines(self, lines):
+        "yield (line, match) for each of lines the pattern is found in"
+        for line in lines:
+            match = self.search(line)
+            if match is not None:
+                yield line, match
+
+    def finditer(self, text):
+        """
+        Like re's finditer. For patterns with a bounded match length and no
+        zero-width assertions, the regex is only run in windows around
+        occurrences of the first literal.
+        """
+        if not self.candidate(text):
+            return iter(())
+        if not self.literals or not self.windowed:
+            return self.compiled.finditer(text)
+        return self._finditer_windows(text, self.literals[0])
+
+    def _finditer_windows(self, text, anchor):
+        # a match containing the occurrence of anchor at index found starts
+        # no earlier than found + len(anchor) - max_length and ends no later
+        # than found + max_length
+        search = self.compiled.search
+        length = self.max_length
+        pos = 0
+        found = text.find(anchor)
+        while found != -1:
+            start = max(pos, found + len(anchor) - length)
+            end = min(len(text), found + length)
+            match = search(text, start, end)
+            if match is not None and match.start() <= found:
+                yield match
+                pos = match.end() if match.end() > match.start() else match.end() + 1
+                found = text.find(anchor, max(pos, found + 1))
+            else:
+                found = text.find(anchor, found + 1)
+
+def _assertions(pattern):
+    """
+    Whether pattern contains zero-width assertions ($, \\b, ...) or regex
+    source of unknown length, which may look at the text around a match
+    """
+    stack = [pattern]
+    seen = set()
+    while stack:
+        node = stack.pop()
+        if isinstance(node, StrPattern) and node.match_length() != (1, 1):
+            return True
+        for child in node._subpatterns():
+            # subtrees are shared; walk each once
+            if id(child) not in seen:
+                seen.add(id(child))
+                stack.append(child)
+    return False
@@ -1,9 +1,9 @@
 # Copyright (c) 2012
 # Licensed under the terms of the MIT license; see LICENSE.txt
 
-from .base import StrPattern, Pattern, PatternBase, Creator
-
-from zope.interface import implementer, Attribute
+from .base import (StrPattern, Pattern, PatternBase, Creator, _structural_key,
+        memoized, inf, add_lengths, _prime, fixed_string_limit)
+from .adapterutil import implementer, Attribute
 
 zerotoinf_pattern = StrPattern("*", ismodifier=True)
 onetoinf_pattern = StrPattern("+", ismodifier=True)
@@ -13,23 +13,26 @@ xtox_pattern = StrPattern("{m,n}", ismodifier=True)
 
 # this is used separately than zerotoone_pattern
 nongreedy_pattern = StrPattern("?", ismodifier=True)
-
-# NOT float('inf'), because that results in a silent error (NaN) when multiplied by 0
-# TODO: make this a singleton of a class with a proper __repr__
-inf = object()
+# possessive quantifiers need python 3.11
+possessive_pattern = StrPattern("+", ismodifier=True)
 
 class IRepeating(Pattern):
     pattern = Attribute("the pattern to be repeated")
     greedy = Attribute("whether the pattern is greedy")
+    possessive = Attribute("whether repetitions, once matched, are never given back")
     min = Attribute("Minimum repetitions to match")
     max = Attribute("Maximum repetitions to match")
 
 @implementer(IRepeating)
 class Repeating(PatternBase):
     ismodifier = False
-    def __init__(self, pattern, count=-1, min=1, max=inf, greedy=True):
+    def __init__(self, pattern, count=-1, min=1, max=inf, greedy=True,
+                 possessive=False):
         self.child = pattern
         self.greedy = greedy
+        self.possessive = possessive
+        if possessive and not greedy:
+            raise Exception("repeats cannot be both possessive and non-greedy")
 
         if count > -1:
             max = count
@@ -40,10 +43,51 @@ class Repeating(PatternBase):
 
         self.modifier = self.calc(min, max)
 
+    def _key(self):
+        return (_structural_key(self.child), self.min, self.max, self.greedy,
+                self.possessive)
+
     @property
     def is_fixed(self):
         return self.max == self.min
 
+    @property
+    def atoms(self):
+        if self.modifier:
+            # the repeated atom plus the modifier; must be grouped before
+            # it can be repeated again
+            return 2
+        return Pattern(self.child).atoms
+
+    @memoized
+    def match_length(self):
+        _prime(self, "match_length")
+        childmin, childmax = Pattern(self.child).match_length()
+        if childmax == 0 or self.max == inf:
+            maximum = 0 if childmax == 0 else inf
+        elif childmax == inf:
+            maximum = inf
+        else:
+            maximum = childmax * self.max
+        return (childmin * self.min, maximum)
+
+    @memoized
+    def required_literals(self):
+        if self.min < 1:
+            return frozenset()
+        _prime(self, "required_literals")
+        return Pattern(self.child).required_literals()
+
+    @memoized
+    def _fixed_string(self):
+        if not self.is_fixed:
+            return None
+        _prime(self, "_fixed_string")
+        text = Pattern(self.child)._fixed_string()
+        if text is None or len(text) * self.count > fixed_string_limit:
+            return None
+        return text * self.count
+
     @property
     def count(self):
         if self.is_fixed:
@@ -84,9 +128,14 @@ class Repeating(PatternBase):
             createnew = True
 
         if not self.calc(min, max):
+            if self.possessive:
+                # matching once possessively is matching atomically
+                from .grouping import Group
+                return Group(pattern, atomic=True)._drop_if_unnecessary()
             return pattern.deatomized()
         elif createnew:
-            return Repeating(pattern, min=min, max=max, greedy=self.greedy)
+            return Repeating(pattern, min=min, max=max, greedy=self.greedy,
+                             possessive=self.possessive)
         else:
             return self
 
@@ -95,11 +144,10 @@ class Repeating(PatternBase):
             pattern = self.child
         min = self.min
         max = self.max
-        if IRepeating.providedBy(pattern):
+        if IRepeating.providedBy(pattern) and self._mergeable(pattern):
             # todo: delegate to child, like how Group does?
-            assert self.greedy == pattern.greedy # how the crap do you reconcile greedyness anyway
             subrepeater = pattern
-            pattern = subrepeater.pattern
+            pattern = subrepeater.child
             if inf in (max, subrepeater.max):
                 max = inf
             else:
@@ -107,15 +155,43 @@ class Repeating(PatternBase):
             min *= subrepeater.min
         return pattern, min, max
 
+    def _mergeable(self, subrepeater):
+        """
+        Whether repeating subrepeater self.min to self.max times matches the
+        same counts, tried in the same order, as a single repeat with
+        multiplied bounds - eg (a{2})? can't become a{0,2}, as it doesn't
+        match "a", and (?:a{2,3}){1,2} can't become a{2,6}, as it tries 3
+        before 4.
+        """
+        if self.greedy != subrepeater.greedy: # how the crap do you reconcile greedyness anyway
+            return False
+        elif self.possessive or subrepeater.possessive:
+            # possessive repeats of repeats give back differently than a
+            # single repeat; only fixed counts are the same either way
+            return self.is_fixed and subrepeater.is_fixed
+        elif self.is_fixed:
+            return True
+        elif subrepeater.max == inf:
+            # greedy: the first iterations take everything, whatever the
+            # split. non-greedy: a longer iteration can be tried before
+            # another, shorter one
+            return subrepeater.min <= 1 or (self.greedy and self.min > 0)
+        # with iterations of one or none, each total count is tried before
+        # any smaller one; other ranges are tried out of order
+        return subrepeater.min <= 1
+
+    @memoized
     def _prerender(self):
         pattern = Pattern(self.child)
         if self.modifier:
             pattern = pattern.atomized()
         return pattern
 
+    @memoized
     def simplified(self, recursive=True):
         pattern = self._prerender()
         if recursive:
+            _prime(self, "simplified")
             pattern = pattern.simplified()
 
         pattern, min, max = self._merge_child(pattern)
@@ -124,16 +200,19 @@ class Repeating(PatternBase):
 
     ### ------ Rendering ------
 
-    def render(self):
+    def _subpatterns(self):
+        return [self._prerender()]
+
+    def _render_parts(self):
         pattern = self._prerender()
-        if self.modifier:
-            result = [pattern.atomized().render()]
-            result.append(self.modifier.render())
-            if not self.greedy:
-                result.append(nongreedy_pattern.render())
-            return "".join(result)
-        else:
-            return pattern.render()
+        if not self.modifier:
+            return [pattern]
+        result = [pattern, self.modifier.render()]
+        if not self.greedy:
+            result.append(nongreedy_pattern.render())
+        elif self.possessive:
+            result.append(possessive_pattern.render())
+        return result
 
     def __repr__(self):
         args = [repr(self.child)]
@@ -146,6 +225,8 @@ class Repeating(PatternBase):
                 args.append("max=%r" % self.max)
         if not self.greedy:
             args.append("greedy=False")
+        if self.possessive:
+            args.append("possessive=True")
         return "Repeating(%s)" % ", ".join(args)
 
 optional = Creator(Repeating, min=0, max=1)
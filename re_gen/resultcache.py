@@ -0,0 +1,195 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Opt-in cache of search() and match() results for a pattern, for callers
+which match the same inputs over and over (eg routing URL paths).
+
+    cache = pattern.cache_results(maxsize=4096)
+    pattern.search(path)          # matched once per distinct path
+    print(cache)
+
+The cache is an LRU keyed by the input text (and flags, engine and method);
+a failed match is cached as None. Hits return a CachedMatch, which stores the
+group offsets rather than the re match object, and answers group(), span()
+etc the way the original match would. Entries are evicted when there are
+more than maxsize of them, or when their estimated size exceeds maxmemory
+bytes; nothing expires by age. Thread-safe.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+# rough size in bytes of an entry besides its text and offsets: the key
+# tuple, the CachedMatch and the LRU's own bookkeeping
+entry_overhead = 200
+
+class CachedMatch(object):
+    "match result kept by a ResultCache; behaves like an re match object"
+    __slots__ = ("string", "re", "pos", "endpos", "regs", "lastindex", "lastgroup")
+
+    def __init__(self, string, regex, pos, endpos, regs, lastindex, lastgroup):
+        self.string = string
+        self.re = regex
+        self.pos = pos
+        self.endpos = endpos
+        self.regs = regs
+        self.lastindex = lastindex
+        self.lastgroup = lastgroup
+
+    @classmethod
+    def from_match(cls, match, regex):
+        """
+        Copy match. regex is the compiled regex of the pattern, for the
+        number and names of the groups; match may come from another engine.
+        """
+        regs = tuple(match.span(index) for index in range(regex.groups + 1))
+        return cls(match.string, match.re, match.pos, match.endpos, regs,
+                   getattr(match, "lastindex", None), getattr(match, "lastgroup", None))
+
+    def _index(self, group):
+        if isinstance(group, int):
+            if 0 <= group < len(self.regs):
+                return group
+        else:
+            regex = getattr(self.re, "regex", self.re)
+            if group in regex.groupindex:
+                return regex.groupindex[group]
+        raise IndexError("no such group")
+
+    def _group(self, group, default=None):
+        start, end = self.regs[self._index(group)]
+        if start < 0:
+            return default
+        return self.string[start:end]
+
+    def group(self, *groups):
+        if not groups:
+            return self._group(0)
+        elif len(groups) == 1:
+            return self._group(groups[0])
+        return tuple(self._group(group) for group in groups)
+
+    def __getitem__(self, group):
+        return self._group(group)
+
+    def groups(self, default=None):
+        return tuple(self._group(index, default) for index in range(1, len(self.regs)))
+
+    def groupdict(self, default=None):
+        regex = getattr(self.re, "regex", self.re)
+        return dict((name, self._group(index, default))
+                    for name, index in regex.groupindex.items())
+
+    def start(self, group=0):
+        return self.regs[self._index(group)][0]
+
+    def end(self, group=0):
+        return self.regs[self._index(group)][1]
+
+    def span(self, group=0):
+        return self.regs[self._index(group)]
+
+    def expand(self, template):
+        regex = getattr(self.re, "regex", self.re)
+        # re expands templates against a match object; build one for the
+        # same span, as the groups must come out the same
+        match = regex.fullmatch(self.string, *self.regs[0])
+        return match.expand(template)
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return "<CachedMatch span=%r, match=%r>" % (self.regs[0], self._group(0))
+
+
+class ResultCache(object):
+    """
+    Bounded LRU of search()/match() results of pattern, keyed by input text.
+    Use pattern.cache_results() to create one and have search() and match()
+    go through it.
+    """
+    def __init__(self, pattern, maxsize=1024, maxmemory=None):
+        self.pattern = pattern
+        self.maxsize = maxsize
+        self.maxmemory = maxmemory
+        self.memory = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def search(self, text, flags=0, engine="re"):
+        return self._lookup("search", self.pattern._search, text, flags, engine)
+
+    def match(self, text, flags=0, engine="re"):
+        return self._lookup("match", self.pattern._match, text, flags, engine)
+
+    def _lookup(self, method, function, text, flags, engine):
+        key = (text, flags, engine, method)
+        with self._lock:
+            try:
+                result, size = self._entries.pop(key)
+            except KeyError:
+                pass
+            else:
+                self.hits += 1
+                self._entries[key] = (result, size)
+                return result
+            self.misses += 1
+
+        # match outside the lock, it may take a while
+        match = function(text, flags, engine)
+        if match is None:
+            result = None
+            size = sys.getsizeof(text) + entry_overhead
+        else:
+            result = CachedMatch.from_match(match, self.pattern.compile(flags))
+            size = sys.getsizeof(text) + sys.getsizeof(result.regs) + entry_overhead
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.memory -= old[1]
+            self._entries[key] = (result, size)
+            self.memory += size
+            self._evict()
+        return match
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.maxsize or
+                (self.maxmemory is not None and self.memory > self.maxmemory)):
+            key, (result, size) = self._entries.popitem(last=False)
+            self.memory -= size
+            self.evictions += 1
+
+    def resize(self, maxsize=None, maxmemory=None):
+        "change the limits, evicting entries as needed; None keeps a limit"
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if maxmemory is not None:
+                self.maxmemory = maxmemory
+            self._evict()
+
+    def clear(self):
+        "drop all entries and reset the counters"
+        with self._lock:
+            self._entries.clear()
+            self.memory = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "size": len(self._entries),
+                    "maxsize": self.maxsize, "memory": self.memory,
+                    "maxmemory": self.maxmemory}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __repr__(self):
+        return ("<ResultCache size=%(size)d/%(maxsize)d memory=%(memory)d hits=%(hits)d "
+                "misses=%(misses)d evictions=%(evictions)d>" % self.stats())
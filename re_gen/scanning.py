@@ -0,0 +1,174 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Match patterns against streams and files too large to hold in memory.
+
+Text is searched in fixed-size chunks. Consecutive chunks overlap by the
+pattern's maximum match length, so matches crossing a chunk boundary are
+found exactly once, with offsets relative to the start of the stream.
+
+If the maximum match length is unbounded, the overlap falls back to
+default_overlap characters, and a match touching the end of the buffered
+text is held back until more text arrives - up to max_carry characters, after
+which it is reported as it stands. Matches longer than that may be truncated,
+and alternations which could match differently given more than overlap
+characters of lookahead may report the shorter alternative.
+
+Bytes patterns scan files through mmap instead, searching the whole file
+in place without reading or decoding it.
+"""
+
+import mmap
+import os
+
+from .base import inf
+
+default_chunk_size = 1 << 20
+default_overlap = 1 << 16
+max_carry = 1 << 24
+
+# characters kept before the search position, so that \b and ^ see what
+# precedes it
+context = 1
+
+def max_match_length(pattern):
+    "maximum length of a match of pattern, or None if unbounded"
+    maximum = pattern.match_length()[1]
+    if maximum is inf:
+        return None
+    return maximum
+
+
+class StreamMatch(object):
+    """
+    A match found in a stream. Behaves like the re match object it wraps,
+    except that positions are offsets from the start of the stream.
+    """
+    def __init__(self, match, offset):
+        self.match = match
+        self.offset = offset
+
+    def group(self, *groups):
+        return self.match.group(*groups)
+    __getitem__ = group
+
+    def groups(self, default=None):
+        return self.match.groups(default)
+
+    def groupdict(self, default=None):
+        return self.match.groupdict(default)
+
+    def start(self, group=0):
+        start = self.match.start(group)
+        return start if start == -1 else start + self.offset
+
+    def end(self, group=0):
+        end = self.match.end(group)
+        return end if end == -1 else end + self.offset
+
+    def span(self, group=0):
+        return (self.start(group), self.end(group))
+
+    @property
+    def lastindex(self):
+        return self.match.lastindex
+
+    @property
+    def lastgroup(self):
+        return self.match.lastgroup
+
+    @property
+    def re(self):
+        return self.match.re
+
+    def __repr__(self):
+        return "<StreamMatch span=%r, match=%r>" % (self.span(), self.group())
+
+
+class ChunkScanner(object):
+    """
+    Incremental matcher: feed() it consecutive chunks of text, and it
+    returns the matches which can no longer change as more text arrives.
+    finish() returns the rest.
+    """
+    def __init__(self, compiled, max_length=None):
+        self.compiled = compiled
+        self.bounded = max_length is not None
+        self.overlap = max_length if self.bounded else default_overlap
+        self.buffer = compiled.pattern[:0]
+        self.offset = 0 # stream offset of self.buffer[0]
+        self.pos = 0 # where to continue searching in self.buffer
+
+    def feed(self, data, final=False):
+        buffer = self.buffer = self.buffer + data
+        pos = self.pos
+        # a match starting before limit can't extend past the buffer, and
+        # leaves a character of lookahead for $ and \b
+        limit = len(buffer) if final else len(buffer) - self.overlap - 1
+        matches = []
+        while pos <= len(buffer):
+            match = self.compiled.search(buffer, pos)
+            if match is None:
+                pos = max(pos, limit)
+                break
+            start, end = match.span()
+            if not final and (start >= limit or end >= len(buffer)):
+                held = len(buffer) - start
+                if self.bounded or start >= limit or held <= max_carry:
+                    pos = max(pos, min(start, limit))
+                    break
+            matches.append(StreamMatch(match, self.offset))
+            pos = end if end > start else end + 1
+
+        cut = max(0, min(pos, len(buffer)) - context)
+        self.buffer = buffer[cut:]
+        self.offset += cut
+        self.pos = pos - cut
+        return matches
+
+    def finish(self):
+        return self.feed(self.buffer[:0], final=True)
+
+
+def scan_stream(pattern, stream, chunk_size=default_chunk_size):
+    """
+    Yield StreamMatch objects for matches of pattern in the file-like
+    object stream, read chunk_size at a time.
+    """
+    scanner = ChunkScanner(pattern.compiled, max_match_length(pattern))
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        for match in scanner.feed(data):
+            yield match
+    for match in scanner.finish():
+        yield match
+
+def scan_file(pattern, path, encoding="utf-8", errors="strict",
+              chunk_size=default_chunk_size):
+    """
+    Yield StreamMatch objects for matches of pattern in the file at path.
+    Offsets count characters of the decoded text; newlines are not
+    translated. For bytes patterns, the file isn't decoded, and offsets
+    count bytes.
+    """
+    if pattern.is_bytes():
+        for match in _scan_mapped(pattern, path):
+            yield match
+        return
+    with open(path, encoding=encoding, errors=errors, newline="") as stream:
+        for match in scan_stream(pattern, stream, chunk_size):
+            yield match
+
+def _scan_mapped(pattern, path):
+    with open(path, "rb") as stream:
+        if os.fstat(stream.fileno()).st_size == 0:
+            # empty files can't be mapped
+            mapped = b""
+        else:
+            mapped = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+    # the map stays open while matches refer to it, and is closed when the
+    # last of them is collected
+    for match in pattern.compiled.finditer(mapped):
+        yield StreamMatch(match, 0)
@@ -1,24 +1,310 @@
 # Copyright (c) 2012
 # Licensed under the terms of the MIT license; see LICENSE.txt
 
-from .base import PatternBase, StrPattern, Creator
-from zope.interface import Interface, implementer
-from .adapterutil import adapter_for, IObjectSequence
+import sys
 
+from .base import Pattern, PatternBase, StrPattern, Literal, Creator, memoized
+from .adapterutil import adapter_for, implementer, Interface, IObjectSequence
+
+class Intervals(object):
+    """
+    Immutable set of code points, stored as a sorted tuple of disjoint,
+    non-adjacent (first, last) inclusive intervals.
+    """
+    def __init__(self, intervals=()):
+        merged = []
+        for first, last in sorted(intervals):
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+        self.intervals = tuple(merged)
+
+    @classmethod
+    def from_chars(cls, chars):
+        return cls((ord(char), ord(char)) for char in chars)
+
+    def __iter__(self):
+        return iter(self.intervals)
+
+    def __len__(self):
+        "number of code points in the set"
+        return sum(last - first + 1 for first, last in self.intervals)
+
+    def __contains__(self, codepoint):
+        for first, last in self.intervals:
+            if codepoint < first:
+                return False
+            elif codepoint <= last:
+                return True
+        return False
+
+    def __eq__(self, other):
+        return isinstance(other, Intervals) and self.intervals == other.intervals
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.intervals)
+
+    def __repr__(self):
+        return "Intervals(%r)" % (self.intervals,)
+
+    def issuperset(self, other):
+        return self.intersection(other) == other
+
+    def union(self, other):
+        # unions of a node's children mostly repeat a set, eg \d's ranges
+        if not other.intervals or other.intervals == self.intervals:
+            return self
+        elif not self.intervals:
+            return other
+        return Intervals(self.intervals + other.intervals)
+    __or__ = union
+
+    def intersection(self, other):
+        result = []
+        mine, theirs = list(self.intervals), list(other.intervals)
+        i = j = 0
+        while i < len(mine) and j < len(theirs):
+            first = max(mine[i][0], theirs[j][0])
+            last = min(mine[i][1], theirs[j][1])
+            if first <= last:
+                result.append((first, last))
+            if mine[i][1] < theirs[j][1]:
+                i += 1
+            else:
+                j += 1
+        return Intervals(result)
+    __and__ = intersection
+
+    def inverted(self, maxchar=sys.maxunicode):
+        result = []
+        start = 0
+        for first, last in self.intervals:
+            if first > start:
+                result.append((start, first - 1))
+            start = last + 1
+        if start <= maxchar:
+            result.append((start, maxchar))
+        return Intervals(result)
+
+    def difference(self, other):
+        return self.intersection(other.inverted())
+    __sub__ = difference
+
+
+# ascii code points matched by the character classes, used to drop
+# characters which a class in the same set already matches. In str patterns
+# the classes match more than these (eg \d matches other unicode digits),
+# so the reverse substitution is only done for sets declared ascii.
+class_ascii_intervals = {
+    "\\d": Intervals([(ord("0"), ord("9"))]),
+    "\\w": Intervals([(ord("0"), ord("9")), (ord("A"), ord("Z")),
+                       (ord("_"), ord("_")), (ord("a"), ord("z"))]),
+    "\\s": Intervals.from_chars(" \t\n\r\f\v"),
+}
+inverse_classes = {"\\d": "\\D", "\\w": "\\W", "\\s": "\\S"}
+inverse_classes.update([(value, key) for key, value in inverse_classes.items()])
+
+@implementer(Pattern)
 class Set(PatternBase):
+    """
+    Character set. Keywords: invert=True matches any character not in the
+    set; ascii=True declares the set is only used with re.ASCII (or bytes),
+    allowing simplified() to write [0-9] as \\d and [0-9A-Za-z_] as \\w.
+
+    Elements given as bytes (or Ranges of bytes) make a set of byte values
+    for bytes patterns, as does bytes=True; such sets are ascii, and only
+    hold values 0-255. Elements given as str then stand for the bytes of the
+    same (latin-1) values.
+    """
     def __init__(self, *args, **keywords):
-        self.elements = [SetElement(arg) for arg in args]
+        binary = keywords.get("bytes", False)
+        kinds = set()
+        elements = []
+        for arg in args:
+            if isinstance(arg, bytes):
+                kinds.add(bytes)
+                elements.append(SetElement(arg.decode("latin-1")))
+                continue
+            element = SetElement(arg)
+            if not isinstance(element, CharacterClass):
+                kinds.add(bytes if getattr(element, "bytes", False) else str)
+            elements.append(element)
+        if len(kinds) > 1 and not binary:
+            raise TypeError("can't mix bytes and str in a set")
+        self.elements = tuple(elements)
+        self.bytes = binary or bytes in kinds
 
         self.invert = keywords.get("invert", False)
+        self.ascii = keywords.get("ascii", False) or self.bytes
+        if self.bytes:
+            for element in self.elements:
+                if not isinstance(element, CharacterClass):
+                    for first, last in element.intervals():
+                        if last > 0xff:
+                            raise ValueError("byte sets only hold values 0-255, not %r"
+                                             % chr(last))
 
-    def render(self):
-        result = "["
+    def _key(self):
+        return (tuple((type(element), element._key()) for element in self.elements),
+                self.invert, self.ascii, self.bytes)
+
+    def _mode(self):
+        if self.bytes:
+            return bytes
+        elif all(isinstance(element, CharacterClass) for element in self.elements):
+            return None
+        return str
+
+    @property
+    def maxchar(self):
+        "highest code point (or byte value) the set can match"
+        return 0xff if self.bytes else sys.maxunicode
+
+    def match_length(self):
+        return (1, 1)
+
+    ### ------ Simplification ------
+
+    def _normalized(self):
+        """
+        Return (intervals, classes): the code points of the non-class
+        elements, and the sorted, deduplicated character class escapes.
+        """
+        intervals = []
+        classes = set()
+        for element in self.elements:
+            if isinstance(element, CharacterClass):
+                classes.add(element.render())
+            else:
+                intervals.extend(element.intervals())
+        return Intervals(intervals), sorted(classes)
+
+    def intervals(self):
+        """
+        Return Intervals of the code points matched by this set, taking
+        inversion into account. Not possible for sets with character classes.
+        """
+        intervals, classes = self._normalized()
+        if classes:
+            raise ValueError("can't represent character classes %s as intervals"
+                             % ", ".join(classes))
         if self.invert:
-            result += "^"
+            return intervals.inverted(self.maxchar)
+        return intervals
+
+    @classmethod
+    def from_intervals(cls, intervals, classes=(), **keywords):
+        "build set from Intervals (and character class escapes)"
+        elements = []
+        for first, last in intervals:
+            if last - first >= 2:
+                elements.append(Range(chr(first), chr(last)))
+                continue
+            chars = "".join(chr(codepoint) for codepoint in range(first, last + 1))
+            if elements and isinstance(elements[-1], str):
+                elements[-1] += chars
+            else:
+                elements.append(chars)
+        elements.extend(CharacterClass(escape) for escape in classes)
+        return cls(*elements, **keywords)
+
+    def __or__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        binary = self._binary_with(other)
+        if self.invert or other.invert:
+            intervals = self.intervals() | other.intervals()
+            return Set.from_intervals(intervals, ascii=self.ascii and other.ascii,
+                                      bytes=binary)
+        mine, myclasses = self._normalized()
+        theirs, theirclasses = other._normalized()
+        return Set.from_intervals(mine | theirs, sorted(set(myclasses) | set(theirclasses)),
+                                  ascii=self.ascii and other.ascii, bytes=binary)
+
+    def __and__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return Set.from_intervals(self.intervals() & other.intervals(),
+                                  ascii=self.ascii and other.ascii,
+                                  bytes=self._binary_with(other))
+
+    def __sub__(self, other):
+        if not isinstance(other, Set):
+            return NotImplemented
+        return Set.from_intervals(self.intervals() - other.intervals(),
+                                  ascii=self.ascii and other.ascii,
+                                  bytes=self._binary_with(other))
+
+    def _binary_with(self, other):
+        modes = set([self._mode(), other._mode()]) - set([None])
+        if len(modes) > 1:
+            raise TypeError("can't combine bytes and str sets")
+        return bytes in modes
+
+    @memoized
+    def simplified(self):
+        """
+        Return equivalent set with sorted, merged ranges and no duplicates,
+        or a single literal/character class if that's all the set matches.
+        """
+        intervals, classes = self._normalized()
+
+        if self.ascii:
+            for escape in ("\\w", "\\d"):
+                if intervals.issuperset(class_ascii_intervals[escape]):
+                    classes = sorted(set(classes) | set([escape]))
+        if "\\w" in classes and "\\d" in classes:
+            classes.remove("\\d")
+        for escape in classes:
+            if escape in class_ascii_intervals:
+                intervals = intervals - class_ascii_intervals[escape]
+
+        if not classes and len(intervals) == 1 and not self.invert:
+            char = chr(intervals.intervals[0][0])
+            return Literal(char.encode("latin-1") if self.bytes else char)
+        elif not intervals and len(classes) == 1:
+            escape = classes[0]
+            if not self.invert:
+                return CharacterClass(escape)
+            elif escape in inverse_classes:
+                return CharacterClass(inverse_classes[escape])
+
+        return Set.from_intervals(intervals, classes, invert=self.invert, ascii=self.ascii,
+                                  bytes=self.bytes)
+
+    ### ------ Rendering ------
+
+    @memoized
+    def render(self):
+        result = ["[^" if self.invert else "["]
+        result.extend(element.render() for element in self.elements)
+        result.append("]")
+        return "".join(result)
+
+    def __repr__(self):
+        args = []
         for element in self.elements:
-            result += element.render()
-        result += "]"
-        return result
+            if isinstance(element, Range) or not isinstance(element, _SetChars):
+                args.append(repr(element))
+            elif self.bytes:
+                args.append(repr(element.string.encode("latin-1")))
+            else:
+                args.append(repr(element.string))
+        if self.invert:
+            args.append("invert=True")
+        # bytes=True unless the elements make it a bytes set themselves
+        if self.bytes and (not any(isinstance(element, _SetChars) for element in self.elements)
+                           or any(isinstance(element, Range) and not element.bytes
+                                  for element in self.elements)):
+            args.append("bytes=True")
+        elif self.ascii and not self.bytes:
+            args.append("ascii=True")
+        return "Set(%s)" % ", ".join(args)
 
 not_in = Creator(Set, invert=True)
 not_in_ = not_in
@@ -32,28 +318,64 @@ class SetElement(Interface):
 @adapter_for(str)
 @implementer(SetElement)
 class _SetChars(object):
+    bytes = False
+
     def __init__(self, string):
         self.string = string
 
+    def _key(self):
+        return self.string
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other._key() == self._key()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self._key()))
+
     def render(self):
         return "".join(self.escape(c) for c in self.string)
 
+    def intervals(self):
+        return [(ord(c), ord(c)) for c in self.string]
+
     def escape(self, c):
-        if c in ("-", "]", "\\", "^"):
+        # [, &, ~ and | are escaped as doubling them may get a meaning in
+        # future versions of re
+        if c in ("-", "]", "\\", "^", "[", "&", "~", "|"):
             c = "\\" + c
         return c
 
 @implementer(SetElement)
 class Range(_SetChars):
     def __init__(self, min, max):
+        if isinstance(min, bytes) != isinstance(max, bytes):
+            raise TypeError("can't mix bytes and str in a range")
+        self.bytes = isinstance(min, bytes)
+        if self.bytes:
+            min = min.decode("latin-1")
+            max = max.decode("latin-1")
         self.min = min
         self.max = max
         assert len(min) == 1
         assert len(max) == 1
 
+    def _key(self):
+        return (self.min, self.max, self.bytes)
+
+    def intervals(self):
+        return [(ord(self.min), ord(self.max))]
+
     def render(self):
         return "%s-%s" % (self.escape(self.min), self.escape(self.max))
 
+    def __repr__(self):
+        if self.bytes:
+            return "Range(%r, %r)" % (self.min.encode("latin-1"), self.max.encode("latin-1"))
+        return "Range(%r, %r)" % (self.min, self.max)
+
 @adapter_for(IObjectSequence)
 @implementer(SetElement)
 def _make_range(sequence):
@@ -61,4 +383,7 @@ def _make_range(sequence):
 
 @implementer(SetElement)
 class CharacterClass(StrPattern):
-    pass
\ No newline at end of file
+    length = (1, 1)
+
+    def __repr__(self):
+        return "CharacterClass(%r)" % self.str
\ No newline at end of file
@@ -0,0 +1,147 @@
+# Copyright (c) 2012
+# Licensed under the terms of the MIT license; see LICENSE.txt
+"""
+Patterns which differ only in a few parameters, built once.
+
+    user_path = Template(lambda tenant, digits:
+                             Group(Literal("/"), Literal(tenant), Literal("/"),
+                                   Repeating(digit, count=digits)),
+                         tenant=str, digits=int)
+    user_path.compile(tenant="acme", digits=6)
+
+The build function is called once, with placeholder values for the holes;
+the pattern it returns is simplified and rendered, and the source is split
+into fixed fragments around the placeholders. Binding values then only
+escapes them and joins the fragments. Compiled regexes are kept in an LRU
+keyed by the bound values.
+
+str holes take a string which is matched literally; int holes take a
+non-negative integer, eg a repeat count. A hole must be used in a way that
+simplification leaves intact - merging two repeat counts into one, for
+example, loses the placeholder, and Template raises TemplateError.
+"""
+
+import re
+import threading
+from collections import OrderedDict
+
+from .base import compile_cache
+
+# private use characters, which re.escape leaves alone and which won't be
+# in real patterns
+_open, _close = "\ue000", "\ue001"
+# int placeholders are large, odd-looking numbers: repeat counts and literal
+# digits in real patterns won't contain them
+_int_base = 987650000000
+
+hole_types = (str, int)
+
+class TemplateError(Exception):
+    pass
+
+class Template(object):
+    """
+    Pattern with named, typed holes. holes maps each argument name of build
+    to str or int. Thread-safe.
+    """
+    def __init__(self, build, maxsize=256, **holes):
+        for name, kind in holes.items():
+            if kind not in hole_types:
+                raise TemplateError("hole %s: type must be str or int, not %r" % (name, kind))
+        if "flags" in holes:
+            raise TemplateError("a hole can't be named flags")
+        self.names = tuple(sorted(holes))
+        self.types = tuple(holes[name] for name in self.names)
+        self.maxsize = maxsize
+        self._compiled = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        placeholders = []
+        for index, kind in enumerate(self.types):
+            if kind is str:
+                placeholders.append("%s%d%s" % (_open, index, _close))
+            else:
+                placeholders.append(_int_base + index)
+        self.pattern = build(**dict(zip(self.names, placeholders)))
+        self.fragments, self.slots = self._split(self.pattern.toplevel().render(),
+                                                 [str(placeholder) for placeholder in placeholders])
+
+    def _split(self, source, placeholders):
+        """
+        Return (fragments, slots): the source around the placeholders, and
+        the hole index of each gap between fragments.
+        """
+        finder = re.compile("|".join(re.escape(placeholder) for placeholder in placeholders))
+        index = dict((placeholder, position) for position, placeholder in enumerate(placeholders))
+        fragments = []
+        slots = []
+        last = 0
+        for found in finder.finditer(source):
+            fragments.append(source[last:found.start()])
+            slots.append(index[found.group()])
+            last = found.end()
+        fragments.append(source[last:])
+
+        for position, name in enumerate(self.names):
+            if position not in slots:
+                raise TemplateError("hole %s was lost when simplifying the pattern" % name)
+        if any(_open in fragment or _close in fragment for fragment in fragments):
+            raise TemplateError("a str hole was split when simplifying the pattern")
+        return fragments, slots
+
+    def _values(self, values):
+        if set(values) != set(self.names):
+            raise TemplateError("expected values for %s, got %s"
+                                % (", ".join(self.names), ", ".join(sorted(values))))
+        result = []
+        for name, kind in zip(self.names, self.types):
+            value = values[name]
+            if kind is int:
+                if type(value) is not int or value < 0:
+                    raise TemplateError("hole %s needs a non-negative int, not %r" % (name, value))
+            elif not isinstance(value, str):
+                raise TemplateError("hole %s needs a str, not %r" % (name, value))
+            result.append(value)
+        return tuple(result)
+
+    def _render(self, values):
+        rendered = [re.escape(value) if kind is str else str(value)
+                    for value, kind in zip(values, self.types)]
+        parts = [self.fragments[0]]
+        for slot, fragment in zip(self.slots, self.fragments[1:]):
+            parts.append(rendered[slot])
+            parts.append(fragment)
+        return "".join(parts)
+
+    def render(self, **values):
+        "Return regex source with values bound to the holes"
+        return self._render(self._values(values))
+
+    def compile(self, flags=0, **values):
+        "Return compiled regex with values bound to the holes"
+        key = (self._values(values), flags)
+        with self._lock:
+            try:
+                compiled = self._compiled.pop(key)
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._compiled[key] = compiled
+                return compiled
+        compiled = compile_cache.compile(self._render(key[0]), flags)
+        with self._lock:
+            self._compiled[key] = compiled
+            while len(self._compiled) > self.maxsize:
+                self._compiled.popitem(last=False)
+        return compiled
+    __call__ = compile
+
+    def __repr__(self):
+        parts = [self.fragments[0]]
+        for slot, fragment in zip(self.slots, self.fragments[1:]):
+            parts.append("<%s:%s>" % (self.names[slot], self.types[slot].__name__))
+            parts.append(fragment)
+        return "<Template %s>" % "".join(parts)
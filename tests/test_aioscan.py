@@ -0,0 +1,84 @@
+"""
+aiter_matches() on an asyncio.StreamReader fed in process, in chunks which
+split matches and characters, compared with finditer() on the whole text.
+"""
+
+import asyncio
+import random
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+from re_gen.definitions import digit
+from re_gen.aioscan import ScanStats
+
+# key=value pairs, bounded: (?:id|user)=(\d{1,6})
+pair = Group(Either(Literal("id"), Literal("user")), Literal("="),
+             Group(Repeating(digit, min=1, max=6)), capturing=False)
+# unbounded: words, including a non-ascii letter
+word = Repeating(Set(Range("a", "z"), "é"))
+
+
+def _text(rnd, length):
+    pieces = ["id=", "user=", "12", "345678", " ", "café", "x", "=\n"]
+    return "".join(rnd.choice(pieces) for index in range(length))
+
+def _chunks(data, rnd, largest=7):
+    index = 0
+    while index < len(data):
+        size = rnd.randint(1, largest)
+        yield data[index:index + size]
+        index += size
+
+def _scan(pattern, chunks, **keywords):
+    "matches of pattern in a StreamReader fed chunks, as (span, groups)"
+    async def feed(reader):
+        for chunk in chunks:
+            reader.feed_data(chunk)
+            # let the scanner run between chunks
+            await asyncio.sleep(0)
+        reader.feed_eof()
+
+    async def scan():
+        reader = asyncio.StreamReader()
+        feeding = asyncio.ensure_future(feed(reader))
+        result = [(match.span(), match.groups())
+                  async for match in pattern.aiter_matches(reader, **keywords)]
+        await feeding
+        return result
+    return asyncio.run(scan())
+
+def _expected(pattern, text):
+    return [(match.span(), match.groups()) for match in pattern.compiled.finditer(text)]
+
+
+def test_matches_across_chunks():
+    rnd = random.Random(23)
+    for index in range(20):
+        text = _text(rnd, 60)
+        chunks = list(_chunks(text.encode("utf-8"), rnd))
+        for pattern in [pair, word]:
+            assert _scan(pattern, chunks, read_size=5) == _expected(pattern, text), text
+
+def test_split_characters_are_decoded_whole():
+    chunks = [b"caf", b"\xc3", b"\xa9 ab", b"c"]
+    assert _scan(word, chunks) == [((0, 4), ()), ((5, 8), ())]
+
+def test_bytes_patterns():
+    rnd = random.Random(230)
+    pattern = Group(Literal(b"id="), Group(Repeating(digit, min=1, max=6)), capturing=False)
+    text = _text(rnd, 200).encode("utf-8")
+    chunks = list(_chunks(text, rnd))
+    assert _scan(pattern, chunks, read_size=5) == _expected(pattern, text)
+
+def test_batches_in_the_thread_pool():
+    rnd = random.Random(2300)
+    text = _text(rnd, 2000)
+    chunks = list(_chunks(text.encode("utf-8"), rnd, 300))
+    stats = ScanStats()
+    found = _scan(pair, chunks, read_size=64, inline_size=16, batch_size=128, stats=stats)
+    assert found == _expected(pair, text)
+    assert stats.offloaded > 0
+    assert stats.matches == len(found)
+    assert stats.bytes_read == len(text.encode("utf-8"))
@@ -0,0 +1,68 @@
+import re
+
+import pytest
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+from re_gen.definitions import digit, alphanum
+from re_gen import analysis
+
+
+def test_nested_repeat():
+    pattern = Group(Literal("x"),
+                    Repeating(Group(Repeating(Literal("a")), Repeating(Literal("b"), min=0, max=1))))
+    finding, = analysis.analyze(pattern)
+    assert finding.path == ("children[1]",)
+    assert str(finding) == ("root.children[1]: nested repeat root.children[1].child.children[0] "
+                            "can match the same text as the outer repeat, O(2^n)")
+
+def test_separated_nested_repeat():
+    pattern = Repeating(Group(Repeating(Literal("a")), Literal("b"), capturing=False))
+    assert analysis.analyze(pattern) == []
+
+def test_overlapping_alternatives():
+    pattern = Group(Literal("x"), Repeating(Either(digit, alphanum)))
+    finding, = analysis.analyze(pattern)
+    assert finding.path == ("children[1]",)
+    assert "alternatives root.children[1].child.branches[0] and " \
+           "root.children[1].child.branches[1]" in finding.message
+
+def test_adjacent_repeats():
+    pattern = Group(Literal("x"), Repeating(digit), Repeating(digit, min=0), Literal("y"))
+    finding, = analysis.analyze(pattern)
+    assert finding.degree == 2
+    assert finding.location == "root"
+    assert "root.children[1], root.children[2]" in finding.message
+
+def test_possessified():
+    pattern = Group(Repeating(Set("abc")), Literal("="), Repeating(digit), capturing=False)
+    result = analysis.possessified(pattern)
+    assert result.render() == "[a-c]++=\\d++"
+    for text in ["ab=12", "ab=", "=1", "abc"]:
+        assert ((re.fullmatch(result.render(), text) is None) ==
+                (re.fullmatch(pattern.rendered, text) is None))
+
+def test_possessified_keeps_repeats_giving_back():
+    pattern = Group(Repeating(Set("ab")), Literal("b"), capturing=False)
+    assert analysis.possessified(pattern).render() == "[ab]+b"
+
+def test_nested_optional():
+    # ((?:ab?|b)*c) splits "abbb..." into iterations in exponentially many ways
+    pattern = Group(Repeating(Either("a", "b", "ab"), min=0), "c")
+    finding, = analysis.analyze(pattern)
+    assert finding.complexity == analysis.exponential
+    assert "nested repeat" in finding.message
+    with pytest.raises(analysis.BacktrackingError):
+        analysis.check(pattern)
+
+def test_nested_optional_of_the_same_character():
+    pattern = Repeating(Group(Literal("a"), Repeating(Literal("a"), min=0, max=1), capturing=False))
+    assert pattern.toplevel().render() == "(?:aa?)+"
+    finding, = analysis.analyze(pattern)
+    assert finding.complexity == analysis.exponential
+
+def test_separated_nested_optional():
+    pattern = Repeating(Group(Literal("a"), Repeating(Literal("b"), min=0, max=1), capturing=False))
+    assert analysis.analyze(pattern) == []
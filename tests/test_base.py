@@ -0,0 +1,134 @@
+import pickle
+import random
+import re
+
+from re_gen.base import Literal, derepeat, CompileCache, compile_cache
+from re_gen.grouping import Group, Either, PrevGroup
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+from re_gen.definitions import digit
+
+
+def _naive_derepeat(sequence):
+    """
+    derepeat() as it was before it used a prefix function: try each period
+    that divides the length, shortest first. The original loop stopped at
+    length - 2, missing "aa" -> ("a", 2); this one doesn't.
+    """
+    length = len(sequence)
+    for sublen in range(1, length):
+        if length % sublen != 0:
+            continue
+        subcount = length // sublen
+        firstsub = sequence[:sublen]
+        if firstsub * subcount == sequence:
+            return (firstsub, subcount)
+    return (sequence, 1)
+
+def _random_sequence(rnd, items):
+    if rnd.random() < 0.5:
+        # a repetition, perhaps broken by a change to one item
+        unit = [rnd.choice(items) for index in range(rnd.randint(1, 4))]
+        sequence = unit * rnd.randint(1, 6)
+        if rnd.random() < 0.3:
+            sequence[rnd.randrange(len(sequence))] = rnd.choice(items)
+        return sequence
+    return [rnd.choice(items) for index in range(rnd.randint(0, 12))]
+
+
+def test_derepeat():
+    assert derepeat("") == ("", 1)
+    assert derepeat("a") == ("a", 1)
+    assert derepeat("aa") == ("a", 2)
+    assert derepeat("abab") == ("ab", 2)
+    assert derepeat("abaab") == ("abaab", 1)
+    assert derepeat(("x", "y", "x", "y", "x", "y")) == (("x", "y"), 3)
+
+def test_derepeat_matches_naive_version():
+    rnd = random.Random(3)
+    nodes = [Literal("a"), Literal("b"), Literal("ab")]
+    for index in range(5000):
+        sequence = _random_sequence(rnd, "abc")
+        text = "".join(sequence)
+        assert derepeat(text) == _naive_derepeat(text), text
+        assert derepeat(tuple(sequence)) == _naive_derepeat(tuple(sequence)), sequence
+        children = _random_sequence(rnd, nodes)
+        assert derepeat(children) == _naive_derepeat(children), children
+
+
+def test_pickle():
+    patterns = [Group(Literal("a"), ("b", digit), name="x"), Either("a", digit),
+                Repeating(digit, min=2), Set(Range("a", "z"), digit, "q"),
+                Group(Group(digit, name="y"), PrevGroup("y"), capturing=False),
+                Group(Literal(b"ab"), Repeating(Set(b"xy")), capturing=False)]
+    for pattern in patterns:
+        rendered = pattern.toplevel().render()
+        pattern.freeze()
+        copy = pickle.loads(pickle.dumps(pattern))
+        # interned: equal to a live node, so the same one
+        assert copy is pattern
+        assert copy.toplevel().render() == rendered
+
+def test_pickle_shared_subtrees():
+    shared = Repeating(Set("ab"), max=3)
+    pattern = Group(shared, Literal("-"), shared, Either(shared, digit))
+    data = pickle.dumps(pattern)
+    assert data.count(b"ab") == 1
+    rendered = pattern.toplevel().render()
+    del pattern, shared
+    copy = pickle.loads(data)
+    assert copy.toplevel().render() == rendered
+    assert copy.children[0] is copy.children[2] is copy.children[3].branches[0]
+
+
+def test_compile_cache_stats():
+    cache = CompileCache(maxsize=2)
+    first = cache.compile("a+")
+    assert cache.compile("a+") is first
+    assert cache.compile("a+", re.IGNORECASE) is not first
+    assert cache.stats() == {"hits": 1, "misses": 2, "evictions": 0, "size": 2, "maxsize": 2}
+    cache.compile("b+")
+    assert cache.stats()["evictions"] == 1
+    assert ("a+", 0) not in cache
+    cache.clear()
+    assert cache.stats() == {"hits": 0, "misses": 0, "evictions": 0, "size": 0, "maxsize": 2}
+
+def test_compile_cache_default_size():
+    # at least as large as re's own cache
+    assert CompileCache().maxsize >= 512
+    assert compile_cache.maxsize >= 512
+
+def test_compile_cache_resize():
+    cache = CompileCache(maxsize=4)
+    for source in ["a", "b", "c", "d"]:
+        cache.compile(source)
+    cache.compile("a")
+    cache.resize(2)
+    # least recently used first
+    assert len(cache) == 2
+    assert ("a", 0) in cache and ("d", 0) in cache
+    assert cache.stats()["evictions"] == 2
+    cache.resize(3)
+    cache.compile("e")
+    assert len(cache) == 3
+
+def test_compile_cache_prewarm():
+    patterns = [Group(Literal("prewarm"), digit), (Literal("prewarm-i"), re.IGNORECASE)]
+    assert compile_cache.prewarm(patterns) == 2
+    assert ("prewarm\\d", 0) in compile_cache
+    assert ("prewarm\\-i", re.IGNORECASE) in compile_cache
+    assert compile_cache.prewarm([Literal("prewarm-m")], re.MULTILINE) == 1
+    assert ("prewarm\\-m", re.MULTILINE) in compile_cache
+    hits = compile_cache.stats()["hits"]
+    Literal("prewarm-i").compile(re.IGNORECASE)
+    assert compile_cache.stats()["hits"] == hits + 1
+
+def test_flags_are_kept_out_of_nodes():
+    pattern = Group(Literal("flags"), digit)
+    assert pattern.freeze(re.IGNORECASE).fullmatch("FLAGS1")
+    assert pattern.compile(re.IGNORECASE).fullmatch("FLAGS1")
+    # an equal node is the same one, and wasn't compiled with the flags
+    assert Group(Literal("flags"), digit) is pattern
+    assert not pattern.compiled.flags & re.IGNORECASE
+    assert not pattern.search("FLAGS1")
+    assert pattern.search("FLAGS1", re.IGNORECASE)
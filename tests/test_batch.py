@@ -0,0 +1,136 @@
+import random
+from array import array
+
+import pytest
+
+from re_gen import base, batch
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit
+
+functions = [("match", batch.match_many), ("search", batch.search_many),
+             ("fullmatch", batch.fullmatch_many)]
+
+
+class _Counting(object):
+    "re matcher recording the texts it's given"
+    def __init__(self, regex):
+        self.regex = regex
+        self.texts = []
+
+    def __getattr__(self, method):
+        def run(text):
+            self.texts.append(text)
+            return getattr(self.regex, method)(text)
+        return run
+
+@pytest.fixture
+def counting(monkeypatch):
+    "add engine 'counting', returning the _Counting used for each pattern"
+    matchers = {}
+    def factory(pattern, flags):
+        return matchers.setdefault(pattern, _Counting(pattern.compile(flags)))
+    monkeypatch.setitem(base.engines, "counting", factory)
+    return matchers
+
+def _texts(rnd, count, distinct):
+    values = ["".join(rnd.choice("ab1-") for length in range(rnd.randint(0, 8)))
+              for index in range(distinct)]
+    return [rnd.choice(values) for index in range(count)]
+
+def _expected(pattern, method, texts):
+    regex = pattern.compiled
+    return [getattr(regex, method)(text) is not None for text in texts]
+
+# a\d+b?, min length 2, no max; (?:ab|1){2}, lengths 2 to 4
+patterns = [Group(Literal("a"), Repeating(digit), Repeating(Literal("b"), min=0, max=1),
+                  capturing=False),
+            Repeating(Either(Literal("ab"), Literal("1")), count=2)]
+
+
+def test_results_match_an_re_loop():
+    rnd = random.Random(19)
+    for pattern in patterns:
+        for distinct in [3, 300]:
+            texts = _texts(rnd, 500, distinct)
+            for method, function in functions:
+                expected = _expected(pattern, method, texts)
+                for fold in [None, True, False]:
+                    for prefilter in [False, True]:
+                        result = function(pattern, texts, fold=fold, prefilter=prefilter,
+                                          as_numpy=False)
+                        assert isinstance(result, array)
+                        assert [bool(value) for value in result] == expected
+
+def test_iterables_and_the_dfa_engine():
+    texts = ["a1", "a12b", "xa1", "", "a", "a1b"] * 3
+    for method, function in functions:
+        expected = _expected(patterns[0], method, texts)
+        for fold in [None, True, False]:
+            result = function(patterns[0], iter(texts), fold=fold, as_numpy=False, engine="dfa")
+            assert [bool(value) for value in result] == expected
+
+def test_folding_matches_each_value_once(counting):
+    texts = ["a1", "b", "a1", "a2b", "b"] * 10
+    batch.search_many(patterns[0], texts, fold=True, as_numpy=False, engine="counting")
+    assert sorted(counting[patterns[0]].texts) == ["a1", "a2b", "b"]
+    del counting[patterns[0]].texts[:]
+    batch.search_many(patterns[0], texts, fold=False, as_numpy=False, engine="counting")
+    assert counting[patterns[0]].texts == texts
+
+def test_sampling_threshold(monkeypatch, counting):
+    monkeypatch.setattr(batch, "fold_sample", 8)
+    matcher = counting.setdefault(patterns[0], _Counting(patterns[0].compiled))
+    # 4 distinct of 8 sampled: folded, whatever follows the sample
+    texts = ["a1", "a2", "a3", "a4"] * 2 + ["x%d" % index for index in range(20)]
+    batch.match_many(patterns[0], texts, as_numpy=False, engine="counting")
+    assert len(matcher.texts) == 24
+    # 5 distinct: not folded
+    del matcher.texts[:]
+    texts = ["a1", "a2", "a3", "a4", "a5", "a1", "a2", "a3"] + ["a1"] * 20
+    batch.match_many(patterns[0], texts, as_numpy=False, engine="counting")
+    assert len(matcher.texts) == 28
+
+def test_prefilter_by_match_length(counting):
+    pattern = patterns[1]
+    assert pattern.match_length() == (2, 4)
+    texts = ["", "1", "11", "ab1", "abab", "ab11a", "abab11"]
+    matcher = counting.setdefault(pattern, _Counting(pattern.compiled))
+    for fold in [True, False]:
+        for method, function in functions:
+            del matcher.texts[:]
+            result = function(pattern, texts, fold=fold, prefilter=True, as_numpy=False,
+                              engine="counting")
+            assert [bool(value) for value in result] == _expected(pattern, method, texts)
+            # too short to match; only fullmatch rejects strings too long
+            if method == "fullmatch":
+                assert sorted(matcher.texts) == ["11", "ab1", "abab"]
+            else:
+                assert sorted(matcher.texts) == ["11", "ab1", "ab11a", "abab", "abab11"]
+
+def test_no_prefilter_without_a_minimum(counting):
+    pattern = Repeating(digit, min=0)
+    texts = ["", "1", "x"]
+    result = batch.match_many(pattern, texts, fold=False, prefilter=True, as_numpy=False,
+                              engine="counting")
+    assert list(result) == [1, 1, 1]
+    assert counting[pattern].texts == texts
+
+def test_without_numpy(monkeypatch):
+    monkeypatch.setattr(batch, "numpy", None)
+    assert isinstance(batch.match_many(patterns[0], ["a1"]), array)
+    with pytest.raises(ImportError):
+        batch.match_many(patterns[0], ["a1"], as_numpy=True)
+
+def test_numpy():
+    numpy = pytest.importorskip("numpy")
+    texts = ["a1", "xa1", "a1b", "", "a12"] * 5
+    for method, function in functions:
+        expected = _expected(patterns[0], method, texts)
+        for fold in [True, False]:
+            result = function(patterns[0], texts, fold=fold)
+            assert isinstance(result, numpy.ndarray)
+            assert result.dtype == numpy.bool_
+            assert result.tolist() == expected
+            assert isinstance(function(patterns[0], texts, fold=fold, as_numpy=False), array)
@@ -0,0 +1,70 @@
+"""
+Trees of 100k nodes, far deeper than the recursion limit: everything which
+walks a tree must do so with an explicit stack, and in linear time.
+"""
+
+import pickle
+import sys
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.analysis import analyze, possessified
+
+nodes = 100000
+
+
+def _nested(count, leaf="x"):
+    "count nodes, nested count // 4 levels deep: (?:(?:...)y|z) in a capture"
+    pattern = Literal(leaf)
+    for index in range(count // 4):
+        pattern = Group(Either(Group(pattern, Literal("y"), capturing=False), Literal("z")))
+    return pattern
+
+def test_deeper_than_the_recursion_limit():
+    assert sys.getrecursionlimit() < nodes // 4
+
+
+def test_render():
+    rendered = _nested(nodes).toplevel().render()
+    levels = nodes // 4
+    assert rendered.count("x") == 1
+    assert rendered.count("y") == rendered.count("z") == levels
+    assert rendered.count("(") == rendered.count(")") == 2 * levels - 1
+
+def test_match_length():
+    pattern = _nested(nodes)
+    assert pattern.match_length() == (1, nodes // 4 + 1)
+    assert pattern.required_literals() == frozenset()
+
+def test_freeze():
+    # simplifying to patterns shallow enough for re to compile
+    pattern = Literal("x")
+    for index in range(nodes // 2):
+        pattern = Group(pattern, capturing=False)
+    assert pattern.freeze().pattern == "x"
+    pattern = Literal("x")
+    for index in range(nodes // 2):
+        pattern = Repeating(pattern, min=0, max=1)
+    assert pattern.freeze().pattern == "x?"
+    assert pattern.search("ax").span() == (0, 0)
+
+def test_analysis():
+    pattern = _nested(nodes)
+    assert analyze(pattern) == []
+    assert possessified(pattern) is not None
+
+def test_pickle():
+    pattern = _nested(nodes)
+    data = pickle.dumps(pattern)
+    rendered = pattern.toplevel().render()
+    del pattern
+    assert pickle.loads(data).toplevel().render() == rendered
+
+def test_siblings_differing_at_the_leaves():
+    # equal-looking siblings are told apart by identity, not by comparing
+    # down to the leaves
+    pattern = Group(Repeating(_nested(nodes // 2, "x"), min=0),
+                    Repeating(_nested(nodes // 2, "w"), min=0), capturing=False)
+    rendered = pattern.toplevel().render()
+    assert rendered.count("x") == rendered.count("w") == 1
@@ -0,0 +1,181 @@
+"""
+Differential tests of the DFA engine against re: whether the DFA is used or
+not, matches must be re's.
+"""
+
+import random
+import re
+import threading
+
+from re_gen.base import Literal, inf
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+from re_gen.definitions import (digit, alphanum, anychar, whitespace, nonalphanum,
+        linestart, lineend, wordboundary)
+from re_gen import dfa
+
+alphabet = "ab1 \n-"
+
+
+def _spans(matches):
+    return [match.span() for match in matches]
+
+def check(pattern, text, pos=0):
+    regex = pattern.compiled
+    matcher = pattern.matcher("dfa")
+    found = matcher.search(text, pos)
+    expected = regex.search(text, pos)
+    assert (found and found.span()) == (expected and expected.span())
+    match = matcher.match(text, pos)
+    expected = regex.match(text, pos)
+    assert (match and match.span()) == (expected and expected.span())
+    assert _spans(matcher.finditer(text)) == _spans(regex.finditer(text))
+    assert (matcher.fullmatch(text) is None) == (regex.fullmatch(text) is None)
+
+
+def test_lazy_repeats_match_like_re():
+    pattern = Group(Literal("<"), Repeating(anychar, greedy=False), Literal(">"), capturing=False)
+    matcher = pattern.matcher("dfa")
+    assert matcher.uses_dfa
+    assert pattern.search("<a><b>", engine="dfa").group() == "<a>"
+    assert _spans(matcher.finditer("<a><b>")) == [(0, 3), (3, 6)]
+
+def test_lazy_repeats_inside_other_nodes_match_like_re():
+    lazy = Repeating(Set("ab"), min=0, greedy=False)
+    pattern = Group(Either(Group(lazy, Literal("b"), capturing=False), Literal("x")), Literal("a"))
+    assert pattern.matcher("dfa").uses_dfa
+    for text in ["abba", "bbaba", "xa", ""]:
+        check(pattern, text)
+
+def test_fixed_non_greedy_repeats_use_the_dfa():
+    pattern = Repeating(Literal("a"), count=2, greedy=False)
+    assert pattern.matcher("dfa").uses_dfa
+    check(pattern, "aaaaa")
+
+def test_anchors_match_like_re():
+    patterns = [Group(linestart, Literal("a"), capturing=False),
+                Group(Literal("a"), lineend, capturing=False),
+                Group(wordboundary, Repeating(alphanum), wordboundary, capturing=False)]
+    for pattern in patterns:
+        assert not pattern.matcher("dfa").uses_dfa
+        for text in ["a", "ba\na", "a b\n", "", "ab-a1"]:
+            check(pattern, text)
+            check(pattern, text, 1)
+
+def test_empty_matches():
+    patterns = [Repeating(Literal("a"), min=0),
+                Either(Literal(""), Literal("b")),
+                Group(Repeating(Set("ab"), min=0), Repeating(digit, min=0, max=2)),
+                Literal("")]
+    for pattern in patterns:
+        assert pattern.matcher("dfa").uses_dfa
+        for text in ["", "a", "b", "ab1", "-a-", "aab11b"]:
+            check(pattern, text)
+            check(pattern, text, len(text))
+
+def test_first_alternative():
+    pattern = Either(Literal("a"), Literal("ab"), _factor=False)
+    assert pattern.matcher("dfa").uses_dfa
+    assert pattern.search("xab", engine="dfa").span() == (1, 2)
+    assert pattern.matcher("dfa").fullmatch("ab").span() == (0, 2)
+
+def test_greedy_repeat_before_optional():
+    # re takes (ab)* as far as it goes, then (abc)? matches nothing; the
+    # longest match would be all of ababc
+    pattern = Group(Repeating(Group(Literal("ab")), min=0), Repeating(Group(Literal("abc")), min=0, max=1))
+    assert pattern.matcher("dfa").uses_dfa
+    assert pattern.search("ababc", engine="dfa").span() == (0, 4)
+    for text in ["ababc", "abc", "ababab", "xabcab"]:
+        check(pattern, text)
+def test_repeats_of_empty_matches_match_like_re():
+    # re stops (?:|a)* after the empty iteration; the NFA would go on
+    patterns = [Repeating(Either(Literal(""), Literal("a"), _factor=False), min=0),
+                Repeating(Either(Group(), digit, Set(Range("a", "c"), digit)))]
+    for pattern in patterns:
+        assert not pattern.matcher("dfa").uses_dfa
+        for text in ["a", "-11-", "aa1"]:
+            check(pattern, text)
+
+def test_non_empty_match_after_an_empty_one():
+    pattern = Either(Literal(""), Literal("a"), _factor=False)
+    assert pattern.matcher("dfa").uses_dfa
+    assert _spans(pattern.matcher("dfa").finditer("aba")) == [(0, 0), (0, 1), (1, 1), (2, 2), (2, 3), (3, 3)]
+    for text in ["", "a", "ba", "aab"]:
+        check(pattern, text)
+
+
+def test_threads_share_a_matcher():
+    # (a|b)*a(a|b){6} needs a DFA state for each of the last 7 characters
+    pattern = Group(Repeating(Set("ab"), min=0), Literal("a"), Repeating(Set("ab"), count=6),
+                    capturing=False)
+    regex = pattern.compiled
+    rnd = random.Random(18)
+    texts = ["".join(rnd.choice("ab-") for length in range(rnd.randint(0, 40)))
+             for index in range(200)]
+    expected = [_spans(regex.finditer(text)) for text in texts]
+    matcher = dfa.DFAMatcher(pattern)
+    errors = []
+
+    def run():
+        try:
+            for text, spans in zip(texts, expected):
+                assert _spans(matcher.finditer(text)) == spans
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=run) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert matcher.uses_dfa
+    assert len(matcher.forward.sets) == len(set(matcher.forward.sets))
+
+def test_threads_share_the_matcher_cache():
+    patterns = [Repeating(Literal("x" * length)) for length in range(1, 6)]
+    results = []
+
+    def run():
+        results.append([dfa.matcher(pattern) for pattern in patterns * 20])
+
+    threads = [threading.Thread(target=run) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for result in results:
+        assert [id(matcher) for matcher in result] == [id(matcher) for matcher in results[0]]
+    assert len(dfa._matchers) <= dfa.matcher_cache_size
+
+
+def _random_tree(rnd, depth):
+    if depth == 0 or rnd.random() < 0.3:
+        return rnd.choice([Literal(rnd.choice(["a", "b", "ab", ""])), Set("ab"),
+                           Set("b", "1", invert=True), digit, alphanum, anychar,
+                           whitespace, nonalphanum, Set(Range("a", "c"), digit),
+                           linestart, lineend, wordboundary])
+    kind = rnd.randint(0, 2)
+    if kind == 0:
+        return Group(*[_random_tree(rnd, depth - 1) for index in range(rnd.randint(0, 3))],
+                     capturing=rnd.random() < 0.5)
+    elif kind == 1:
+        return Repeating(_random_tree(rnd, depth - 1), min=rnd.randint(0, 2),
+                         max=rnd.choice([1, 2, 3, inf, inf]), greedy=rnd.random() < 0.7)
+    return Either(*[_random_tree(rnd, depth - 1) for index in range(rnd.randint(1, 3))])
+
+def test_random_patterns():
+    rnd = random.Random(18)
+    used_dfa = 0
+    for index in range(400):
+        pattern = Group(_random_tree(rnd, 4), capturing=False)
+        try:
+            pattern.compiled
+        except re.error:
+            continue
+        used_dfa += pattern.matcher("dfa").uses_dfa
+        for attempt in range(10):
+            text = "".join(rnd.choice(alphabet) for length in range(rnd.randint(0, 10)))
+            check(pattern, text, rnd.randint(0, len(text)))
+    assert used_dfa > 50
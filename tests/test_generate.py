@@ -0,0 +1,31 @@
+import re
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either, PrevGroup
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+from re_gen.generate import Generator
+
+
+def test_nested_groups_are_numbered_by_opening_parenthesis():
+    pattern = Group(Group(Group(Set("ab")), Set("cd")), PrevGroup(1), PrevGroup(2),
+                    capturing=False)
+    generator = Generator(pattern, seed=1, verify=False)
+    regex = re.compile(pattern.rendered)
+    for text in generator.positives(50):
+        match = regex.fullmatch(text)
+        assert match is not None, text
+        assert text == match.group(1) + match.group(1) + match.group(2)
+
+def test_positives_match_and_negatives_dont():
+    pattern = Group(Repeating(Either(Literal("ab"), Set("xyz")), min=1, max=4),
+                    Group(Repeating(Set("0123456789"), min=2), name="number"))
+    generator = Generator(pattern, seed=3)
+    regex = re.compile(pattern.rendered)
+    assert all(regex.fullmatch(text) for text in generator.positives(200))
+    assert not any(regex.fullmatch(text) for text in generator.negatives(200))
+
+def test_seeded_generators_repeat():
+    pattern = Repeating(Set("abc"), min=1, max=10)
+    assert (list(Generator(pattern, seed=7).positives(20)) ==
+            list(Generator(pattern, seed=7).positives(20)))
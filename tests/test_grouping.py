@@ -0,0 +1,67 @@
+import random
+import re
+
+import pytest
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit
+
+
+def test_either_factors_literals():
+    assert Either("foobar", "foobaz", "food").simplified().render() == "foo(?:ba[rz]|d)"
+    assert Either(b"ab", b"ac").simplified().render() == "a[bc]"
+
+def test_either_keeps_branch_order():
+    # "fo" is tried after \d, as written, not moved ahead of it with "foo"
+    pattern = Either("foo", digit, "fo", "fox")
+    assert pattern.simplified().render() == "(?:foo|\\d|fox?)"
+    assert pattern.simplified().search("a1fox").group() == "1"
+
+def test_either_renders_branches_bare():
+    pattern = Either(Group(Literal("a"), digit, capturing=False), Literal("c"), _factor=False)
+    assert pattern.render() == "(?:a\\d|c)"
+    pattern = Either(Group(Literal("a"), digit), Group(Literal("c"), atomic=True), _factor=False)
+    assert pattern.render() == "(?:(a\\d)|(?>c))"
+
+def test_either_rejects_mixed_modes():
+    with pytest.raises(TypeError):
+        Either("a", digit, b"b").simplified()
+
+
+def _source(branch):
+    return Group(branch, capturing=False).toplevel().render()
+
+def _runs_longest_first(branches):
+    "branches as re source, with each run of adjacent strings longest first"
+    result = []
+    run = []
+    for branch in branches + [None]:
+        if isinstance(branch, str):
+            run.append(branch)
+            continue
+        result.extend(re.escape(word) for word in sorted(run, key=len, reverse=True))
+        run = []
+        if branch is not None:
+            result.append(_source(branch))
+    return "(?:%s)" % "|".join(result)
+
+def test_either_matches_like_alternation():
+    rnd = random.Random(6)
+    others = [digit, Repeating(Literal("a")), Group(Literal("b"), digit, capturing=False)]
+    for index in range(500):
+        branches = []
+        for count in range(rnd.randint(1, 6)):
+            if rnd.random() < 0.7:
+                branches.append("".join(rnd.choice("ab") for length in range(rnd.randint(1, 3))))
+            else:
+                branches.append(rnd.choice(others))
+        pattern = Either(*branches).simplified().toplevel()
+        expected = re.compile(_runs_longest_first(branches))
+        compiled = re.compile(pattern.render())
+        for attempt in range(10):
+            text = "".join(rnd.choice("ab1") for length in range(rnd.randint(0, 6)))
+            found = compiled.search(text)
+            match = expected.search(text)
+            assert (found and found.span()) == (match and match.span()), (branches, text)
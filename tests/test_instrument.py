@@ -0,0 +1,23 @@
+import json
+
+from re_gen.base import Literal
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+from re_gen import instrument
+
+
+def test_export_json():
+    text_pattern = Group(Literal("id="), Repeating(Set("0123456789")), capturing=False)
+    bytes_pattern = Group(Literal(b"\xff"), Repeating(Set(b"ab")), capturing=False)
+    with instrument.collecting() as collector:
+        text_pattern.search("x id=12")
+        text_pattern.search("nothing")
+        bytes_pattern.search(b"-\xffab")
+    exported = json.loads(collector.export_json())
+    assert len(exported) == 2
+    text_stats = exported[instrument.pattern_key(text_pattern)]
+    assert (text_stats["calls"], text_stats["hits"]) == (2, 1)
+    bytes_stats = exported[instrument.pattern_key(bytes_pattern)]
+    assert bytes_stats["pattern"] == bytes_pattern.rendered.decode("latin-1")
+    assert bytes_stats["hits"] == 1
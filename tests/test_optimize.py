@@ -0,0 +1,157 @@
+import random
+import re
+import sys
+
+from re_gen.base import Literal, inf
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range
+from re_gen.definitions import digit
+from re_gen.generate import Generator
+from re_gen.optimize import (Optimizer, fuse_literals, merge_repeats, flatten_groups,
+        hoist_affixes, possessify)
+
+
+def sequence(*children):
+    return Group(*children, capturing=False, _atomic=False)
+
+def optimized(pattern, name):
+    "pattern optimized with only the pass name, and the number of rewrites"
+    optimizer = Optimizer()
+    for rewrite in optimizer.passes:
+        rewrite.enabled = rewrite.name == name
+    return optimizer.optimize(pattern).render(), optimizer.stats[name]["rewrites"]
+
+
+def test_fuse_literals():
+    # a, b -> ab
+    assert fuse_literals(sequence(Literal("a"), Literal("b"))).render() == "ab"
+    assert fuse_literals(sequence(Literal("a"), digit)) is None
+    assert optimized(sequence(Literal("a"), digit, Literal("b"), Literal("c"), digit),
+                     "fuse_literals") == ("a\\dbc\\d", 1)
+
+def test_fuse_literals_keeps_modified_atoms():
+    star = Repeating(Literal("x"), min=0).modifier
+    assert fuse_literals(sequence(Literal("a"), Literal("b"), star)) is None
+
+def test_merge_repeats():
+    # x x* -> x+
+    assert merge_repeats(sequence(digit, Repeating(digit, min=0))).render() == "\\d+"
+    # x{2}x{1,3} -> x{3,5}
+    node = sequence(Repeating(digit, count=2), Repeating(digit, min=1, max=3))
+    assert merge_repeats(node).render() == "\\d{3,5}"
+    assert optimized(sequence(digit, Repeating(digit, min=0), Literal("y")),
+                     "merge_repeats") == ("\\d+y", 1)
+
+def test_merge_repeats_of_literals():
+    # ab(?:ab)* -> (?:ab)+
+    node = sequence(Literal("ab"), Repeating(Literal("ab"), min=0))
+    assert merge_repeats(node).render() == "(?:ab)+"
+    assert optimized(sequence(Literal("xab"), Repeating(Literal("ab"), min=0)),
+                     "merge_repeats") == ("x(?:ab)+", 1)
+    assert optimized(sequence(Repeating(Literal("ab"), min=0), Literal("abx")),
+                     "merge_repeats") == ("(?:ab)+x", 1)
+    assert optimized(sequence(Literal("xab"), Repeating(Literal("ab"), max=3), Literal("aby")),
+                     "merge_repeats") == ("x(?:ab){3,5}y", 1)
+    node = sequence(Literal(b"xab"), Repeating(Literal(b"ab"), min=0))
+    assert merge_repeats(node).render() == "x(?:ab)+"
+    assert merge_repeats(node).is_bytes()
+
+def test_merge_repeats_leaves_possessive_and_capturing_repeats():
+    node = sequence(Literal("xab"), Repeating(Literal("ab"), min=0, possessive=True))
+    assert merge_repeats(node) is None
+    node = sequence(Literal("ab"), Repeating(Group(Literal("ab")), min=0))
+    assert merge_repeats(node) is None
+    node = sequence(digit, Repeating(digit, min=0, possessive=True))
+    assert merge_repeats(node) is None
+
+def test_flatten_groups():
+    # a(?:bc)d -> abcd
+    node = sequence(Literal("a"), Group(Literal("bc"), capturing=False), Literal("d"))
+    assert flatten_groups(node).render() == "abcd"
+    # (?:a|(?:bc)) -> (?:a|bc); the branch renders bare either way
+    node = Either(Literal("a"), Group(Literal("bc"), capturing=False), _factor=False)
+    assert flatten_groups(node).branches[1] is sequence(Literal("bc"))
+    assert flatten_groups(node).render() == "(?:a|bc)"
+
+def test_flatten_groups_keeps_captures_and_modified_groups():
+    node = sequence(Literal("a"), Group(Literal("bc")), Literal("d"))
+    assert flatten_groups(node) is None
+    star = Repeating(Literal("x"), min=0).modifier
+    node = sequence(Literal("a"), Group(Literal("bc"), capturing=False), star)
+    assert flatten_groups(node) is None
+
+def test_hoist_affixes():
+    # (?:ab|ac) -> a(?:b|c)
+    node = Either(Literal("ab"), Literal("ac"), _factor=False)
+    assert hoist_affixes(node).toplevel().render() == "a(?:b|c)"
+    # (?:ax|bx) -> (?:a|b)x
+    node = Either(Literal("ax"), Literal("bx"), _factor=False)
+    assert hoist_affixes(node).toplevel().render() == "(?:a|b)x"
+    assert optimized(Either(Literal("GET /1"), sequence(Literal("GET /a"), digit), _factor=False),
+                     "hoist_affixes") == ("GET\\ /(?:1|a\\d)", 1)
+
+def test_hoist_affixes_keeps_captures():
+    node = Either(Group(Literal("ab")), Group(Literal("ac")), _factor=False)
+    assert hoist_affixes(node) is None
+
+def test_possessify():
+    # [a-z]+= -> [a-z]++=
+    pattern = sequence(Repeating(Set(Range("a", "z"))), Literal("="))
+    assert possessify(pattern).render() == "[a-z]++="
+    assert optimized(pattern, "possessify") == ("[a-z]++=", 1)
+    assert not any(rewrite.enabled for rewrite in Optimizer().passes
+                   if rewrite.name == "possessify")
+
+def test_statistics():
+    optimizer = Optimizer()
+    optimizer.optimize(sequence(Literal("xab"), Repeating(Literal("ab"), min=0)))
+    assert optimizer.stats["merge_repeats"]["rewrites"] == 1
+    assert optimizer.stats["merge_repeats"]["runs"] == optimizer.rounds == 2
+    assert optimizer.unfinished == 0
+
+def _deep(depth, leaf):
+    pattern = Literal(leaf)
+    for index in range(depth):
+        pattern = Group(Literal("y"), Either(pattern, Literal("z")), capturing=False)
+    return pattern
+
+def test_deep_trees_are_compared_by_identity():
+    # comparing with == would recurse down both trees, to where they differ
+    assert sys.getrecursionlimit() < 3000
+    node = Either(sequence(_deep(3000, "x"), Literal("a")), sequence(_deep(3000, "w"), Literal("a")))
+    result = Optimizer().optimize(node)
+    assert result.render().endswith(")a")
+
+
+def _random_tree(rnd, depth):
+    if depth == 0 or rnd.random() < 0.3:
+        return rnd.choice([Literal(rnd.choice(["a", "b", "ab", "ba", "aab"])), Set("ab"), digit])
+    kind = rnd.randint(0, 3)
+    if kind == 0:
+        return Group(*[_random_tree(rnd, depth - 1) for index in range(rnd.randint(1, 3))],
+                     capturing=rnd.random() < 0.3)
+    elif kind == 1:
+        minimum = rnd.randint(0, 2)
+        return Repeating(_random_tree(rnd, depth - 1), min=minimum,
+                         max=rnd.choice([max(minimum, 1), 2, 3, inf]), greedy=rnd.random() < 0.8)
+    elif kind == 2:
+        return sequence(*[_random_tree(rnd, depth - 1) for index in range(rnd.randint(1, 3))])
+    return Either(*[_random_tree(rnd, depth - 1) for index in range(rnd.randint(2, 3))])
+
+def test_random_patterns_match_the_same():
+    # only spans are compared: simplifying may derepeat (x)(x) into (x){2},
+    # whether optimizing or not
+    rnd = random.Random(25)
+    optimizer = Optimizer()
+    for index in range(300):
+        pattern = sequence(_random_tree(rnd, 4))
+        before = re.compile(pattern.toplevel().render())
+        after = re.compile(optimizer.optimize(pattern).render())
+        texts = ["".join(rnd.choice("ab1") for length in range(rnd.randint(0, 8)))
+                 for attempt in range(20)]
+        texts += list(Generator(pattern, seed=index, verify=False).positives(20))
+        for text in texts:
+            expected = before.search(text)
+            found = after.search(text)
+            assert (found and found.span()) == (expected and expected.span()), (before.pattern, text)
@@ -0,0 +1,84 @@
+"""
+search_files() and finditer_chunks() in a pool of two worker processes,
+compared with finditer() run serially.
+"""
+
+import pickle
+import random
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit
+from re_gen.parallel import MatchResult, search_files, finditer_chunks
+
+# bounded, with a plain and a named group: (?:id|user)=(\d{1,6})(?P<unit>ms)?
+pair = Group(Either(Literal("id"), Literal("user")), Literal("="),
+             Group(Repeating(digit, min=1, max=6)),
+             Repeating(Group(Literal("ms"), name="unit"), min=0, max=1),
+             capturing=False)
+
+
+def _text(rnd, length):
+    pieces = ["id=", "user=", "12", "345678", "ms", " ", "café", "x", "=\n"]
+    return "".join(rnd.choice(pieces) for index in range(length))
+
+def _serial(text):
+    return [MatchResult.from_match(match) for match in pair.compiled.finditer(text)]
+
+def _files(tmp_path, count):
+    rnd = random.Random(12)
+    paths = []
+    texts = {}
+    for index in range(count):
+        path = str(tmp_path / ("%d.txt" % index))
+        text = _text(rnd, rnd.randint(0, 80))
+        with open(path, "w", encoding="utf-8", newline="") as stream:
+            stream.write(text)
+        paths.append(path)
+        texts[path] = text
+    return paths, texts
+
+
+def test_search_files(tmp_path):
+    paths, texts = _files(tmp_path, 12)
+    # chunks of 16 characters: matches cross chunk boundaries
+    results = list(search_files(pair, paths, workers=2, prefetch=1, chunk_size=16))
+    assert [path for path, matches in results] == paths
+    for path, matches in results:
+        assert matches == _serial(texts[path])
+    assert any(match.start // 16 != (match.end - 1) // 16
+               for path, matches in results for match in matches)
+
+def test_search_files_unordered(tmp_path):
+    paths, texts = _files(tmp_path, 12)
+    results = list(search_files(pair, iter(paths), workers=2, ordered=False, chunk_size=16))
+    assert sorted(path for path, matches in results) == sorted(paths)
+    for path, matches in results:
+        assert matches == _serial(texts[path])
+
+def test_finditer_chunks():
+    rnd = random.Random(12)
+    chunks = [_text(rnd, rnd.randint(0, 30)) for index in range(20)]
+    expected = [(index, _serial(chunk)) for index, chunk in enumerate(chunks)]
+    assert list(finditer_chunks(pair, chunks, workers=2, prefetch=1, batch_size=3)) == expected
+    results = finditer_chunks(pair, iter(chunks), workers=2, ordered=False, batch_size=3)
+    assert sorted(results) == expected
+    assert list(finditer_chunks(pair, [], workers=2)) == []
+
+def test_match_result():
+    match = pair.search("x user=42ms")
+    result = MatchResult.from_match(match)
+    assert result.span() == match.span() == (2, 11)
+    assert result.text == "user=42ms"
+    assert result.groups == ("42", "ms")
+    assert result.groupdict == {"unit": "ms"}
+    copy = pickle.loads(pickle.dumps(result))
+    assert copy == result
+    assert copy.span() == (2, 11)
+
+def test_pattern_pickles_to_the_same_node():
+    # workers get the pattern pickled; here, equal nodes are the same one
+    copy = pickle.loads(pickle.dumps(pair))
+    assert copy is pair
+    assert copy.compiled is pair.compiled
@@ -0,0 +1,44 @@
+import random
+import re
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+from re_gen.definitions import lineend, linestart, wordboundary, digit
+
+
+def _spans(matches):
+    return [match.span() for match in matches]
+
+def test_end_anchor_sees_the_real_text():
+    pattern = Group(Literal("foo"), lineend, capturing=False)
+    assert _spans(pattern.prefiltered().finditer("foo\nbar")) == []
+    assert _spans(pattern.prefiltered().finditer("bar\nfoo")) == [(4, 7)]
+
+def test_word_boundary_sees_the_real_text():
+    pattern = Group(Literal("ab"), wordboundary, capturing=False)
+    assert _spans(pattern.prefiltered().finditer("abc ab")) == [(4, 6)]
+
+def test_bounded_patterns_are_windowed():
+    pattern = Group(Literal("id="), Repeating(digit, min=1, max=4), capturing=False)
+    prefilter = pattern.prefiltered()
+    assert prefilter.windowed
+    text = "x id=12345 id= id=7"
+    assert _spans(prefilter.finditer(text)) == _spans(re.finditer(pattern.rendered, text))
+
+def test_finditer_matches_re():
+    rnd = random.Random(10)
+    patterns = [
+        Group(Literal("ab"), Repeating(Set("abc"), min=0, max=3), capturing=False),
+        Group(Repeating(Set("ab"), min=0, max=2), Literal("ba"), lineend, capturing=False),
+        Group(linestart, Literal("a"), Repeating(Literal("b"), min=0, max=2), capturing=False),
+        Group(wordboundary, Literal("ab"), Either(Literal("a"), Literal("c")), capturing=False),
+        Group(Literal("c"), Repeating(Literal("a"), min=0, max=3), wordboundary, capturing=False),
+    ]
+    for pattern in patterns:
+        regex = re.compile(pattern.rendered)
+        for attempt in range(300):
+            text = "".join(rnd.choice("abc \n") for index in range(rnd.randint(0, 20)))
+            assert (_spans(pattern.prefiltered().finditer(text)) ==
+                    _spans(regex.finditer(text))), (pattern.rendered, text)
@@ -0,0 +1,59 @@
+import re
+
+from re_gen.base import Literal, inf
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.sets import Set
+from re_gen.patternset import PatternSet
+
+
+def test_nested_unbounded_repeats_merge():
+    assert Repeating(Repeating(Literal("a"))).toplevel().render() == "a+"
+    assert Repeating(Repeating(Literal("ab")), min=0).toplevel().render() == "(?:ab)*"
+    assert Repeating(Repeating(Set("ab")), min=0).toplevel().render() == "[ab]*"
+
+def test_nested_repeats_merge_inside_sequence():
+    pattern = Group(Literal("x"), Repeating(Repeating(Literal("a")), min=0))
+    assert pattern.toplevel().render() == "xa*"
+
+def test_nested_fixed_repeats_merge():
+    assert Repeating(Repeating(Literal("a"), count=2), count=3).toplevel().render() == "a{6}"
+
+def test_nested_repeats_with_gaps_dont_merge():
+    # (?:a{2})? doesn't match "a"
+    pattern = Repeating(Repeating(Literal("a"), count=2), min=0, max=1)
+    assert pattern.toplevel().render() == "(?:a{2})?"
+
+def test_captures_survive_simplification():
+    pattern = Group(Literal("x"), Group(Literal("a"), name="n"), Group(Literal("b")))
+    rendered = pattern.toplevel().render()
+    assert rendered == "x(?P<n>a)(b)"
+    assert re.match(rendered, "xab").groups() == ("a", "b")
+
+def test_patternset_keeps_member_groups():
+    patterns = PatternSet([Group(Literal("a"), Group(Literal("b")))])
+    match = patterns.search("ab")
+    assert match.group(1) == "b"
+
+def _first_match(pattern, text):
+    match = re.match(pattern, text)
+    return match and match.span(1)
+
+def test_merged_repeats_try_counts_in_the_same_order():
+    # the suffix succeeds after 3 or 5 a's; nested and merged repeats must
+    # pick the same one
+    suffix = "(?:a{3}|a)!"
+    text = "a" * 6 + "!"
+    for inner, outer in [((0, 2), (1, 3)), ((1, 3), (0, 2)), ((2, inf), (1, inf)),
+                         ((1, inf), (0, 3)), ((2, 3), (1, 2)), ((2, 3), (2, 2))]:
+        for greedy in (True, False):
+            nested = Repeating(Repeating(Literal("a"), min=inner[0], max=inner[1], greedy=greedy),
+                               min=outer[0], max=outer[1], greedy=greedy)
+            simplified = nested.toplevel().render()
+            assert (_first_match("(%s)%s" % (simplified, suffix), text) ==
+                    _first_match("(%s)%s" % (nested.render(), suffix), text)), simplified
+
+def test_repeats_trying_counts_out_of_order_dont_merge():
+    assert Repeating(Repeating(Literal("a"), min=2, max=3), min=1, max=2).toplevel().render() == "(?:a{2,3}){1,2}"
+    lazy = Repeating(Repeating(Literal("a"), min=2, greedy=False), greedy=False)
+    assert lazy.toplevel().render() == "(?:a{2,}?)+?"
@@ -0,0 +1,132 @@
+import gc
+import pickle
+import sys
+
+from re_gen.base import Literal
+from re_gen.grouping import Group, Either
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit, alphanum
+from re_gen.resultcache import CachedMatch, ResultCache, entry_overhead
+
+
+def _route(prefix):
+    "/<prefix>/<id>[/<name>], with a named and an optional group"
+    return Group(Literal("/%s/" % prefix), Group(Repeating(digit), name="id"),
+                 Repeating(Group(Literal("/"), Group(Repeating(alphanum), name="name"),
+                                 capturing=False), min=0, max=1),
+                 capturing=False)
+
+
+def test_hits_and_misses():
+    pattern = _route("hits")
+    cache = pattern.cache_results()
+    assert isinstance(cache, ResultCache)
+    first = pattern.search("/hits/12")
+    assert not isinstance(first, CachedMatch)
+    second = pattern.search("/hits/12")
+    assert isinstance(second, CachedMatch)
+    assert second.span() == first.span()
+    pattern.match("/hits/12")
+    pattern.search("/hits/13")
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+    assert len(cache) == 3
+    pattern.uncache_results()
+
+def test_failed_matches_are_cached():
+    pattern = _route("fails")
+    cache = pattern.cache_results()
+    assert pattern.search("/other/12") is None
+    assert pattern.search("/other/12") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.memory == sys.getsizeof("/other/12") + entry_overhead
+    pattern.uncache_results()
+
+def test_eviction_by_maxsize():
+    pattern = _route("size")
+    cache = pattern.cache_results(maxsize=2)
+    for text in ["/size/1", "/size/2", "/size/1", "/size/3"]:
+        pattern.search(text)
+    # /size/2 was least recently used
+    assert cache.evictions == 1
+    assert len(cache) == 2
+    assert isinstance(pattern.search("/size/1"), CachedMatch)
+    assert not isinstance(pattern.search("/size/2"), CachedMatch)
+    cache.resize(maxsize=1)
+    assert len(cache) == 1
+    assert cache.evictions == 3
+    pattern.uncache_results()
+
+def test_eviction_by_maxmemory():
+    pattern = _route("memory")
+    texts = ["-%d" % index for index in range(10, 20)]
+    entry = sys.getsizeof(texts[0]) + entry_overhead
+    cache = pattern.cache_results(maxmemory=3 * entry)
+    for text in texts:
+        assert pattern.search(text) is None
+    assert len(cache) == 3
+    assert cache.memory == 3 * entry
+    assert cache.evictions == len(texts) - 3
+    assert pattern.search(texts[-1]) is None
+    assert cache.hits == 1
+    cache.resize(maxmemory=entry)
+    assert len(cache) == 1
+    assert cache.memory == entry
+    pattern.uncache_results()
+
+def test_cached_match_behaves_like_the_match():
+    pattern = _route("match")
+    pattern.cache_results()
+    for text in ["x/match/42/bob!", "/match/7", "/match/7/"]:
+        expected = pattern.search(text)
+        cached = pattern.search(text)
+        assert isinstance(cached, CachedMatch)
+        assert cached.group() == expected.group()
+        assert cached.group(0, 1, "name") == expected.group(0, 1, "name")
+        assert cached["id"] == expected["id"]
+        assert cached.groups() == expected.groups()
+        assert cached.groups("-") == expected.groups("-")
+        assert cached.groupdict() == expected.groupdict()
+        assert cached.groupdict("-") == expected.groupdict("-")
+        for group in [0, 1, 2, "id", "name"]:
+            assert cached.span(group) == expected.span(group)
+            assert cached.start(group) == expected.start(group)
+            assert cached.end(group) == expected.end(group)
+        assert cached.expand(r"\g<id>:\1") == expected.expand(r"\g<id>:\1")
+        assert (cached.pos, cached.endpos) == (expected.pos, expected.endpos)
+        assert (cached.lastindex, cached.lastgroup) == (expected.lastindex, expected.lastgroup)
+    pattern.uncache_results()
+
+def test_cached_match_of_the_dfa_engine():
+    pattern = Either(Literal("dfa"), Literal("dfax"), _factor=False)
+    pattern.cache_results()
+    expected = pattern.search("-dfax", engine="dfa")
+    cached = pattern.search("-dfax", engine="dfa")
+    assert isinstance(cached, CachedMatch)
+    assert cached.span() == expected.span() == (1, 4)
+    pattern.uncache_results()
+
+def test_uncache_results():
+    pattern = _route("uncache")
+    cache = pattern.cache_results()
+    pattern.search("/uncache/1")
+    pattern.uncache_results()
+    assert pattern._result_cache is None
+    assert not isinstance(pattern.search("/uncache/1"), CachedMatch)
+    assert (cache.hits, cache.misses) == (0, 1)
+    # nothing to turn off
+    pattern.uncache_results()
+
+def test_pickling_drops_the_cache():
+    pattern = _route("pickle")
+    pattern.cache_results()
+    pattern.search("/pickle/1")
+    data = pickle.dumps(pattern)
+    assert b"ResultCache" not in data
+    assert pickle.loads(data) is pattern
+    # the cache refers back to the pattern: collect the cycle
+    del pattern
+    gc.collect()
+    copy = pickle.loads(data)
+    assert copy._result_cache is None
+    assert not isinstance(copy.search("/pickle/1"), CachedMatch)
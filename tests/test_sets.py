@@ -0,0 +1,22 @@
+from re_gen.base import Literal
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.sets import Set, Range, CharacterClass
+from re_gen.definitions import digit
+
+
+def test_repr():
+    assert repr(Set("ab", Range("a", "z"), digit)) == "Set('ab', Range('a', 'z'), CharacterClass('\\\\d'))"
+    assert repr(Set("ab", invert=True)) == "Set('ab', invert=True)"
+    assert repr(Set("xy", bytes=True)) == "Set(b'xy')"
+    assert repr(Repeating(Set("ab"), min=0)) == "Repeating(Set('ab'), min=0)"
+
+def test_repr_evaluates_to_the_set():
+    sets = [Set("ab", Range("a", "z"), digit), Set("a-]", invert=True, ascii=True),
+            Set(b"xy", Range(b"0", b"9")), Set("xy", Range("0", "9"), bytes=True),
+            Set(digit, bytes=True), Set()]
+    for pattern in sets:
+        # nodes are interned: an equal set is the same one
+        assert eval(repr(pattern)) is pattern
+    pattern = Group(Literal("a"), Set("bc"), capturing=False)
+    assert eval(repr(pattern)) is pattern
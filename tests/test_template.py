@@ -0,0 +1,84 @@
+import re
+
+import pytest
+
+from re_gen.base import Literal
+from re_gen.grouping import Group
+from re_gen.repeating import Repeating
+from re_gen.definitions import digit
+from re_gen.template import Template, TemplateError
+
+
+def _user_path(tenant, digits):
+    return Group(Literal("/"), Literal(tenant), Literal("/"), Repeating(digit, count=digits))
+
+def _template(**keywords):
+    return Template(_user_path, tenant=str, digits=int, **keywords)
+
+
+def test_str_holes_are_escaped():
+    template = _template()
+    assert template.render(tenant="a.b+", digits=2) == "/a\\.b\\+/\\d{2}"
+    regex = template.compile(tenant="a.b+", digits=2)
+    assert regex.fullmatch("/a.b+/12")
+    assert not regex.fullmatch("/axbb/12")
+    assert template(tenant="(x|", digits=2).fullmatch("/(x|/12")
+
+def test_int_holes_are_repeat_counts():
+    template = _template()
+    regex = template.compile(tenant="acme", digits=3)
+    assert regex.fullmatch("/acme/123")
+    assert not regex.fullmatch("/acme/12")
+    assert not regex.fullmatch("/acme/1234")
+    # \d{1} rather than \d, but the same
+    assert template.compile(tenant="acme", digits=1).fullmatch("/acme/7")
+
+def test_bound_source_is_the_built_pattern():
+    template = _template()
+    for tenant in ["acme", "a.b+", "x y", "", "é\\", "{1}"]:
+        for digits in [2, 6, 12]:
+            expected = _user_path(tenant, digits).toplevel().render()
+            assert template.render(tenant=tenant, digits=digits) == expected
+
+def test_values_are_checked():
+    template = _template()
+    with pytest.raises(TemplateError):
+        template.render(tenant="acme")
+    with pytest.raises(TemplateError):
+        template.render(tenant="acme", digits=2, other=1)
+    with pytest.raises(TemplateError):
+        template.render(tenant="acme", digits=-1)
+    with pytest.raises(TemplateError):
+        template.render(tenant="acme", digits=True)
+    with pytest.raises(TemplateError):
+        template.render(tenant=b"acme", digits=2)
+    with pytest.raises(TemplateError):
+        Template(_user_path, tenant=str, digits=float)
+
+def test_compiled_regexes_are_cached_per_template():
+    template = _template(maxsize=2)
+    first = template.compile(tenant="acme", digits=2)
+    assert template.compile(tenant="acme", digits=2) is first
+    assert (template.hits, template.misses) == (1, 1)
+    # flags are part of the key
+    ignorecase = template.compile(re.IGNORECASE, tenant="acme", digits=2)
+    assert ignorecase is not first
+    assert ignorecase.fullmatch("/ACME/12")
+    assert (template.hits, template.misses) == (1, 2)
+    # (acme, 2), 0 is least recently used
+    template.compile(tenant="acme", digits=3)
+    assert len(template._compiled) == 2
+    assert (("acme", 2), 0) not in template._compiled
+    template.compile(re.IGNORECASE, tenant="acme", digits=2)
+    assert (template.hits, template.misses) == (2, 3)
+    # other templates have their own cache
+    other = _template()
+    other.compile(tenant="acme", digits=2)
+    assert (other.hits, other.misses) == (0, 1)
+
+def test_holes_lost_when_simplifying():
+    # (?:\d{a}){b} simplifies to \d{a*b}
+    with pytest.raises(TemplateError):
+        Template(lambda a, b: Repeating(Repeating(digit, count=a), count=b), a=int, b=int)
+    with pytest.raises(TemplateError):
+        Template(lambda tenant: Literal("x"), tenant=str)